@@ -0,0 +1,97 @@
+# fsm.asm
+# --------------------------------------------------------------------
+#   Branch-heavy state machine: scans 4096 random symbols (0..3, from
+#   an LCG, generated outside the ROI) for the sequence 0 1 2 3. Every
+#   symbol goes through a chain of data-dependent branches.
+#
+#     state 0: 0 -> 1, else -> 0
+#     state 1: 1 -> 2, 0 -> 1, else -> 0
+#     state 2: 2 -> 3, 0 -> 1, else -> 0
+#     state 3: 3 -> 0 (a match), 0 -> 1, else -> 0
+#
+#   Exit code: h = h * 31 + state after every symbol (mod 2^32), plus
+#   the number of matches
+
+.data
+  n:    .word  4096
+  syms: .space 4096
+
+.text
+  la    $t7, n
+  lw    $s0, 0($t7)
+  la    $s1, syms
+
+  # LCG: x = x * 1103515245 + 12345
+  lui   $s4, 0x41c6
+  ori   $s4, $s4, 0x4e6d
+  addiu $s5, $0, 1
+
+  addu  $t0, $s0, $0
+  addu  $t1, $s1, $0
+init:
+  mul   $s5, $s5, $s4
+  addiu $s5, $s5, 12345
+  srl   $t4, $s5, 16
+  andi  $t4, $t4, 3
+  sb    $t4, 0($t1)
+  addiu $t1, $t1, 1
+  addiu $t0, $t0, -1
+  bne   $t0, $zero, init
+
+  addiu $v0, $0, 88 # ROI
+  syscall
+
+  addiu $t6, $0, 31
+  addu  $a0, $0, $0        # hash
+  addu  $s2, $0, $0        # matches
+  addu  $s3, $0, $0        # state
+  addu  $t0, $s0, $0
+  addu  $t1, $s1, $0
+step:
+  lbu   $t4, 0($t1)
+  beq   $s3, $zero, st0
+  addiu $t5, $s3, -1
+  beq   $t5, $zero, st1
+  addiu $t5, $s3, -2
+  beq   $t5, $zero, st2
+
+st3:
+  addiu $t5, $t4, -3
+  bne   $t5, $zero, restart
+  addiu $s2, $s2, 1
+  addu  $s3, $0, $0
+  j     next
+st2:
+  addiu $t5, $t4, -2
+  bne   $t5, $zero, restart
+  addiu $s3, $0, 3
+  j     next
+st1:
+  addiu $t5, $t4, -1
+  bne   $t5, $zero, restart
+  addiu $s3, $0, 2
+  j     next
+st0:
+  bne   $t4, $zero, fail
+  addiu $s3, $0, 1
+  j     next
+
+restart:
+  # A 0 starts a new match, anything else fails
+  beq   $t4, $zero, st0
+fail:
+  addu  $s3, $0, $0
+
+next:
+  mul   $a0, $a0, $t6
+  addu  $a0, $a0, $s3
+  addiu $t1, $t1, 1
+  addiu $t0, $t0, -1
+  bne   $t0, $zero, step
+
+  addiu $v0, $0, 88 # ROI
+  syscall
+
+  addu  $a0, $a0, $s2
+  addiu $v0, $0, 17
+  syscall
@@ -0,0 +1,108 @@
+# list_chase.asm
+# --------------------------------------------------------------------
+#   Linked-list pointer chasing: 512 nodes of 16 bytes (next, value),
+#   linked in a random order (a Fisher-Yates shuffle with an LCG,
+#   outside the ROI), traversed 8 times. Every load of a next pointer
+#   depends on the previous one.
+#
+#   Exit code: h = h * 31 + value over every node visited (mod 2^32)
+
+.data
+  n:      .word  512
+  passes: .word  8
+  perm:   .space 2048
+  nodes:  .space 8192
+
+.text
+  la    $t7, n
+  lw    $s0, 0($t7)
+  la    $t7, passes
+  lw    $s7, 0($t7)
+  la    $s1, perm
+  la    $s2, nodes
+
+  # LCG: x = x * 1103515245 + 12345
+  lui   $s4, 0x41c6
+  ori   $s4, $s4, 0x4e6d
+  addiu $s5, $0, 1
+
+  # perm[i] = i, and every node gets a value
+  addu  $t0, $0, $0
+  addu  $t1, $s1, $0
+  addu  $t2, $s2, $0
+fill:
+  sw    $t0, 0($t1)
+  mul   $s5, $s5, $s4
+  addiu $s5, $s5, 12345
+  srl   $t4, $s5, 16
+  sw    $t4, 4($t2)
+  addiu $t1, $t1, 4
+  addiu $t2, $t2, 16
+  addiu $t0, $t0, 1
+  bne   $t0, $s0, fill
+
+  # Shuffle: for i = n - 1 down to 1, swap perm[i] and perm[x % (i + 1)]
+  addiu $t0, $s0, -1
+shuffle:
+  mul   $s5, $s5, $s4
+  addiu $s5, $s5, 12345
+  srl   $t4, $s5, 16
+  addiu $t5, $t0, 1
+  modu  $t4, $t4, $t5
+  sll   $t1, $t0, 2
+  addu  $t1, $t1, $s1
+  sll   $t2, $t4, 2
+  addu  $t2, $t2, $s1
+  lw    $t4, 0($t1)
+  lw    $t5, 0($t2)
+  sw    $t5, 0($t1)
+  sw    $t4, 0($t2)
+  addiu $t0, $t0, -1
+  bne   $t0, $zero, shuffle
+
+  # Link the nodes in perm order; the last one points nowhere (0)
+  addu  $t1, $s1, $0
+  addiu $t0, $s0, -1
+link:
+  lw    $t4, 0($t1)
+  lw    $t5, 4($t1)
+  sll   $t4, $t4, 4
+  addu  $t4, $t4, $s2
+  sll   $t5, $t5, 4
+  addu  $t5, $t5, $s2
+  sw    $t5, 0($t4)
+  addiu $t1, $t1, 4
+  addiu $t0, $t0, -1
+  bne   $t0, $zero, link
+  lw    $t4, 0($t1)
+  sll   $t4, $t4, 4
+  addu  $t4, $t4, $s2
+  sw    $0, 0($t4)
+
+  # The head of the list
+  lw    $s3, 0($s1)
+  sll   $s3, $s3, 4
+  addu  $s3, $s3, $s2
+
+  addiu $v0, $0, 88 # ROI
+  syscall
+
+  addiu $t6, $0, 31
+  addu  $a0, $0, $0
+  addu  $t0, $s7, $0
+pass:
+  addu  $t1, $s3, $0
+chase:
+  lw    $t4, 4($t1)
+  lw    $t1, 0($t1)
+  mul   $a0, $a0, $t6
+  addu  $a0, $a0, $t4
+  bne   $t1, $zero, chase
+  addiu $t0, $t0, -1
+  bne   $t0, $zero, pass
+
+  addiu $v0, $0, 88 # ROI
+  syscall
+
+  addiu $v0, $0, 17
+  syscall
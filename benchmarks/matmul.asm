@@ -0,0 +1,96 @@
+# matmul.asm
+# --------------------------------------------------------------------
+#   16x16 integer matrix multiply, C = A * B (row-major words). The
+#   inputs are filled with an LCG outside the ROI.
+#
+#   Exit code: h = h * 31 + C[i][j] in row-major order (mod 2^32)
+
+.data
+  n:  .word  16
+  A:  .space 1024
+  B:  .space 1024
+  C:  .space 1024
+
+.text
+  la    $t7, n
+  lw    $s0, 0($t7)
+  la    $s1, A
+  la    $s2, B
+  la    $s3, C
+
+  # LCG: x = x * 1103515245 + 12345
+  lui   $s4, 0x41c6
+  ori   $s4, $s4, 0x4e6d
+  addiu $s5, $0, 1
+
+  # A and B hold n * n elements each, in 0..255
+  mul   $t0, $s0, $s0
+  addu  $t1, $s1, $0
+  addu  $t2, $s2, $0
+init:
+  mul   $s5, $s5, $s4
+  addiu $s5, $s5, 12345
+  srl   $t4, $s5, 16
+  andi  $t4, $t4, 0xff
+  sw    $t4, 0($t1)
+  mul   $s5, $s5, $s4
+  addiu $s5, $s5, 12345
+  srl   $t4, $s5, 16
+  andi  $t4, $t4, 0xff
+  sw    $t4, 0($t2)
+  addiu $t1, $t1, 4
+  addiu $t2, $t2, 4
+  addiu $t0, $t0, -1
+  bne   $t0, $zero, init
+
+  addiu $v0, $0, 88 # ROI
+  syscall
+
+  sll   $s6, $s0, 2        # row stride in bytes
+  addu  $t0, $0, $0        # i
+  addu  $t9, $s3, $0       # &C[i][j]
+row:
+  mul   $t7, $t0, $s6
+  addu  $t7, $t7, $s1      # &A[i][0]
+  addu  $t1, $0, $0        # j
+col:
+  sll   $t8, $t1, 2
+  addu  $t8, $t8, $s2      # &B[0][j]
+  addu  $t3, $t7, $0       # &A[i][k]
+  addu  $t2, $s0, $0       # k countdown
+  addu  $t6, $0, $0        # sum
+dot:
+  lw    $t4, 0($t3)
+  lw    $t5, 0($t8)
+  mul   $t4, $t4, $t5
+  addu  $t6, $t6, $t4
+  addiu $t3, $t3, 4
+  addu  $t8, $t8, $s6
+  addiu $t2, $t2, -1
+  bne   $t2, $zero, dot
+
+  sw    $t6, 0($t9)
+  addiu $t9, $t9, 4
+  addiu $t1, $t1, 1
+  bne   $t1, $s0, col
+  addiu $t0, $t0, 1
+  bne   $t0, $s0, row
+
+  addiu $v0, $0, 88 # ROI
+  syscall
+
+  # Checksum
+  addiu $t6, $0, 31
+  addu  $a0, $0, $0
+  mul   $t0, $s0, $s0
+  addu  $t3, $s3, $0
+check:
+  lw    $t4, 0($t3)
+  mul   $a0, $a0, $t6
+  addu  $a0, $a0, $t4
+  addiu $t3, $t3, 4
+  addiu $t0, $t0, -1
+  bne   $t0, $zero, check
+
+  addiu $v0, $0, 17
+  syscall
@@ -0,0 +1,99 @@
+# qsort.asm
+# --------------------------------------------------------------------
+#   Recursive quicksort (Lomuto partition) of 256 words, with calls,
+#   returns and a stack. The input is filled with an LCG outside the
+#   ROI.
+#
+#   Exit code: h = h * 31 + a[i] over the sorted array (mod 2^32)
+
+.data
+  n:  .word  256
+  a:  .space 1024
+
+.text
+  la    $t7, n
+  lw    $s0, 0($t7)
+  la    $s1, a
+
+  # LCG: x = x * 1103515245 + 12345
+  lui   $s4, 0x41c6
+  ori   $s4, $s4, 0x4e6d
+  addiu $s5, $0, 1
+
+  addu  $t0, $s0, $0
+  addu  $t1, $s1, $0
+init:
+  mul   $s5, $s5, $s4
+  addiu $s5, $s5, 12345
+  srl   $t4, $s5, 16
+  sw    $t4, 0($t1)
+  addiu $t1, $t1, 4
+  addiu $t0, $t0, -1
+  bne   $t0, $zero, init
+
+  addiu $v0, $0, 88 # ROI
+  syscall
+
+  addu  $a0, $s1, $0
+  sll   $a1, $s0, 2
+  addu  $a1, $a1, $s1
+  addiu $a1, $a1, -4
+  jal   qsort
+
+  addiu $v0, $0, 88 # ROI
+  syscall
+
+  # Checksum
+  addiu $t6, $0, 31
+  addu  $a0, $0, $0
+  addu  $t0, $s0, $0
+  addu  $t3, $s1, $0
+check:
+  lw    $t4, 0($t3)
+  mul   $a0, $a0, $t6
+  addu  $a0, $a0, $t4
+  addiu $t3, $t3, 4
+  addiu $t0, $t0, -1
+  bne   $t0, $zero, check
+
+  addiu $v0, $0, 17
+  syscall
+
+# qsort($a0 = &a[lo], $a1 = &a[hi]): sorts a[lo..hi]
+qsort:
+  subu  $t0, $a1, $a0
+  blez  $t0, qs_ret
+  addiu $sp, $sp, -12
+  sw    $ra, 0($sp)
+  sw    $a1, 4($sp)
+  lw    $t1, 0($a1)        # pivot = a[hi]
+  addu  $t2, $a0, $0       # &a[i]: next slot for a smaller element
+  addu  $t3, $a0, $0       # &a[j]
+qs_loop:
+  subu  $t0, $t3, $a1
+  bgez  $t0, qs_part
+  lw    $t4, 0($t3)
+  subu  $t0, $t4, $t1
+  bgez  $t0, qs_next
+  lw    $t5, 0($t2)
+  sw    $t4, 0($t2)
+  sw    $t5, 0($t3)
+  addiu $t2, $t2, 4
+qs_next:
+  addiu $t3, $t3, 4
+  j     qs_loop
+qs_part:
+  lw    $t5, 0($t2)        # the pivot goes to a[i]
+  sw    $t1, 0($t2)
+  sw    $t5, 0($a1)
+  sw    $t2, 8($sp)
+  addiu $a1, $t2, -4
+  jal   qsort              # qsort(lo, i - 1)
+  lw    $t2, 8($sp)
+  addiu $a0, $t2, 4
+  lw    $a1, 4($sp)
+  jal   qsort              # qsort(i + 1, hi)
+  lw    $ra, 0($sp)
+  addiu $sp, $sp, 12
+qs_ret:
+  jr    $ra
@@ -0,0 +1,98 @@
+# strsearch.asm
+# --------------------------------------------------------------------
+#   String kernel on a 2048-character NUL-terminated text over the
+#   alphabet a..d (from an LCG, generated outside the ROI): strlen, a
+#   naive search counting the occurrences of "abca", and a djb2 hash
+#   (h = h * 33 + c) of the text, all byte by byte.
+#
+#   Exit code: hash * 31 + count * 7 + length (mod 2^32)
+
+.data
+  n:       .word   2048
+  pattern: .asciiz "abca"
+  text:    .space  2049
+
+.text
+  la    $t7, n
+  lw    $s0, 0($t7)
+  la    $s1, text
+
+  # LCG: x = x * 1103515245 + 12345
+  lui   $s4, 0x41c6
+  ori   $s4, $s4, 0x4e6d
+  addiu $s5, $0, 1
+
+  addu  $t0, $s0, $0
+  addu  $t1, $s1, $0
+init:
+  mul   $s5, $s5, $s4
+  addiu $s5, $s5, 12345
+  srl   $t4, $s5, 16
+  andi  $t4, $t4, 3
+  addiu $t4, $t4, 97       # 'a'
+  sb    $t4, 0($t1)
+  addiu $t1, $t1, 1
+  addiu $t0, $t0, -1
+  bne   $t0, $zero, init
+  sb    $0, 0($t1)
+
+  addiu $v0, $0, 88 # ROI
+  syscall
+
+  # strlen
+  addu  $t1, $s1, $0
+strlen:
+  lbu   $t4, 0($t1)
+  addiu $t1, $t1, 1
+  bne   $t4, $zero, strlen
+  subu  $s2, $t1, $s1
+  addiu $s2, $s2, -1       # length
+
+  # Occurrences of the pattern
+  la    $s6, pattern
+  addu  $s3, $0, $0        # count
+  addu  $t1, $s1, $0       # start of the candidate match
+search:
+  lbu   $t4, 0($t1)
+  beq   $t4, $zero, hash
+  addu  $t2, $t1, $0
+  addu  $t3, $s6, $0
+match:
+  lbu   $t5, 0($t3)
+  beq   $t5, $zero, found
+  lbu   $t4, 0($t2)
+  bne   $t4, $t5, advance
+  addiu $t2, $t2, 1
+  addiu $t3, $t3, 1
+  j     match
+found:
+  addiu $s3, $s3, 1
+advance:
+  addiu $t1, $t1, 1
+  j     search
+
+  # djb2
+hash:
+  addiu $a0, $0, 5381
+  addiu $t6, $0, 33
+  addu  $t1, $s1, $0
+djb2:
+  lbu   $t4, 0($t1)
+  beq   $t4, $zero, done
+  mul   $a0, $a0, $t6
+  addu  $a0, $a0, $t4
+  addiu $t1, $t1, 1
+  j     djb2
+done:
+
+  addiu $v0, $0, 88 # ROI
+  syscall
+
+  addiu $t6, $0, 31
+  mul   $a0, $a0, $t6
+  addiu $t6, $0, 7
+  mul   $t4, $s3, $t6
+  addu  $a0, $a0, $t4
+  addu  $a0, $a0, $s2
+  addiu $v0, $0, 17
+  syscall
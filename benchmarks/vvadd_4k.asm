@@ -0,0 +1,78 @@
+# vvadd_4k.asm
+# --------------------------------------------------------------------
+#   Vector-vector add of 4096 words, c[i] = a[i] + b[i]. The inputs are
+#   filled with an LCG outside the ROI.
+#
+#   Exit code: h = h * 31 + c[i] over i (mod 2^32)
+
+.data
+  n:  .word  4096
+  a:  .space 16384
+  b:  .space 16384
+  c:  .space 16384
+
+.text
+  la    $t7, n
+  lw    $s0, 0($t7)
+  la    $s1, a
+  la    $s2, b
+  la    $s3, c
+
+  # LCG: x = x * 1103515245 + 12345
+  lui   $s4, 0x41c6
+  ori   $s4, $s4, 0x4e6d
+  addiu $s5, $0, 1
+
+  addu  $t0, $s0, $0
+  addu  $t1, $s1, $0
+  addu  $t2, $s2, $0
+init:
+  mul   $s5, $s5, $s4
+  addiu $s5, $s5, 12345
+  srl   $t4, $s5, 16
+  sw    $t4, 0($t1)
+  mul   $s5, $s5, $s4
+  addiu $s5, $s5, 12345
+  srl   $t4, $s5, 16
+  sw    $t4, 0($t2)
+  addiu $t1, $t1, 4
+  addiu $t2, $t2, 4
+  addiu $t0, $t0, -1
+  bne   $t0, $zero, init
+
+  addiu $v0, $0, 88 # ROI
+  syscall
+
+  addu  $t0, $s0, $0
+  addu  $t1, $s1, $0
+  addu  $t2, $s2, $0
+  addu  $t3, $s3, $0
+vvadd:
+  lw    $t4, 0($t1)
+  lw    $t5, 0($t2)
+  addu  $t4, $t4, $t5
+  sw    $t4, 0($t3)
+  addiu $t1, $t1, 4
+  addiu $t2, $t2, 4
+  addiu $t3, $t3, 4
+  addiu $t0, $t0, -1
+  bne   $t0, $zero, vvadd
+
+  addiu $v0, $0, 88 # ROI
+  syscall
+
+  # Checksum
+  addiu $t6, $0, 31
+  addu  $a0, $0, $0
+  addu  $t0, $s0, $0
+  addu  $t3, $s3, $0
+check:
+  lw    $t4, 0($t3)
+  mul   $a0, $a0, $t6
+  addu  $a0, $a0, $t4
+  addiu $t3, $t3, 4
+  addiu $t0, $t0, -1
+  bne   $t0, $zero, check
+
+  addiu $v0, $0, 17
+  syscall
@@ -1,3 +1,5 @@
 from .isa import *
 
 from .assembler import assembler
+
+from . import program_cache
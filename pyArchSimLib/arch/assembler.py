@@ -2,405 +2,432 @@
 # --------------------------------------------------------------------
 #   Assembler to generate an executable binary for MIPS32.
 #
+#   The source is streamed line by line and every statement is emitted
+#   straight into the bytearray of its section, so memory only grows
+#   with the program being built. Instructions that refer to a label
+#   that is not defined yet are emitted as placeholders and patched
+#   once the whole source has been read (the second pass only visits
+#   these forward references).
+#
 # Author\ Khalid Al-Hawaj
 # Date  \ 02 May 2025
 
 import os
+import random
 import re
-import json
 import struct
-import random
 
-class assembler():
-  def __init__(s, isa):
-    s.arch = isa.arch()
-    s.dtype_re = isa.dtype_re
+from array import array
 
-  def getAlignment(s, decl):
-    match = s.dtype_re.match(decl)
+# A label definition at the start of a statement
+label_re = re.compile(r'\s*([^\s:,"\'#()]+)\s*:')
 
-    elem_sz   = 0
-    num_elems = 0
+# The (optional) offset and base register of a memory operand
+mem_re   = re.compile(r'^(.*)\((.*)\)$')
 
-    if match:
-      dtype = match.group(1).strip()
-      args  = match.group(2).strip()
+# The least/most-significant half of a label's address
+half_re  = re.compile(r'^(LSH|MSH)\((.*)\)$')
 
-      dtype_def = s.arch['dtypes'][dtype]
+# A string literal
+str_re   = re.compile(r'"(?:[^"\\]|\\.)*"|\'(?:[^\'\\]|\\.)*\'')
 
-      elem_sz = dtype_def['elem_sz']
-      syntax  = dtype_def['syntax' ]
+# Escape sequences of string literals
+esc_re   = re.compile(r'\\(x[0-9a-fA-F]{2}|[0-7]{1,3}|.)')
+escapes  = {'n': '\n', 't': '\t', 'r': '\r', '0': '\0', 'a': '\a', 'b': '\b',
+            'f': '\f', 'v': '\v', '\\': '\\', '\'': '\'', '"': '"'}
 
-    return elem_sz
+# Elements of sized data, by element size
+int_codes   = {1: 'B', 2: 'H', 4: 'I', 8: 'Q'}
+float_codes = {'float': 'f', 'double': 'd'}
 
-  def getAllocSize(s, decl):
-    match = s.dtype_re.match(decl)
+# Encodings of instructions that do not depend on their address are
+# reused for repeated statements, up to this many
+memo_limit = 1 << 16
 
-    elem_sz   = 0
-    num_elems = 0
+class AssemblerError(ValueError):
+  pass
 
-    if match:
-      dtype = match.group(1).strip()
-      args  = match.group(2).strip()
+class Unresolved(Exception):
+  # A label that is not (yet) defined
+  pass
 
-      dtype_def = s.arch['dtypes'][dtype]
+class Section():
+  def __init__(s, base_addr):
+    s.base_addr = base_addr
+    s.bytes     = bytearray()
 
-      elem_sz = dtype_def['elem_sz']
-      syntax  = dtype_def['syntax' ]
+  def addr(s):
+    return s.base_addr + len(s.bytes)
 
-      if   syntax == 'n':
-        num_elems = int(args)
-      elif syntax == 'str':
-        num_elems = len(eval(args))
-      elif syntax == 'strz':
-        num_elems = len(eval(args)) + 1
-      else:
-        num_elems = len(args.split(","))
-
-    return elem_sz, num_elems
-
-  def assembleDataDeclaration(s, decl):
-    match = s.dtype_re.match(decl)
-
-    byte_array = []
-    elem_sz    = 0
-    num_elems  = 0 
-    if match:
-      dtype = match.group(1).strip()
-      args  = match.group(2).strip()
-
-      dtype_def = s.arch['dtypes'][dtype]
-
-      elem_sz = dtype_def['elem_sz']
-      syntax  = dtype_def['syntax' ]
-
-      if syntax == 'n':
-        num_elems = int(args)
-        byte_array = [random.randint(0, 256) for _ in range(num_elems)]
-      elif syntax == 'str':
-        data = eval(args).encode(encoding="utf-8")
-        num_elems = len(data)
-        byte_array = [x for x in data]
-      elif syntax == 'strz':
-        data = eval(args).encode(encoding="utf-8")
-        num_elems = len(data) + 1
-        byte_array = [x for x in data]
-        byte_array.append(0)
-      else:
-        elems = args.split(",")
-        num_elems = len(elems)
-        for elem in elems:
-          data = eval(elem.strip())
-          for i in range(elem_sz):
-            byte_array.append(data & 0xff)
-            data = int(data / 0x100)
-
-    return elem_sz, num_elems, byte_array
-
-  def assembleInstruction(s, pc, inst_str, sym_tbl):
-    inst_parts = inst_str.split(" ")
-
-    byte_array = []
-
-    mnemonics = inst_parts[0].strip()
-    operands  = " ".join(inst_parts[1:]).strip()
-
-    inst_metadata = s.arch['insts'][mnemonics] if mnemonics in s.arch['insts'] else None
-
-    if inst_metadata:
-      op_syntax = inst_metadata['syntax'  ]
-      assemble  = inst_metadata['assemble']
-      opcode    = inst_metadata['opcode'  ]
-      funct     = inst_metadata['funct'   ]
-      cond      = inst_metadata['cond'    ]
-      shamt     = inst_metadata['shamt'   ]
-      code      = inst_metadata['code'    ]
-
-      operands_lst = [x.strip() for x in operands .split(",")]
-      syntax_lst   = [x.strip() for x in op_syntax.split(",")]
-
-      fields = {}
-      fields['opcode'] = opcode
-      fields['rd'    ] = 0
-      fields['rs'    ] = 0
-      fields['rt'    ] = 0
-      fields['shamt' ] = 0
-      fields['imm16' ] = 0
-      fields['imm26' ] = 0
-      fields['funct' ] = funct
-
-      for op,field in zip(operands_lst, syntax_lst):
-        if   field == 'd':
-          fields['rd'] = s.arch['regs'][op]
-        elif field == 'T':
-          fields['rt'] = s.arch['regs'][op]
-        elif field == 's':
-          fields['rs'] = s.arch['regs'][op]
-        elif field == 't':
-          fields['rt'] = s.arch['regs'][op]
-        elif field == 's':
-          fields['shamt'] = eval(op) & 0x1f
-        elif field == 'i':
-          lbl_re = re.compile(r"(^LSH|^MSH)\((.*)\)$")
-          parsed = lbl_re.match(op.strip())
-          if parsed:
-            addr = sym_tbl[parsed.group(2)]
-            if   parsed.group(1) == 'LSH':
-              op = (addr >>  0) & 0xffff
-            elif parsed.group(1) == 'MSH':
-              op = (addr >> 16) & 0xffff
-            op = '{:#010x}'.format(op)
-          fields['imm16'] = eval(op) & 0xffff
-        elif field == 'm':
-          mem_re = re.compile(r"^([\d]*)\((.*)\)$")
-          parsed = mem_re.match(op)
-          if parsed:
-            offset_str = '0'
-            if parsed.group(1) is not None:
-              offset_str = parsed.group(1).strip()
-            offset = eval(offset_str)
-            base_reg = s.arch['regs'][parsed.group(2).strip()]
-            fields['imm16'] = offset
-            fields['rs'   ] = base_reg
-        elif field == 'p':
-          # We use the PC-relative addressing mode
-          target_pc = sym_tbl[op]
-          offset = int((target_pc - pc - 4) / 4) & 0xffff
-          fields['imm16'] = offset
-        elif field == 'l':
-          # Pseudo-direct addressing mode
-          target_pc = sym_tbl[op]
-          assert(int(pc >> 26) == int(target_pc >> 26))
-          imm = (target_pc >> 2) & 0x3ffffff
-          fields['imm26'] = imm
-
-      # hawajkm: I don't know of a better way to handle the 'cond' field!
-      #          This shows how MIPS is not that elegant after all, aye.
-      if cond is not None:
-        fields['rt'] = cond
-
-      if shamt is not None:
-        fields['shamt'] = shamt
-
-      if code is not None:
-        fields['rs'   ] = (code >> 15) & 0x1f
-        fields['rt'   ] = (code >> 10) & 0x1f
-        fields['rd'   ] = (code >>  5) & 0x1f
-        fields['shamt'] = (code >>  0) & 0x1f
-
-      # Ready?
-      inst = assemble(fields)
-
-      byte_array = []
-      for i in range(4):
-        byte = inst & 0xff
-        byte_array.append(byte)
-        inst = int(inst / 0x100)
-    else:
-      print('')
-      print('  ERROR! Instruction with mnemonics \'{}\' is undefined.'.format(mnemonics))
-      print('')
-
-      exit(-1)
-
-    return byte_array
-
-  def getElem(s, elem):
-    if isinstance(elem, str):
-      return '\'{}\''.format(elem)
+class assembler():
+  def __init__(s, isa):
+    s.arch  = isa.arch()
+    s.regs  = s.arch['regs']
+    s.insts = s.arch['insts']
+
+    # Operand syntax of every instruction, split once
+    s.syntax = {m: [x.strip() for x in inst_def['syntax'].split(',')]
+                     if inst_def['syntax'] else []
+                for m, inst_def in s.insts.items()}
+
+  #=====================================================================
+  # Literals
+  #=====================================================================
+  def parseInt(s, tok):
+    try:
+      return int(tok.strip(), 0)
+    except ValueError:
+      raise AssemblerError('invalid integer \'{}\''.format(tok.strip()))
+
+  def parseStrings(s, args):
+    # Comma-separated string literals -> list of bytes
+    strs = []
+    pos  = 0
+    sep  = ''
+    for match in str_re.finditer(args):
+      if args[pos:match.start()].strip() != sep:
+        raise AssemblerError('expected string literals, got \'{}\''.format(args))
+      sep = ','
+
+      lit = match.group(0)[1:-1]
+      if '\\' in lit:
+        lit = esc_re.sub(s.unescape, lit)
+      strs.append(lit.encode('utf-8'))
+      pos = match.end()
+
+    if not strs or args[pos:].strip():
+      raise AssemblerError('expected string literals, got \'{}\''.format(args))
+    return strs
+
+  def unescape(s, match):
+    esc = match.group(1)
+    if esc[0] == 'x':
+      return chr(int(esc[1:], 16))
+    if esc[0] in '01234567' and (len(esc) > 1 or esc != '0'):
+      return chr(int(esc, 8))
+    return escapes.get(esc, '\\' + esc)
+
+  #=====================================================================
+  # Data
+  #=====================================================================
+  def emitData(s, sec, dtype, args):
+    dtype_def = s.arch['dtypes'][dtype]
+    elem_sz   = dtype_def['elem_sz']
+    syntax    = dtype_def['syntax' ]
+    out       = sec.bytes
+
+    # Align to the element size (padding is left uninitialized, i.e.,
+    # random)
+    pad = -sec.addr() % elem_sz
+    if pad:
+      out += random.randbytes(pad)
+    addr = sec.addr()
+
+    if   syntax == 'n':
+      for n in args.split(','):
+        out += random.randbytes(s.parseInt(n))
+    elif syntax == 'str':
+      for data in s.parseStrings(args):
+        out += data
+    elif syntax == 'strz':
+      for data in s.parseStrings(args):
+        out += data
+        out.append(0)
     else:
-      return '{}'.format(elem)
-
-  def assemble(s, raw_asm):
-    arch = s.arch
-
-    # Remove comments and empty lines
-    comm = re.compile(f'([^#]*)(#.*$)')
-    asm = []
-    for line in raw_asm:
-      match = comm.match(line)
-      if match is not None:
-        line = match.group(1)
-      if line.strip():
-        asm.append(line.strip())
-
-    # Inline all labels
-    old_asm = asm
-    asm = []
-    buffer = ''
-    for line in old_asm:
-      buffer = buffer + line
-      if line.endswith(':'):
-        buffer = buffer + ' '
+      elems = args.split(',')
+      if dtype in float_codes:
+        try:
+          vals = [float(x) for x in elems]
+        except ValueError:
+          raise AssemblerError('invalid number in \'{}\''.format(args))
+        out += struct.pack('<{}{}'.format(len(vals), float_codes[dtype]), *vals)
       else:
-        asm.append(buffer)
-        buffer = ''
-
-    # Process pseudo-instructions
-    # As if, lol...
-
-    # Let's support 'la' at least
-    la_re = re.compile(r'(^.*)(la)\s+(.*)\s*,\s*(.*)\s*$')
-    old_asm = asm
-    asm = []
-    buffer = ''
-    for line in old_asm:
-      buffer = buffer + line
-      if line.endswith(':'):
-        buffer = buffer + ' '
-      else:
-        parsed = la_re.match(buffer)
-
+        mask = (1 << (8 * elem_sz)) - 1
+        try:
+          vals = [int(x, 0) & mask for x in elems]
+        except ValueError:
+          vals = [s.parseInt(x) & mask for x in elems]
+        out += struct.pack('<{}{}'.format(len(vals), int_codes[elem_sz]), *vals)
+
+    return addr
+
+  def emitIncbin(s, sec, args, base_dir, includes):
+    # .incbin "file"[, offset[, length]]: the raw bytes of a file
+    match = str_re.match(args.strip())
+    if not match:
+      raise AssemblerError('.incbin takes a file name, got \'{}\''.format(args))
+    path = s.parseStrings(match.group(0))[0].decode('utf-8')
+    path = os.path.join(base_dir, path) if base_dir else path
+
+    rest   = args.strip()[match.end():].strip()
+    params = [s.parseInt(x) for x in rest[1:].split(',')] if rest.startswith(',') else []
+    if rest and not params or len(params) > 2:
+      raise AssemblerError('.incbin takes a file name, an offset and a length')
+    offset = params[0] if len(params) > 0 else 0
+    length = params[1] if len(params) > 1 else -1
+
+    addr = sec.addr()
+    try:
+      with open(path, 'rb') as f:
+        f.seek(offset)
+        sec.bytes += f.read(length)
+    except OSError as e:
+      raise AssemblerError('cannot include \'{}\': {}'.format(path, e.strerror))
+
+    includes.append(os.path.abspath(path))
+    return addr
+
+  #=====================================================================
+  # Instructions
+  #=====================================================================
+  def reg(s, op):
+    reg = s.regs.get(op)
+    if reg is None:
+      raise AssemblerError('unknown register \'{}\''.format(op))
+    return reg
+
+  def label(s, name, sym_tbl):
+    addr = sym_tbl.get(name)
+    if addr is None:
+      raise Unresolved(name)
+    return addr
+
+  def encode(s, pc, mnemonic, operands, sym_tbl):
+    inst_def = s.insts.get(mnemonic)
+    if inst_def is None:
+      raise AssemblerError('instruction with mnemonic \'{}\' is undefined'.format(mnemonic))
+
+    syntax = s.syntax[mnemonic]
+    if len(operands) != len(syntax):
+      raise AssemblerError('\'{}\' takes {} operand(s), got {}'.format(
+        mnemonic, len(syntax), len(operands)))
+
+    fields = {}
+    fields['opcode'] = inst_def['opcode']
+    fields['rd'    ] = 0
+    fields['rs'    ] = 0
+    fields['rt'    ] = 0
+    fields['shamt' ] = 0
+    fields['imm16' ] = 0
+    fields['imm26' ] = 0
+    fields['funct' ] = inst_def['funct']
+
+    for op, field in zip(operands, syntax):
+      if   field == 'd':
+        fields['rd'] = s.reg(op)
+      elif field == 'T' or field == 't':
+        fields['rt'] = s.reg(op)
+      elif field == 's':
+        fields['rs'] = s.reg(op)
+      elif field == 'S':
+        fields['shamt'] = s.parseInt(op) & 0x1f
+      elif field == 'i':
+        parsed = half_re.match(op)
         if parsed:
-          rd  = parsed.group(3)
-          lbl = parsed.group(4)
-          expand  = ''
-          expand +=        'lui {}, MSH({})'.format(rd, lbl)
-          expand += '\n' + 'ori {}, {}, LSH({})'.format(rd, rd, lbl)
-          buffer  = parsed.group(1) + expand
-
-        buffers = buffer.split('\n')
-        for buf in buffers:
-          asm.append(buf)
-        buffer = ''
-
-    # After this point, there should NEVER be any additions to static code
-    # hawajkm: we perhaps do not need en elaborate code to handle symbols?
+          addr = s.label(parsed.group(2).strip(), sym_tbl)
+          if parsed.group(1) == 'LSH': fields['imm16'] = (addr >>  0) & 0xffff
+          else:                        fields['imm16'] = (addr >> 16) & 0xffff
+        else:
+          fields['imm16'] = s.parseInt(op) & 0xffff
+      elif field == 'm':
+        parsed = mem_re.match(op)
+        if not parsed:
+          raise AssemblerError('invalid memory operand \'{}\''.format(op))
+        offset = parsed.group(1).strip()
+        fields['imm16'] = (s.parseInt(offset) if offset else 0) & 0xffff
+        fields['rs'   ] = s.reg(parsed.group(2).strip())
+      elif field == 'p':
+        # We use the PC-relative addressing mode
+        target_pc = s.label(op, sym_tbl)
+        fields['imm16'] = ((target_pc - pc - 4) >> 2) & 0xffff
+      elif field == 'l':
+        # Pseudo-direct addressing mode
+        target_pc = s.label(op, sym_tbl)
+        if (pc >> 28) != (target_pc >> 28):
+          raise AssemblerError('\'{}\' is out of the range of a jump'.format(op))
+        fields['imm26'] = (target_pc >> 2) & 0x3ffffff
+
+    # hawajkm: I don't know of a better way to handle the 'cond' field!
+    #          This shows how MIPS is not that elegant after all, aye.
+    if inst_def['cond'] is not None:
+      fields['rt'] = inst_def['cond']
+
+    if inst_def['shamt'] is not None:
+      fields['shamt'] = inst_def['shamt']
+
+    code = inst_def['code']
+    if code is not None:
+      fields['rs'   ] = (code >> 15) & 0x1f
+      fields['rt'   ] = (code >> 10) & 0x1f
+      fields['rd'   ] = (code >>  5) & 0x1f
+      fields['shamt'] = (code >>  0) & 0x1f
+
+    return inst_def['assemble'](fields)
+
+  def expand(s, mnemonic, operands):
+    # Pseudo-instructions -> list of (mnemonic, operands)
+    if mnemonic == 'la':
+      if len(operands) != 2:
+        raise AssemblerError('\'la\' takes 2 operand(s), got {}'.format(len(operands)))
+      rd, lbl = operands
+      return [('lui', [rd, 'MSH({})'.format(lbl)]),
+              ('ori', [rd, rd, 'LSH({})'.format(lbl)])]
+    return [(mnemonic, operands)]
+
+  #=====================================================================
+  # Assembly
+  #=====================================================================
+  def stripComment(s, line):
+    # Cuts the line at the first '#' outside of a string literal
+    if '"' not in line and '\'' not in line:
+      return line.partition('#')[0]
+
+    pos = 0
+    for match in str_re.finditer(line):
+      comm = line.find('#', pos, match.start())
+      if comm >= 0:
+        return line[:comm]
+      pos = match.end()
+    return line[:pos] + line[pos:].partition('#')[0]
+
+  def define(s, labels, addr, sym_tbl):
+    for label in labels:
+      if label in sym_tbl:
+        raise AssemblerError('label \'{}\' is defined twice'.format(label))
+      sym_tbl[label] = addr
+    labels.clear()
+
+  def assemble(s, raw_asm, base_dir=None):
+    # raw_asm is any iterable of source lines, e.g., an open file;
+    # .incbin paths are relative to base_dir (default: the working
+    # directory)
 
     # Symbol table
     sym_tbl = {}
 
     # Two sections: Data and Text
-    text_section = {'base_addr': 0x0400_0000,
-                    'bytes'    : [],
-                    'raw'      : [],
-                    'curr_addr': 0}
-    data_section = {'base_addr': 0x1000_0000,
-                    'bytes'    : [],
-                    'raw'      : [],
-                    'curr_addr': 0}
-
-    lst_dtypes = r'|'.join([r'\.' + x for x in s.arch['dtypes']])
-    data_directive = re.compile(r'(^{})(.*$)'.format(lst_dtypes))
-
-    # Fill-in the raw part of the sections and construct the symbol table
-    curr_section = 0 # By default, we are in the text section
-
-    # Initialize
-    text_section['curr_addr'] = text_section['base_addr']
-    data_section['curr_addr'] = data_section['base_addr']
-
-    for line in asm:
-      if   line.lower() == '.data':
-        curr_section = 1
-      elif line.lower() == '.text':
-        curr_section = 0
-      else:
-        # Get active section
-        section = None
-        if   curr_section == 0:
-          section = text_section
-        elif curr_section == 1:
-          section = data_section
-
-        # Get all labels
-        parts = [x.strip() for x in line.split(':')]
-        labels = parts[0:-1]
-        line   = parts[-1]
-
-        # Get address
-        addr = section['curr_addr']
-
-        # Process data
-        isDataDirective = s.dtype_re.match(line)
-        if isDataDirective:
-          elem_sz = s.getAlignment(line)
-          if addr % elem_sz != 0:
-            addr = addr + (elem_sz - (addr % elem_sz))
-            section['curr_addr'] = addr
-
-        # Add labels
-        for label in labels:
-          if label in sym_tbl:
-            continue # hawajkm: throw error
+    text_section = Section(0x0400_0000)
+    data_section = Section(0x1000_0000)
+    section      = text_section # By default, we are in the text section
+
+    # Labels waiting for the statement they mark
+    pending = []
+
+    # Instructions with forward references:
+    # (section, offset, pc, mnemonic, operands, line number)
+    fixups = []
+
+    # Encodings of address-independent statements
+    memo = {}
+
+    # Files included with .incbin
+    includes = []
+
+    # Source line of every word of the text section
+    lines = array('I')
+
+    dtypes = s.arch['dtypes']
+
+    lineno = 0
+    try:
+      for lineno, line in enumerate(raw_asm, 1):
+        # Remove comments
+        if '#' in line:
+          line = s.stripComment(line)
+
+        # Labels
+        if ':' in line:
+          match = label_re.match(line)
+          while match:
+            pending.append(match.group(1))
+            line  = line[match.end():]
+            match = label_re.match(line)
+
+        line = line.strip()
+        if not line:
+          continue
+
+        parts = line.split(None, 1)
+        head  = parts[0]
+        args  = parts[1] if len(parts) > 1 else ''
+
+        # Directives
+        if head[0] == '.':
+          name = head[1:]
+          if name.lower() in ('data', 'text'):
+            s.define(pending, section.addr(), sym_tbl)
+            section = data_section if name.lower() == 'data' else text_section
+            continue
+
+          if name == 'incbin':
+            addr = s.emitIncbin(section, args, base_dir, includes)
+          elif name in dtypes:
+            addr = s.emitData(section, name, args)
           else:
-            sym_tbl[label] = addr
-
-        allocSize = 4
-
-        # Process data
-        isDataDirective = s.dtype_re.match(line)
-        if isDataDirective:
-          directive = isDataDirective.group(1).strip()
-          elems     = isDataDirective.group(2).strip()
-
-          elems = elems.replace(r'"', r"'")
-          elems_decl = eval(r"[{}]".format(elems))
-          line = [r'.' + directive + ' ' + s.getElem(x) for x in elems_decl]
-
-          allocSize = 0
-          for alloc in line:
-            elem_sz, num_elems = s.getAllocSize(alloc)
-            allocSize += (num_elems * elem_sz)
-
-        section['curr_addr'] += allocSize
-
-        # Add to section
-        if type(line) is list:
-          section['raw'].extend(line)
-        else:
-          section['raw'].append(line)
-
-    # Substitute symbols
-
-    # Generate binary
-    ## Start with data section
-    addr = data_section['base_addr']
-    for decl in data_section['raw']:
-      elem_sz, num_elems, byte_array = s.assembleDataDeclaration(decl)
-      if addr % elem_sz != 0:
-        padding_sz = elem_sz - (addr % elem_sz)
-        addr += padding_sz
-        # Add padding
-        data_section['bytes'].extend([random.randint(0, 256) for _ in range(padding_sz)])
-      data_section['bytes'].extend(byte_array)
-      addr += (num_elems * elem_sz)
-
-    ## Now, we do the text section
-    addr = text_section['base_addr']
-    for inst in text_section['raw']:
-      byte_array = s.assembleInstruction(addr, inst, sym_tbl)
-      # All instructions should be aligned
-      text_section['bytes'].extend(byte_array)
-      addr += len(byte_array)
-
-    # Print it?
-    #print('Text Section:----------------------')
-    #print(os.linesep.join(['  ' + x for x in text_section['raw']]))
-    #print('-----------------------------------')
-    #print('Data Section:----------------------')
-    #print(os.linesep.join(['  ' + x for x in data_section['raw']]))
-    #print('-----------------------------------')
-    #print('Symbol Table:----------------------')
-    #for x in sym_tbl:
-    #  print("{} | {:#010x}".format(x.ljust(15), sym_tbl[x]))
-    #print('-----------------------------------')
-    #print('Assembled Data Section:------------', end='')
-    #i = 0
-    #for i in range(len(data_section['bytes'])):
-    #  if i % 16 == 0: print('\n{:#010x}  '.format(data_section['base_addr'] + i), end='')
-    #  print("{:02x} ".format(data_section['bytes'][i]), end='')
-    #print('\n-----------------------------------')
-    #print('Assembled Text Section:------------', end='')
-    #i = 0
-    #for i in range(len(text_section['bytes'])):
-    #  if i % 16 == 0: print('\n{:#010x}  '.format(text_section['base_addr'] + i), end='')
-    #  print("{:02x} ".format(text_section['bytes'][i]), end='')
-    #print('\n-----------------------------------')
+            raise AssemblerError('unknown directive \'{}\''.format(head))
+
+          if pending:
+            s.define(pending, addr, sym_tbl)
+          if section is text_section:
+            lines.extend([lineno] * (-(-len(section.bytes) // 4) - len(lines)))
+          continue
+
+        # Instructions
+        if pending:
+          s.define(pending, section.addr(), sym_tbl)
+
+        word = memo.get(line)
+        if word is not None:
+          section.bytes += word
+          if section is text_section:
+            lines.append(lineno)
+          continue
+
+        operands = [x.strip() for x in args.split(',')] if args else []
+        insts    = s.expand(head, operands)
+
+        pure = len(insts) == 1 and 'SH(' not in line
+        for mnemonic, ops in insts:
+          pc = section.addr()
+          try:
+            inst = s.encode(pc, mnemonic, ops, sym_tbl)
+          except Unresolved:
+            fixups.append((section, len(section.bytes), pc, mnemonic, ops, lineno))
+            inst = 0
+            pure = False
+
+          word = inst.to_bytes(4, 'little')
+          section.bytes += word
+          if section is text_section:
+            lines.append(lineno)
+
+          if pure and not set(s.syntax[mnemonic]) & {'p', 'l'}:
+            if len(memo) >= memo_limit:
+              memo.clear()
+            memo[line] = word
+
+      # Trailing labels mark the end of their section
+      s.define(pending, section.addr(), sym_tbl)
+
+      # Resolve forward references
+      for section, offset, pc, mnemonic, ops, lineno in fixups:
+        try:
+          inst = s.encode(pc, mnemonic, ops, sym_tbl)
+        except Unresolved as e:
+          raise AssemblerError('undefined label \'{}\''.format(e.args[0]))
+        section.bytes[offset:offset + 4] = inst.to_bytes(4, 'little')
+
+    except AssemblerError as e:
+      raise AssemblerError('line {}: {}'.format(lineno, e)) from None
 
     elf = {}
     elf['sections'] = {}
-    elf['sections']['data'] = data_section
-    elf['sections']['text'] = text_section
+    elf['sections']['data'] = {'base_addr': data_section.base_addr,
+                               'bytes'    : data_section.bytes}
+    elf['sections']['text'] = {'base_addr': text_section.base_addr,
+                               'bytes'    : text_section.bytes}
+    elf['symbols' ] = sym_tbl
+    elf['includes'] = includes
+    elf['lines'   ] = lines
 
     return elf
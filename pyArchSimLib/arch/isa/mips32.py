@@ -159,6 +159,49 @@ class mips32():
     ret['code'    ] = code
     return ret
 
+  #=============================================
+  # Decoder
+  #=============================================
+  # Fields an instruction can be selected by, in the order they are
+  # looked at while decoding: (name, shift, mask)
+  decode_fields = (
+    ('opcode', 26, 0x3f),
+    ('funct' ,  0, 0x3f),
+    ('cond'  , 16, 0x1f),
+    ('shamt' ,  6, 0x1f),
+  )
+
+  @classmethod
+  def build_decoder(cls, insts, mnemonics=None, level=0):
+    # Builds a decode tree out of the instruction definitions. Inner
+    # nodes are (shift, mask, {field value: node}) and leaves are the
+    # mnemonics; every lookup walks at most len(decode_fields) levels.
+    if mnemonics is None:
+      mnemonics = list(insts)
+
+    # Find the next field any of the candidates is selected by
+    for i in range(level, len(cls.decode_fields)):
+      name, shift, mask = cls.decode_fields[i]
+      if any(insts[m][name] is not None for m in mnemonics):
+        break
+    else:
+      if len(mnemonics) != 1:
+        raise ValueError('Ambiguous encoding for {}'.format(', '.join(mnemonics)))
+      return mnemonics[0]
+
+    groups = {}
+    for m in mnemonics:
+      val = insts[m][name]
+      if val is None:
+        raise ValueError('Ambiguous encoding for \'{}\': no {} field'.format(m, name))
+      groups.setdefault(val & mask, []).append(m)
+
+    children = {}
+    for val, group in groups.items():
+      children[val] = cls.build_decoder(insts, group, i + 1)
+
+    return (shift, mask, children)
+
   #=============================================
   # Accessors
   #=============================================
@@ -341,6 +384,9 @@ class mips32():
     ## Syscall
     cls.__arch__['insts']['syscall'] = cls.define_syscall   (0x00, funct=0x0c, code=0x00)
 
+    # Decoder
+    cls.__arch__['decoder'] = cls.build_decoder(cls.__arch__['insts'])
+
     #cls.lst_dtypes = r'|'.join([r'\.' + x for x in cls.__arch__['dtypes']])
     cls.lst_dtypes = r'|'.join([r'\b{}\b'.format(x) for x in cls.__arch__['dtypes']])
     cls.dtype_re = re.compile(r'^\.({})(.*$)'.format(cls.lst_dtypes))
@@ -0,0 +1,134 @@
+# program_cache.py
+# --------------------------------------------------------------------
+#   On-disk cache of assembled programs.
+#
+#   Assembled programs are stored content-addressed: the key is a
+#   SHA-256 of the assembly source, the ISA description and the
+#   assembler itself, so editing any of them assembles afresh. Entries
+#   are compact binary files:
+#
+#     MAGIC, version (u32), header length (u32), header (UTF-8 JSON:
+#     section names, base addresses and sizes, symbol table, files
+#     included with .incbin and their SHA-256, length of the line map),
+#     then the bytes of every section, in header order, and the source
+#     line of every word of the text section (u32 each, host order).
+#
+#   An entry whose included files changed is assembled afresh.
+#
+#   The cache lives in $PASIM_CACHE_DIR, or ~/.cache/pyarchsim.
+#
+#   The assembler fills .space declarations and alignment padding with
+#   random bytes, so a cached program keeps the ones it was first
+#   assembled with.
+
+import hashlib
+import inspect
+import json
+import os
+import struct
+import tempfile
+
+from array import array
+from .assembler import assembler
+
+MAGIC   = b'PASIMELF'
+VERSION = 3
+
+def cache_dir():
+  return os.environ.get('PASIM_CACHE_DIR') or os.path.join(
+    os.path.expanduser('~'), '.cache', 'pyarchsim')
+
+def source_digest(path):
+  # SHA-256 of a file (a source or an included file), read in chunks
+  h = hashlib.sha256()
+  with open(path, 'rb') as f:
+    for chunk in iter(lambda: f.read(1 << 20), b''):
+      h.update(chunk)
+  return h.hexdigest()
+
+def program_key(digest, isa):
+  h = hashlib.sha256()
+  h.update(struct.pack('<I', VERSION))
+  for module in (inspect.getmodule(isa), inspect.getmodule(assembler)):
+    with open(inspect.getsourcefile(module), 'rb') as f:
+      h.update(f.read())
+  h.update(digest.encode())
+  return h.hexdigest()
+
+def save(path, elf):
+  header = {
+    'sections': [[name, sec['base_addr'], len(sec['bytes'])]
+                 for name, sec in elf['sections'].items()],
+    'symbols' : elf['symbols'],
+    'includes': [[inc, source_digest(inc)] for inc in elf['includes']],
+    'lines'   : len(elf['lines']),
+  }
+  header = json.dumps(header).encode()
+
+  # Written under a temporary name and renamed, so concurrent runs never
+  # read a partial entry
+  fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+  try:
+    with os.fdopen(fd, 'wb') as f:
+      f.write(MAGIC)
+      f.write(struct.pack('<II', VERSION, len(header)))
+      f.write(header)
+      for sec in elf['sections'].values():
+        f.write(sec['bytes'])
+      f.write(elf['lines'].tobytes())
+    os.replace(tmp, path)
+  except BaseException:
+    os.unlink(tmp)
+    raise
+
+def load(path):
+  with open(path, 'rb') as f:
+    if f.read(len(MAGIC)) != MAGIC:
+      raise ValueError('{} is not an assembled program'.format(path))
+
+    version, header_len = struct.unpack('<II', f.read(8))
+    if version != VERSION:
+      raise ValueError('{}: unsupported version {}'.format(path, version))
+
+    header   = json.loads(f.read(header_len).decode())
+    sections = {}
+    for name, base_addr, size in header['sections']:
+      data = f.read(size)
+      if len(data) != size:
+        raise ValueError('{}: truncated'.format(path))
+      sections[name] = {'base_addr': base_addr, 'bytes': data}
+
+    lines = array('I')
+    lines.frombytes(f.read(header['lines'] * lines.itemsize))
+    if len(lines) != header['lines']:
+      raise ValueError('{}: truncated'.format(path))
+
+  for inc, digest in header['includes']:
+    if source_digest(inc) != digest:
+      raise ValueError('{}: {} changed'.format(path, inc))
+
+  return {'sections': sections, 'symbols': header['symbols'],
+          'includes': [inc for inc, _ in header['includes']], 'lines': lines}
+
+def assemble(isa, asm_file, use_cache=True):
+  # Returns (elf, whether it came from the cache). A missing or broken
+  # entry is (re)assembled; an unwritable cache is not an error.
+  if use_cache:
+    path = os.path.join(cache_dir(), program_key(source_digest(asm_file), isa) + '.elf')
+    try:
+      return load(path), True
+    except (OSError, ValueError, KeyError):
+      pass
+
+  # The assembler streams the source
+  with open(asm_file) as f:
+    elf = assembler(isa).assemble(f, os.path.dirname(os.path.abspath(asm_file)))
+
+  if use_cache:
+    try:
+      os.makedirs(os.path.dirname(path), exist_ok=True)
+      save(path, elf)
+    except OSError:
+      pass
+
+  return elf, False
@@ -5,16 +5,38 @@
 #
 # Description:
 #   Cache subpackage initializer. Imports and exposes
-#   NoCache, DirectMappedCache, and SetAssociativeCache
-#   for easy access from higher‐level components.
+#   NoCache, DirectMappedCache, SetAssociativeCache, and SharedCache,
+#   the prefetchers and replacement policies, and the make_cache/
+#   make_shared_cache factories, for easy access from higher‐level
+#   components.
 # =============================================================================
 
 from .no_cache import NoCache
 from .direct_mapped   import DirectMappedCache
 from .set_associative import SetAssociativeCache
+from .shared          import SharedCache
+from .prefetch        import NextLinePrefetcher, StridePrefetcher, StreamPrefetcher
+from .replacement     import LRUPolicy, PLRUPolicy, RandomPolicy, FIFOPolicy
+from .replacement     import SRRIPPolicy, BRRIPPolicy, LFUPolicy
+from .factory         import make_cache, make_shared_cache, parse_cache_cfg, connect
 
 __all__ = [
      'NoCache',
      'DirectMappedCache',
      'SetAssociativeCache',
+     'SharedCache',
+     'NextLinePrefetcher',
+     'StridePrefetcher',
+     'StreamPrefetcher',
+     'LRUPolicy',
+     'PLRUPolicy',
+     'RandomPolicy',
+     'FIFOPolicy',
+     'SRRIPPolicy',
+     'BRRIPPolicy',
+     'LFUPolicy',
+     'make_cache',
+     'make_shared_cache',
+     'parse_cache_cfg',
+     'connect',
 ]
\ No newline at end of file
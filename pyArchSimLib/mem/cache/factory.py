@@ -0,0 +1,181 @@
+# =============================================================================
+# File: factory.py
+#
+# Description:
+#   Builds caches from configuration strings:
+#
+#     none
+#     dm:SIZE:LINE_SZ[:OPTION=VALUE...]
+#     sa:SIZE:WAYS:LINE_SZ[:POLICY][:OPTION=VALUE...]
+#
+#   POLICY is the replacement policy of a set-associative cache:
+#   lru (the default), plru, random, fifo, srrip, brrip or lfu.
+#
+#   Options:
+#     penalty=N : miss penalty in cycles (default 10)
+#     write=wb  : write-back, write-allocate (default)
+#     write=wt  : write-through, no-allocate
+#     mshrs=N   : lockup-free, with N MSHRs (default 0: blocking)
+#     prefetch=next|stride|stream : hardware prefetcher (default none)
+#     degree=N  : lines (strides) a prefetch runs ahead (default 1,
+#                 4 for stream)
+#     entries=N : stride table entries (default 64) or stream buffers
+#                 (default 4)
+#
+#   The shared levels below the L1s (L2, L3) take dm or sa strings, and
+#   the same options but those of MSHRs and prefetching, plus:
+#     latency=N : hit latency in cycles (default 0)
+# =============================================================================
+
+from .no_cache        import NoCache
+from .direct_mapped   import DirectMappedCache
+from .set_associative import SetAssociativeCache, WRITE_POLICIES
+from .shared          import SharedCache
+from .prefetch        import prefetcher_types
+from .replacement     import replacement_policies
+
+# Positional parameters of each cache type
+cache_types = {
+    'dm': (DirectMappedCache,   ('size', 'line_size')),
+    'sa': (SetAssociativeCache, ('size', 'ways', 'line_size')),
+}
+
+def write_policy(val):
+    if val not in WRITE_POLICIES:
+        raise ValueError(val)
+    return val
+
+def prefetch_kind(val):
+    if val != 'none' and val not in prefetcher_types:
+        raise ValueError(val)
+    return val
+
+# Options: name -> (constructor keyword, value parser)
+cache_options = {
+    'penalty': ('miss_penalty', int),
+    'write'  : ('write_policy', write_policy),
+}
+
+# Options of the L1s only
+l1_options = {
+    'mshrs'   : ('mshrs', int),
+    'prefetch': ('prefetch', prefetch_kind),
+    'degree'  : ('pf_degree', int),
+    'entries' : ('pf_entries', int),
+}
+
+# Options of the shared levels only
+shared_options = {
+    'latency': ('hit_latency', int),
+}
+
+def parse_cache_cfg(cfg, shared=False):
+    # Returns (kind, positional parameters, keyword options); raises
+    # ValueError on malformed strings
+    known = dict(cache_options, **(shared_options if shared else l1_options))
+    fields = cfg.split(':')
+    kind   = fields[0]
+
+    if kind == 'none':
+        if len(fields) > 1:
+            raise ValueError(f'cache config "{cfg}": "none" takes no parameters')
+        return kind, {}, {}
+
+    if kind not in cache_types:
+        raise ValueError(f'cache config "{cfg}": unknown cache type "{kind}"')
+
+    _, names = cache_types[kind]
+    params   = [f for f in fields[1:] if '=' not in f]
+    options  = [f for f in fields[1:] if '='     in f]
+
+    # A set-associative cache may name its replacement policy last
+    kwargs = {}
+    if (kind == 'sa' and len(params) == len(names) + 1
+            and params[-1] in replacement_policies
+            and fields[len(names) + 1] == params[-1]):
+        kwargs['replacement'] = params.pop()
+
+    if len(params) != len(names) or fields[1:len(names) + 1] != params:
+        raise ValueError(f'cache config "{cfg}": expected '
+                         + ':'.join([kind] + [n.upper() for n in names])
+                         + ('[:POLICY]' if kind == 'sa' else '')
+                         + '[:OPTION=VALUE...]')
+
+    try:
+        params = dict(zip(names, map(int, params)))
+    except ValueError:
+        raise ValueError(f'cache config "{cfg}": parameters must be integers')
+
+    # Every set holds whole lines, and there is at least one set
+    if min(params.values()) <= 0:
+        raise ValueError(f'cache config "{cfg}": parameters must be positive')
+    set_size = params.get('ways', 1) * params['line_size']
+    if params['size'] % set_size:
+        raise ValueError(f'cache config "{cfg}": SIZE must be a multiple of '
+                         + ('WAYS * LINE_SIZE' if kind == 'sa' else 'LINE_SIZE')
+                         + f' ({set_size} B)')
+
+    for opt in options:
+        key, _, val = opt.partition('=')
+        if key not in known:
+            raise ValueError(f'cache config "{cfg}": unknown option "{key}"')
+        kw, parse = known[key]
+        try:
+            kwargs[kw] = parse(val)
+        except ValueError:
+            raise ValueError(f'cache config "{cfg}": bad value for "{key}"')
+
+    return kind, params, kwargs
+
+def make_cache(cfg, port, lower):
+    kind, params, kwargs = parse_cache_cfg(cfg)
+    if kind == 'none':
+        return NoCache(port)
+
+    check_line_size(cfg, params['line_size'], lower)
+    kwargs['prefetcher'] = make_prefetcher(cfg, params['line_size'], kwargs)
+    cls, _ = cache_types[kind]
+    return cls(port, lower=lower, **params, **kwargs)
+
+def make_prefetcher(cfg, line_size, kwargs):
+    # Takes the prefetching options out of kwargs
+    kind    = kwargs.pop('prefetch', 'none')
+    options = {k: kwargs.pop('pf_' + k) for k in ('degree', 'entries')
+               if 'pf_' + k in kwargs}
+    if kind == 'none':
+        if options:
+            raise ValueError(f'cache config "{cfg}": "{next(iter(options))}" '
+                             'needs a prefetcher')
+        return None
+
+    cls = prefetcher_types[kind]
+    for key in options:
+        if key not in cls.options:
+            raise ValueError(f'cache config "{cfg}": the {kind} prefetcher takes '
+                             f'no "{key}"')
+    return cls(line_size, **options)
+
+def make_shared_cache(cfg, nports, lower, port=0):
+    # A cache below the L1s with nports requesters, on port of lower
+    kind, params, kwargs = parse_cache_cfg(cfg, shared=True)
+    if kind == 'none':
+        raise ValueError(f'cache config "{cfg}": a shared level cannot be "none"')
+    if kind == 'dm':
+        params['ways'] = 1
+
+    check_line_size(cfg, params['line_size'], lower)
+    return SharedCache(nports, lower=lower, port_id=port, **params, **kwargs)
+
+def check_line_size(cfg, line_size, lower):
+    # A line is filled from a single line of the level below
+    lower_line = getattr(lower, 'line_sz', None)
+    if lower_line is not None and line_size > lower_line:
+        raise ValueError(f'cache config "{cfg}": {line_size} B lines do not fit '
+                         f'in the {lower_line} B lines of the level below')
+
+def connect(upper, lower):
+    # Point a cache (or processor) at the ports of the level below
+    upper.setMemCanReq  (lower.canReq  )
+    upper.setMemSendReq (lower.sendReq )
+    upper.setMemHasResp (lower.hasResp )
+    upper.setMemRecvResp(lower.recvResp)
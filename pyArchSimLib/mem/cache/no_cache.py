@@ -38,6 +38,23 @@ class NoCache():
   def tick(s):
     pass
 
+  # Never busy on its own
+  def quietCycles(s):
+    return None
+  def skipCycles(s, n):
+    pass
+
+  # Nothing to checkpoint
+  def getState(s):
+    return {}
+  def setState(s, state):
+    pass
+
   # Nothing happens
+  trace_strs = ('      ',)
+
+  def traceCode(s):
+    return 0
+
   def linetrace(s):
-    return '      '
+    return s.trace_strs[0]
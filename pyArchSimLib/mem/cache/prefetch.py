@@ -0,0 +1,114 @@
+# =============================================================================
+# File: prefetch.py
+#
+# Description:
+#   Hardware prefetchers for the L1 caches. A cache reports every demand
+#   access to its prefetcher (access()), which answers with the lines it
+#   wants brought in; the cache drops those that are present or already
+#   on their way and fetches the rest when its port to the lower level
+#   is idle (see set_associative.py).
+#
+#     next   : next-N-line; a miss, or the first hit on a prefetched
+#              line (tagged prefetching), asks for the next degree lines
+#     stride : PC-indexed stride (a reference prediction table); a load
+#              or store whose address moved by the same stride twice in
+#              a row asks for degree strides ahead, at least a line each
+#     stream : stream buffers; a miss outside every stream starts a new
+#              one, replacing the least recently used, and every access
+#              inside a stream keeps it degree lines ahead
+# =============================================================================
+
+class Prefetcher:
+    options = ('degree',)   # configuration options it takes
+
+    def __init__(self, line_size, degree=1):
+        if degree <= 0:
+            raise ValueError(f'the prefetch degree must be positive, got {degree}')
+        self.line_sz = line_size
+        self.degree  = degree
+
+    def access(self, addr, pc, trigger):
+        # Lines (line addresses) to prefetch after a demand access; trigger
+        # is set on a miss and on the first hit on a prefetched line
+        return []
+
+class NextLinePrefetcher(Prefetcher):
+    def access(self, addr, pc, trigger):
+        if not trigger:
+            return []
+        line = addr // self.line_sz
+        return [line + k for k in range(1, self.degree + 1)]
+
+class StridePrefetcher(Prefetcher):
+    options = ('degree', 'entries')
+
+    def __init__(self, line_size, degree=1, entries=64):
+        super().__init__(line_size, degree)
+        if entries <= 0 or entries & (entries - 1):
+            raise ValueError(f'stride table entries must be a power of two, got {entries}')
+        self.mask  = entries - 1
+        self.table = [None] * entries   # [pc, last address, stride, confident]
+
+    def access(self, addr, pc, trigger):
+        if pc is None:
+            return []
+        idx   = (pc >> 2) & self.mask
+        entry = self.table[idx]
+        if entry is None or entry[0] != pc:
+            self.table[idx] = [pc, addr, 0, False]
+            return []
+
+        stride   = addr - entry[1]
+        entry[1] = addr
+        if stride != entry[2]:
+            entry[2] = stride
+            entry[3] = False
+            return []
+        entry[3] = True
+        if stride == 0:
+            return []
+
+        # Strides within a line still step a line at a time
+        step = stride
+        if abs(step) < self.line_sz:
+            step = self.line_sz if stride > 0 else -self.line_sz
+        return [(addr + k * step) // self.line_sz for k in range(1, self.degree + 1)]
+
+class StreamPrefetcher(Prefetcher):
+    options = ('degree', 'entries')
+
+    def __init__(self, line_size, degree=4, entries=4):
+        super().__init__(line_size, degree)
+        if entries <= 0:
+            raise ValueError(f'the number of streams must be positive, got {entries}')
+        self.entries = entries
+        # Per stream, [first line not demanded yet, next line to
+        # prefetch], from least to most recently used
+        self.streams = []
+
+    def access(self, addr, pc, trigger):
+        line = addr // self.line_sz
+        for stream in self.streams:
+            if stream[0] <= line < stream[1]:
+                self.streams.remove(stream)
+                break
+        else:
+            if not trigger:
+                return []
+            if len(self.streams) == self.entries:
+                del self.streams[0]
+            stream = [line + 1, line + 1]
+
+        # Run the stream degree lines ahead of the access
+        first     = stream[1]
+        stream[0] = line + 1
+        stream[1] = line + 1 + self.degree
+        self.streams.append(stream)
+        return list(range(first, stream[1]))
+
+# Prefetcher types, by configuration name
+prefetcher_types = {
+    'next'  : NextLinePrefetcher,
+    'stride': StridePrefetcher,
+    'stream': StreamPrefetcher,
+}
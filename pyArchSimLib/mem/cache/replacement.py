@@ -0,0 +1,174 @@
+# =============================================================================
+# File: replacement.py
+#
+# Description:
+#   Replacement policies of the set-associative caches. A policy keeps
+#   its state in compact arrays, per set or indexed by set * ways + way,
+#   and is told about every hit (touch()) and every fill (insert()),
+#   which update it in constant time (tree-PLRU: one step per level).
+#   victim() picks the way to replace once every way of the set is
+#   valid; the caches fill invalid ways in order before asking, and
+#   scan the set only then (LRU, RRIP and LFU look for the oldest,
+#   most distant or least used line).
+#
+#     lru    : least recently used (the default)
+#     plru   : tree pseudo-LRU, one bit per node of a binary tree over
+#              the ways (a power of two)
+#     random : uniformly random, from a seeded generator so that runs
+#              repeat
+#     fifo   : first in, first out (round-robin per set)
+#     srrip  : static re-reference interval prediction, 2-bit RRPVs;
+#              lines are inserted with a long re-reference interval
+#     brrip  : bimodal RRIP; lines are inserted with a distant interval
+#              but one in BRRIP_EPSILON fills, resisting scans
+#     lfu    : least frequently used, 8-bit saturating counters; ties go
+#              to the lowest way
+# =============================================================================
+
+import random
+
+RRPV_MAX      = 3    # 2-bit re-reference prediction values
+BRRIP_EPSILON = 32   # brrip inserts one fill in this many like srrip
+RANDOM_SEED   = 1
+
+class LRUPolicy:
+    def __init__(self, n_sets, ways):
+        # Per set, the time of the last access of every line; unused
+        # ways are older than any access, lowest way first
+        self.stamp = [list(range(-ways, 0)) for _ in range(n_sets)]
+        self.clock = 0
+
+    def touch(self, set_id, way):
+        self.stamp[set_id][way] = self.clock
+        self.clock += 1
+
+    insert = touch
+
+    def victim(self, set_id):
+        stamp = self.stamp[set_id]
+        return stamp.index(min(stamp))
+
+class PLRUPolicy:
+    def __init__(self, n_sets, ways):
+        if ways & (ways - 1):
+            raise ValueError(f'tree-PLRU needs a power-of-two number of ways, got {ways}')
+        self.ways   = ways
+        self.levels = ways.bit_length() - 1
+        # Per set, the node bits of the tree (node 1 is the root, node
+        # i has children 2i and 2i+1); a bit points to the colder half
+        self.bits   = [0] * n_sets
+
+    def touch(self, set_id, way):
+        # Point every node on the way's path away from it
+        bits = self.bits[set_id]
+        node = 1
+        for level in range(self.levels - 1, -1, -1):
+            right = (way >> level) & 1
+            if right:
+                bits &= ~(1 << node)
+            else:
+                bits |=  (1 << node)
+            node = 2 * node + right
+        self.bits[set_id] = bits
+
+    insert = touch
+
+    def victim(self, set_id):
+        bits = self.bits[set_id]
+        node = 1
+        for _ in range(self.levels):
+            node = 2 * node + ((bits >> node) & 1)
+        return node - self.ways
+
+class RandomPolicy:
+    def __init__(self, n_sets, ways, seed=RANDOM_SEED):
+        self.ways = ways
+        self.rng  = random.Random(seed)
+
+    def touch(self, set_id, way):
+        pass
+
+    insert = touch
+
+    def victim(self, set_id):
+        return self.rng.randrange(self.ways)
+
+class FIFOPolicy:
+    def __init__(self, n_sets, ways):
+        self.ways = ways
+        self.next = [0] * n_sets   # oldest way of every set
+
+    def touch(self, set_id, way):
+        pass
+
+    insert = touch
+
+    def victim(self, set_id):
+        way = self.next[set_id]
+        self.next[set_id] = (way + 1) % self.ways
+        return way
+
+class SRRIPPolicy:
+    def __init__(self, n_sets, ways):
+        self.ways = ways
+        self.rrpv = bytearray([RRPV_MAX] * (n_sets * ways))
+
+    def touch(self, set_id, way):
+        self.rrpv[set_id * self.ways + way] = 0
+
+    def insert(self, set_id, way):
+        self.rrpv[set_id * self.ways + way] = RRPV_MAX - 1
+
+    def victim(self, set_id):
+        # The first line predicted to be re-referenced in the distant
+        # future, ageing the set until there is one
+        base = set_id * self.ways
+        rrpv = self.rrpv[base:base + self.ways]
+        age  = RRPV_MAX - max(rrpv)
+        if age:
+            for way in range(self.ways):
+                self.rrpv[base + way] += age
+        return rrpv.index(max(rrpv))
+
+class BRRIPPolicy(SRRIPPolicy):
+    def __init__(self, n_sets, ways):
+        super().__init__(n_sets, ways)
+        self.fills = 0
+
+    def insert(self, set_id, way):
+        self.fills = (self.fills + 1) % BRRIP_EPSILON
+        self.rrpv[set_id * self.ways + way] = RRPV_MAX - (self.fills == 0)
+
+class LFUPolicy:
+    def __init__(self, n_sets, ways):
+        self.ways  = ways
+        self.count = bytearray(n_sets * ways)
+
+    def touch(self, set_id, way):
+        i = set_id * self.ways + way
+        if self.count[i] < 255:
+            self.count[i] += 1
+
+    def insert(self, set_id, way):
+        self.count[set_id * self.ways + way] = 1
+
+    def victim(self, set_id):
+        base  = set_id * self.ways
+        count = self.count[base:base + self.ways]
+        return count.index(min(count))
+
+# Replacement policies, by configuration name
+replacement_policies = {
+    'lru'   : LRUPolicy,
+    'plru'  : PLRUPolicy,
+    'random': RandomPolicy,
+    'fifo'  : FIFOPolicy,
+    'srrip' : SRRIPPolicy,
+    'brrip' : BRRIPPolicy,
+    'lfu'   : LFUPolicy,
+}
+
+def make_replacement(name, n_sets, ways):
+    if name not in replacement_policies:
+        raise ValueError(f'unknown replacement policy "{name}"')
+    return replacement_policies[name](n_sets, ways)
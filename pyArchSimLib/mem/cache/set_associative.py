@@ -4,37 +4,123 @@
 # Date:   2025-05-21
 #
 # Description:
-#   Implements an N-way set-associative L1 cache with LRU replacement,
-#   hit/miss counters, and configurable miss-penalty.
+#   Implements an N-way set-associative L1 cache with pluggable
+#   replacement (LRU by default, see replacement.py), hit/miss
+#   counters, configurable miss-penalty, write-back/write-allocate or
+#   write-through/no-allocate stores, an optional lockup-free mode with
+#   miss status holding registers (MSHRs), and an optional hardware
+#   prefetcher.
 # =============================================================================
 
+from .replacement import make_replacement
+
 MISS_PENALTY = 10  # cycles of extra delay on a miss
+PREFETCHES   = 8   # prefetches on their way at most
+
+# Write policies
+#   wb : write-back, write-allocate; stores dirty the line, and a dirty
+#        line is written back to the lower level when it is evicted
+#   wt : write-through, no-allocate; every store is sent to the lower
+#        level, and a store miss does not bring the line in
+WRITE_POLICIES = ('wb', 'wt')
+
+# Lockup-free mode (mshrs=N > 0)
+#   Every missing line gets an MSHR, which counts its own miss penalty
+#   down and then fetches the line; the cache keeps serving requests
+#   meanwhile (hit-under-miss, miss-under-miss) until all N MSHRs are
+#   busy. A miss to a line that already has an MSHR is merged into it
+#   (a secondary miss). Loads are answered when their line arrives,
+#   stores (write-allocate) right away; their data is merged into the
+#   line when it arrives. Fills are matched to their MSHR by tag (the
+#   line address); the victim of a fill is picked, and written back if
+#   dirty, when the line arrives.
+#
+#   With mshrs=0 (the default) the cache blocks on a miss: nothing is
+#   accepted until the line is in and the request answered.
+
+# Prefetching (see prefetch.py)
+#   The prefetcher sees every demand access and names lines to bring
+#   in. Each one that is neither present nor on its way counts the miss
+#   penalty down like a miss, then is fetched as soon as the port to the
+#   lower level is idle, and installed like a demand fill without
+#   counting as a demand miss. A demand miss on a line whose
+#   prefetch is still on its way takes the prefetch over (a late
+#   prefetch). A prefetched line is useful if a demand access hits it;
+#   a prefetch pollutes if a demand access misses on the line it
+#   evicted.
 
 class SetAssociativeCache:
-    def __init__(self, port_id, size, ways, line_size, lower):
+    def __init__(self, port_id, size, ways, line_size, lower, miss_penalty=MISS_PENALTY,
+                 write_policy='wb', mshrs=0, prefetcher=None, replacement='lru'):
+        if write_policy not in WRITE_POLICIES:
+            raise ValueError(f'unknown write policy "{write_policy}"')
+        if mshrs < 0:
+            raise ValueError(f'the number of MSHRs must not be negative, got {mshrs}')
+
         self.port_id      = port_id
         self.line_sz      = line_size
         self.n_sets       = (size // line_size) // ways
         self.ways         = ways
         self.lower        = lower
+        self.miss_penalty = miss_penalty
+        self.write_policy = write_policy
+        self.mshrs        = mshrs
+        self.prefetcher   = prefetcher
 
-        # Storage: valid/tag/data per [set][way]
+        # Storage: valid/dirty/tag/data per [set][way]
         self.valid        = [[False]*ways for _ in range(self.n_sets)]
+        self.dirty        = [[False]*ways for _ in range(self.n_sets)]
         self.tags         = [[None]*ways  for _ in range(self.n_sets)]
         self.data         = [[bytearray(line_size) for _ in range(ways)]
                               for _ in range(self.n_sets)]
 
-        # Simple LRU: list of ways, 0 = LRU, end = MRU
-        self.lru          = [[i for i in range(ways)] for _ in range(self.n_sets)]
+        # Replacement policy
+        self.replacement  = replacement
+        self.repl         = make_replacement(replacement, self.n_sets, ways)
 
         # State
         self.pending      = None   # (set_id, way_to_evict, tag, orig_req)
         self.resp_buf     = None
+        self.resp_q       = []     # further responses (lockup-free mode)
         self.penalty_rem  = 0      # cycles remaining on current miss
+        self.lower_q      = []     # lower-level requests not sent yet
+        self.lower_busy   = False  # a lower-level request is outstanding
+
+        # MSHRs (lockup-free mode): line address -> [cycles left of the
+        # miss penalty, fill sent, waiting requests], in allocation order
+        self.mshr         = {}
+
+        # Prefetches: line address -> [cycles left of the miss penalty,
+        # fill sent], in issue order; the lines whose outstanding fill is
+        # a prefetch's (also once a demand miss took it over); the ways
+        # holding a prefetched line that was not used yet; and the lines
+        # that prefetches evicted
+        self.pf           = {}
+        self.pf_fills     = set()
+        self.prefetched   = [[False]*ways for _ in range(self.n_sets)]
+        self.pf_victims   = set()
 
         # Statistics
         self.hits         = 0
         self.misses       = 0
+        self.miss_cycles  = 0      # cycles spent serving misses
+        self.write_hits   = 0
+        self.write_misses = 0
+        self.writebacks   = 0      # dirty lines written back
+        self.read_bytes   = 0      # traffic from the lower level
+        self.write_bytes  = 0      # traffic to the lower level
+        self.merges       = 0      # secondary misses merged into an MSHR
+        self.hits_under_miss   = 0
+        self.misses_under_miss = 0
+        self.mshr_cycles       = 0 # busy MSHRs summed over all cycles
+        self.mshr_full_cycles  = 0 # cycles with every MSHR busy
+        self.mshr_peak         = 0 # most MSHRs busy at once
+        self.pf_issued    = 0      # prefetch fills sent
+        self.pf_useful    = 0      # prefetched lines hit by a demand access
+        self.pf_late      = 0      # demand misses that took a prefetch over
+        self.pf_unused    = 0      # prefetched lines evicted before any use
+        self.pf_polluting = 0      # demand misses on a line a prefetch evicted
+        self.pf_dropped   = 0      # lines not prefetched, all PREFETCHES busy
 
     # Hook multi-port memory interface
     def setMemCanReq(self, fn):   self.MemCanReq   = fn
@@ -44,98 +130,435 @@ class SetAssociativeCache:
 
     # Upstream interface
     def canReq(self):
+        if self.mshrs:
+            return self.resp_buf is None and len(self.mshr) < self.mshrs
         return (self.resp_buf is None and self.penalty_rem == 0
                 and self.pending is None)
 
+    def respond(self, req, data):
+        resp = {
+            'op':   req['op'], 'addr': req['addr'],
+            'data': list(data), 'size': req['size'],
+            'mask': req['mask'], 'tag': req['tag']
+        }
+        if self.resp_buf is None:
+            self.resp_buf = resp
+        else:
+            self.resp_q.append(resp)
+
+    def sendLower(self, op, addr, data, size):
+        # Queue a request to the lower level; they are sent in order.
+        # They only model timing and traffic: memory got the data of a
+        # write functionally when the store was made
+        self.lower_q.append({
+            'op':   op, 'data': data,
+            'addr': addr,
+            'size': size, 'mask': None,
+            'tag':  addr,
+            'timing_only': True
+        })
+        if op == 1:
+            self.write_bytes += size
+        else:
+            self.read_bytes  += size
+
     def sendReq(self, req):
-        assert self.resp_buf is None and self.penalty_rem == 0 and self.pending is None
+        assert self.canReq()
+        trigger = self.access(req)
+        if self.prefetcher:
+            self.prefetch(req, trigger)
+
+    def access(self, req):
+        # Serve a demand request; returns whether it should trigger
+        # prefetches: a miss, or the first hit on a prefetched line
         addr    = req['addr']
         set_id  = (addr // self.line_sz) % self.n_sets
         tag_val = addr // (self.line_sz * self.n_sets)
 
+        # Stores update memory functionally right away, so that it always
+        # holds the architectural state (syscalls, fast-forwarding and
+        # dumps read it directly); the write policy only decides the
+        # traffic the lower level sees and when
+        store = req['op'] == 1
+        if store:
+            self.lower.write(addr, req['data'], req['size'])
+            if self.write_policy == 'wt':
+                self.sendLower(1, addr, req['data'], req['size'])
+
         # Search for hit
         for way in range(self.ways):
             if self.valid[set_id][way] and self.tags[set_id][way] == tag_val:
                 self.hits += 1
+                if self.mshr:
+                    self.hits_under_miss += 1
                 off   = addr % self.line_sz
-                chunk = self.data[set_id][way][off:off+req['size']]
-                self.resp_buf = {
-                    'op':   req['op'], 'addr': addr,
-                    'data': list(chunk), 'size': req['size'],
-                    'mask': req['mask'], 'tag': req['tag']
-                }
-                # Update LRU: move this way to MRU
-                self.lru[set_id].remove(way)
-                self.lru[set_id].append(way)
-                return
+                if store:
+                    self.write_hits += 1
+                    self.data[set_id][way][off:off+req['size']] = req['data']
+                    if self.write_policy == 'wb':
+                        self.dirty[set_id][way] = True
+                self.respond(req, self.data[set_id][way][off:off+req['size']])
+                self.repl.touch(set_id, way)
+                if self.prefetched[set_id][way]:
+                    self.prefetched[set_id][way] = False
+                    self.pf_useful += 1
+                    return True
+                return False
+
+        self.misses += 1
+        line = addr // self.line_sz
+        if line in self.pf_victims:
+            self.pf_victims.discard(line)
+            self.pf_polluting += 1
+        if store:
+            self.write_misses += 1
+            if self.write_policy == 'wt':
+                # No allocation: the store is done once it is sent
+                self.respond(req, req['data'])
+                return True
+
+        # A prefetch of the line on its way: the miss takes it over
+        late = self.pf.pop(line, None)
+        if late is not None:
+            self.pf_late += 1
+
+        if self.mshrs:
+            self.allocate(req, late)
+            return True
 
         # Miss: start penalty
-        self.misses      += 1
-        self.penalty_rem = MISS_PENALTY
+        self.penalty_rem = self.miss_penalty if late is None else late[0]
         # choose eviction way now but delay issuing
-        evict_way        = self.lru[set_id].pop(0)
+        evict_way        = self.victim(set_id)
         self.pending     = (set_id, evict_way, tag_val, req)
+        if late is not None and late[1]:
+            # The fill is already on its way
+            if self.valid[set_id][evict_way] and self.dirty[set_id][evict_way]:
+                self.writeback(set_id, evict_way)
+            self._miss_issued = True
+        return True
+
+    def allocate(self, req, late=None):
+        # Lockup-free miss: merge into the line's MSHR or take a free one
+        # (which carries on from a late prefetch of the line)
+        line  = req['addr'] // self.line_sz
+        entry = self.mshr.get(line)
+        if entry is not None:
+            self.merges += 1
+        else:
+            if self.mshr:
+                self.misses_under_miss += 1
+            if late is None:
+                late = [self.miss_penalty, False]
+            entry = self.mshr[line] = late + [[]]
+            self.mshr_peak = max(self.mshr_peak, len(self.mshr))
+        entry[2].append(req)
+        if req['op'] == 1:
+            self.respond(req, req['data'])
+
+    def prefetch(self, req, trigger):
+        # Queue the lines the prefetcher asks for, but those present or on
+        # their way
+        pending = self.pending and self.pending[3]['addr'] // self.line_sz
+        for line in self.prefetcher.access(req['addr'], req['pc'], trigger):
+            if (line < 0 or (line * self.line_sz) >> 32 or line in self.pf
+                    or line in self.mshr or line == pending):
+                continue
+            if self.lookup(line % self.n_sets, line // self.n_sets) is not None:
+                continue
+            if len(self.pf) == PREFETCHES:
+                self.pf_dropped += 1
+                continue
+            self.pf[line] = [self.miss_penalty, False]
+
+    def victim(self, set_id):
+        # Invalid ways are filled in order before the policy picks one
+        valid = self.valid[set_id]
+        if not valid[-1]:
+            return valid.index(False)
+        return self.repl.victim(set_id)
+
+    def lookup(self, set_id, tag_val):
+        for way in range(self.ways):
+            if self.valid[set_id][way] and self.tags[set_id][way] == tag_val:
+                return way
+        return None
 
     def hasResp(self):
         return self.resp_buf is not None
 
     def recvResp(self):
         resp          = self.resp_buf
-        self.resp_buf = None
+        self.resp_buf = self.resp_q.pop(0) if self.resp_q else None
         return resp
 
     def tick(self):
-        # Stall during penalty
-        if self.penalty_rem > 0:
-            self.penalty_rem -= 1
+        if self.mshrs:
+            self.tickMshrs()
+        else:
+            # Cycles with a miss outstanding
+            if self.pending:
+                self.miss_cycles += 1
+
+            # Stall during penalty
+            if self.penalty_rem > 0:
+                self.penalty_rem -= 1
+
+            # After penalty, issue the lower-level fetch if not already
+            # done, behind the writeback of a dirty victim
+            else:
+                if self.pending and not hasattr(self, '_miss_issued'):
+                    set_id, way, tag_val, orig = self.pending
+                    if self.valid[set_id][way] and self.dirty[set_id][way]:
+                        self.writeback(set_id, way)
+                    aligned_addr = (orig['addr'] // self.line_sz) * self.line_sz
+                    self.sendLower(0, aligned_addr, [], self.line_sz)
+                    self._miss_issued = True
+
+                self.issueLower()
+                if self.lower_busy:
+                    self.recvLower()
+
+        if self.prefetcher:
+            self.tickPrefetches()
+
+    def tickMshrs(self):
+        busy = len(self.mshr)
+        if busy:
+            self.miss_cycles += 1
+            self.mshr_cycles += busy
+            if busy == self.mshrs:
+                self.mshr_full_cycles += 1
+
+        # Every MSHR counts its penalty down, then sends its fill
+        for line, entry in self.mshr.items():
+            if entry[0] > 0:
+                entry[0] -= 1
+            elif not entry[1]:
+                self.sendLower(0, line * self.line_sz, [], self.line_sz)
+                entry[1] = True
+
+        self.issueLower()
+        self.recvLower()
+
+    def tickPrefetches(self):
+        # Every prefetch counts the miss penalty down, then sends its fill
+        # once the port to the lower level is idle
+        for line, entry in self.pf.items():
+            if entry[0] > 0:
+                entry[0] -= 1
+            elif not entry[1] and not self.lower_q and not self.lower_busy:
+                self.sendLower(0, line * self.line_sz, [], self.line_sz)
+                entry[1] = True
+                self.pf_fills.add(line)
+                self.pf_issued += 1
+                self.issueLower()
+
+        # A blocking cache does not look at the lower level during the
+        # miss penalty
+        self.recvLower()
+
+    def recvLower(self):
+        # Check for responses; writes only hold the port, a fill completes
+        # a prefetch or a miss
+        while self.lower_busy and self.MemHasResp(self.port_id):
+            resp_lower      = self.MemRecvResp(self.port_id)
+            self.lower_busy = False
+            if resp_lower['op'] == 0:
+                self.recvFill(resp_lower)
+            self.issueLower()
+
+    def recvFill(self, resp_lower):
+        # The line of a prefetch is read again: it was sent before any
+        # demand access wanted it, and stores may have reached memory
+        # since the lower level read it
+        line = resp_lower['tag'] // self.line_sz
+        if line in self.pf_fills:
+            self.pf_fills.discard(line)
+            data = self.lower.read(line * self.line_sz, self.line_sz)
+            if line in self.pf:
+                self.fillPrefetch(line, data)
+                return
+            resp_lower = dict(resp_lower, data=data)
+
+        if self.mshrs:
+            self.fillMshr(resp_lower)
+        else:
+            self.fill(resp_lower)
+
+    def issueLower(self):
+        if self.lower_q and not self.lower_busy and self.MemCanReq(self.port_id):
+            self.MemSendReq(self.port_id, self.lower_q.pop(0))
+            self.lower_busy = True
+
+    def writeback(self, set_id, way):
+        victim_addr = (self.tags[set_id][way] * self.n_sets + set_id) * self.line_sz
+        self.sendLower(1, victim_addr, bytes(self.data[set_id][way]), self.line_sz)
+        self.writebacks += 1
+        self.dirty[set_id][way] = False
+
+    def unusedPrefetch(self, set_id, way):
+        # The line in way is replaced
+        if self.prefetched[set_id][way]:
+            self.prefetched[set_id][way] = False
+            self.pf_unused += 1
+
+    def fill(self, resp_lower):
+        set_id, way, tag_val, orig = self.pending
+        self.unusedPrefetch(set_id, way)
+
+        # Install block; memory already holds the data of a store miss,
+        # which dirties the line like a store hit
+        clean = bytearray(resp_lower['data'])
+        self.data[set_id][way][:] = clean
+        self.valid[set_id][way]   = True
+        self.dirty[set_id][way]   = orig['op'] == 1
+        self.tags[set_id][way]    = tag_val
+        self.repl.insert(set_id, way)
+
+        # Satisfy original
+        off = orig['addr'] % self.line_sz
+        self.respond(orig, clean[off:off+orig['size']])
+
+        # Clear miss state
+        self.pending = None
+        del self._miss_issued
+
+    def fillMshr(self, resp_lower):
+        line    = resp_lower['tag'] // self.line_sz
+        targets = self.mshr.pop(line)[2]
+        set_id  = line % self.n_sets
+
+        # Evict a way, writing it back if dirty
+        way = self.victim(set_id)
+        if self.valid[set_id][way] and self.dirty[set_id][way]:
+            self.writeback(set_id, way)
+        self.unusedPrefetch(set_id, way)
+
+        # Replay the waiting requests in order: stores merge their data
+        # (the line may have been read before they were made), loads get
+        # their answer
+        line_data = self.data[set_id][way]
+        line_data[:] = bytearray(resp_lower['data'])
+        for req in targets:
+            off = req['addr'] % self.line_sz
+            if req['op'] == 1:
+                line_data[off:off+req['size']] = req['data']
+            else:
+                self.respond(req, line_data[off:off+req['size']])
+
+        self.valid[set_id][way] = True
+        self.dirty[set_id][way] = any(req['op'] == 1 for req in targets)
+        self.tags[set_id][way]  = line // self.n_sets
+        self.repl.insert(set_id, way)
+
+    def fillPrefetch(self, line, data):
+        # Install a prefetched line like a demand fill, unless a blocking
+        # miss is about to replace a way of the set
+        del self.pf[line]
+        set_id = line % self.n_sets
+        if self.pending and self.pending[0] == set_id:
             return
 
-        # After penalty, issue the lower-level fetch if not already done
+        way = self.victim(set_id)
+        if self.valid[set_id][way]:
+            self.pf_victims.add(self.tags[set_id][way] * self.n_sets + set_id)
+            if self.dirty[set_id][way]:
+                self.writeback(set_id, way)
+        self.unusedPrefetch(set_id, way)
+
+        self.data[set_id][way][:]    = data
+        self.valid[set_id][way]      = True
+        self.dirty[set_id][way]      = False
+        self.tags[set_id][way]       = line // self.n_sets
+        self.prefetched[set_id][way] = True
+        self.repl.insert(set_id, way)
+        self.pf_victims.discard(line)
+
+    # Event-driven simulation: the miss penalty is a pure countdown, an
+    # idle cache only reacts to requests from above, and while a request
+    # to the lower level is outstanding, the lower level reports when it
+    # answers
+    def quietCycles(self):
+        quiet = self.quietMshrs() if self.mshrs else self.quietBlocking()
+        if self.pf and quiet != 0:
+            pf_quiet = self.quietPrefetches()
+            if quiet is None or (pf_quiet is not None and pf_quiet < quiet):
+                quiet = pf_quiet
+        return quiet
+
+    def quietBlocking(self):
+        if self.penalty_rem > 0:
+            return self.penalty_rem
+        if self.resp_buf or self.lower_q:
+            return 0
         if self.pending and not hasattr(self, '_miss_issued'):
-            set_id, way, tag_val, orig = self.pending
-            aligned_addr = (orig['addr'] // self.line_sz) * self.line_sz
-            miss_req = {
-                'op':   0, 'data': [],
-                'addr': aligned_addr,
-                'size': self.line_sz, 'mask': None,
-                'tag':  aligned_addr
-            }
-            self.MemSendReq(self.port_id, miss_req)
-            self._miss_issued = True
+            return 0
+        return None
 
-        # Advance lower memory
-        self.lower.tick()
-
-        # Check for response
-        if self.pending and self.MemHasResp(self.port_id):
-            resp_lower        = self.MemRecvResp(self.port_id)
-            set_id, way, tag_val, orig = self.pending
-
-            # Install block
-            clean = bytearray((b & 0xFF) for b in resp_lower['data'])
-            self.data[set_id][way][:] = clean
-            self.valid[set_id][way]   = True
-            self.tags[set_id][way]    = tag_val
-            self.lru[set_id].append(way)
-
-            # Satisfy original
-            addr = orig['addr']
-            off  = addr % self.line_sz
-            sz   = orig['size']
-            chunk = clean[off:off+sz]
-            self.resp_buf = {
-                'op':   orig['op'], 'addr': addr,
-                'data': list(chunk), 'size': sz,
-                'mask': orig['mask'],  'tag': orig['tag']
-            }
-
-            # Clear miss state
-            self.pending = None
-            del self._miss_issued
+    def quietMshrs(self):
+        if self.resp_buf or self.lower_q:
+            return 0
+        quiet = None
+        for entry in self.mshr.values():
+            if not entry[1]:
+                if entry[0] == 0:
+                    return 0
+                if quiet is None or entry[0] < quiet:
+                    quiet = entry[0]
+        return quiet
 
-    def linetrace(self):
+    def quietPrefetches(self):
+        # A prefetch done with the penalty waits for the port to be idle
+        quiet = None
+        for entry in self.pf.values():
+            if not entry[1]:
+                if entry[0] == 0:
+                    if not self.lower_busy:
+                        return 0
+                elif quiet is None or entry[0] < quiet:
+                    quiet = entry[0]
+        return quiet
+
+    def skipCycles(self, n):
+        for entry in self.pf.values():
+            entry[0] = max(entry[0] - n, 0)
+
+        if self.mshrs:
+            busy = len(self.mshr)
+            if busy:
+                self.miss_cycles += n
+                self.mshr_cycles += n * busy
+                if busy == self.mshrs:
+                    self.mshr_full_cycles += n
+            for entry in self.mshr.values():
+                entry[0] = max(entry[0] - n, 0)
+            return
+
+        if self.pending:
+            self.miss_cycles += n
+        self.penalty_rem = max(self.penalty_rem - n, 0)
+
+    # Checkpointing: everything but the connections
+    ckpt_skip = ('lower', 'MemCanReq', 'MemSendReq', 'MemHasResp', 'MemRecvResp')
+
+    def getState(self):
+        return {k: v for k, v in vars(self).items() if k not in self.ckpt_skip}
+
+    def setState(self, state):
+        # The miss-issued marker only exists while a miss is outstanding
+        vars(self).pop('_miss_issued', None)
+        vars(self).update(state)
+
+    # Linetracing: traceCode() indexes trace_strs
+    trace_strs = ('       ', 'SA:hit ', 'SA:miss')
+
+    def traceCode(self):
         if self.resp_buf:
-            return 'SA:hit '
-        if self.pending or self.penalty_rem > 0:
-            return 'SA:miss'
-        return '       '
+            return 1
+        if self.pending or self.penalty_rem > 0 or self.mshr:
+            return 2
+        return 0
+
+    def linetrace(self):
+        return self.trace_strs[self.traceCode()]
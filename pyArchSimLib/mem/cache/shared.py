@@ -0,0 +1,300 @@
+# =============================================================================
+# File: shared.py
+#
+# Description:
+#   Implements a set-associative cache shared by several requesters, for
+#   the levels below the L1 caches (L2, L3). It has the port-indexed
+#   interface of the main memory (canReq(i), sendReq(i, req), ...), so
+#   the L1s, or a shared level above it, connect to it exactly like they
+#   connect to memory; it reaches its own lower level through one port
+#   of that level (setMemCanReq() and friends, like an L1).
+#
+#   One access is served at a time. Requests that arrive while the
+#   cache is busy wait in their port and are picked round-robin. A hit
+#   is answered after the hit latency, a miss after the hit latency,
+#   the miss penalty and the fill from the lower level. Stores, and
+#   writebacks from the level above, follow the write policy like in
+#   an L1 (see set_associative.py); so does replacement (LRU by default,
+#   see replacement.py).
+# =============================================================================
+
+from .set_associative import MISS_PENALTY, WRITE_POLICIES
+from .replacement     import make_replacement
+
+class SharedCache:
+    def __init__(self, nports, size, ways, line_size, lower, port_id=0,
+                 miss_penalty=MISS_PENALTY, hit_latency=0, write_policy='wb',
+                 replacement='lru'):
+        if write_policy not in WRITE_POLICIES:
+            raise ValueError(f'unknown write policy "{write_policy}"')
+
+        self.nports       = nports
+        self.port_id      = port_id    # our port on the lower level
+        self.line_sz      = line_size
+        self.n_sets       = (size // line_size) // ways
+        self.ways         = ways
+        self.lower        = lower
+        self.miss_penalty = miss_penalty
+        self.hit_latency  = hit_latency
+        self.write_policy = write_policy
+
+        # Storage: valid/dirty/tag/data per [set][way]
+        self.valid        = [[False]*ways for _ in range(self.n_sets)]
+        self.dirty        = [[False]*ways for _ in range(self.n_sets)]
+        self.tags         = [[None]*ways  for _ in range(self.n_sets)]
+        self.data         = [[bytearray(line_size) for _ in range(ways)]
+                              for _ in range(self.n_sets)]
+
+        # Replacement policy
+        self.replacement  = replacement
+        self.repl         = make_replacement(replacement, self.n_sets, ways)
+
+        # Upstream ports
+        self.req_buf      = [None] * nports
+        self.resp_buf     = [None] * nports
+        self.next_port    = 0      # round-robin arbitration
+
+        # Access in progress: (port, req, (set_id, way, tag) of a miss,
+        # response data of a hit)
+        self.cur          = None
+        self.wait         = 0      # cycles left before it moves on
+        self.lower_q      = []     # lower-level requests not sent yet
+        self.lower_busy   = False  # a lower-level request is outstanding
+
+        # Statistics
+        self.hits         = 0
+        self.misses       = 0
+        self.miss_cycles  = 0      # cycles spent serving misses
+        self.write_hits   = 0
+        self.write_misses = 0
+        self.writebacks   = 0      # dirty lines written back
+        self.read_bytes   = 0      # traffic from the lower level
+        self.write_bytes  = 0      # traffic to the lower level
+        self.accesses     = [0] * nports
+        self.queue_cycles = 0      # request-cycles spent waiting for a port
+
+    # Hook multi-port memory interface
+    def setMemCanReq(self, fn):   self.MemCanReq   = fn
+    def setMemSendReq(self, fn):  self.MemSendReq  = fn
+    def setMemHasResp(self, fn):  self.MemHasResp  = fn
+    def setMemRecvResp(self, fn): self.MemRecvResp = fn
+
+    def lookup(self, set_id, tag_val):
+        for way in range(self.ways):
+            if self.valid[set_id][way] and self.tags[set_id][way] == tag_val:
+                return way
+        return None
+
+    def victim(self, set_id):
+        # Invalid ways are filled in order before the policy picks one
+        valid = self.valid[set_id]
+        if not valid[-1]:
+            return valid.index(False)
+        return self.repl.victim(set_id)
+
+    # Functional accesses (syscalls, loading, fast-forwarding, and the
+    # levels above updating memory on every store): memory is always
+    # current, and resident lines are kept current with it
+    def read(self, addr, size):
+        return self.lower.read(addr, size)
+
+    def write(self, addr, data, size, mask=None):
+        done = 0
+        while done < size:
+            line   = (addr + done) // self.line_sz
+            off    = (addr + done) %  self.line_sz
+            n      = min(size - done, self.line_sz - off)
+            set_id = line % self.n_sets
+            way    = self.lookup(set_id, line // self.n_sets)
+            if way is not None:
+                self.data[set_id][way][off:off+n] = data[done:done+n]
+            done  += n
+        self.lower.write(addr, data, size, mask)
+
+    # Upstream interface
+    def canReq(self, i):
+        return self.req_buf[i] is None
+
+    def sendReq(self, i, req):
+        assert self.req_buf[i] is None
+        self.req_buf[i] = req
+        if self.cur is None:
+            self.arbitrate()
+
+    def hasResp(self, i):
+        return self.resp_buf[i] is not None
+
+    def recvResp(self, i):
+        resp             = self.resp_buf[i]
+        self.resp_buf[i] = None
+        return resp
+
+    def respond(self, i, req, data):
+        self.resp_buf[i] = {
+            'op':   req['op'], 'addr': req['addr'],
+            'data': list(data), 'size': req['size'],
+            'mask': req['mask'], 'tag': req['tag']
+        }
+
+    def sendLower(self, op, addr, data, size):
+        # Queue a request to the lower level; they are sent in order.
+        # They only model timing and traffic: memory got the data of a
+        # write functionally when the store was made
+        self.lower_q.append({
+            'op':   op, 'data': data,
+            'addr': addr,
+            'size': size, 'mask': None,
+            'tag':  addr,
+            'timing_only': True
+        })
+        if op == 1:
+            self.write_bytes += size
+        else:
+            self.read_bytes  += size
+
+    def issueLower(self):
+        if self.lower_q and not self.lower_busy and self.MemCanReq(self.port_id):
+            self.MemSendReq(self.port_id, self.lower_q.pop(0))
+            self.lower_busy = True
+
+    def arbitrate(self):
+        # Start serving the next waiting request, round-robin over ports
+        for k in range(self.nports):
+            i = (self.next_port + k) % self.nports
+            if self.req_buf[i] is not None:
+                req              = self.req_buf[i]
+                self.req_buf[i]  = None
+                self.next_port   = (i + 1) % self.nports
+                self.access(i, req)
+                return
+
+    def access(self, i, req):
+        self.accesses[i] += 1
+        addr    = req['addr']
+        set_id  = (addr // self.line_sz) % self.n_sets
+        tag_val = addr // (self.line_sz * self.n_sets)
+        off     = addr % self.line_sz
+        store   = req['op'] == 1
+
+        # Like memory, a store from a cache-less port takes effect when it
+        # gets here, and keeps resident lines current. The writes of the
+        # caches above (write-throughs and writebacks) were made long
+        # ago and may be stale by now; they only cost time and traffic
+        if store and not req.get('timing_only'):
+            self.write(addr, req['data'], req['size'])
+        if store and self.write_policy == 'wt':
+            self.sendLower(1, addr, req['data'], req['size'])
+
+        way = self.lookup(set_id, tag_val)
+        if way is not None:
+            self.hits += 1
+            if store:
+                self.write_hits += 1
+                if self.write_policy == 'wb':
+                    self.dirty[set_id][way] = True
+            self.repl.touch(set_id, way)
+            self.cur  = (i, req, None, self.data[set_id][way][off:off+req['size']])
+            self.wait = self.hit_latency
+        else:
+            self.misses += 1
+            if store:
+                self.write_misses += 1
+            if store and self.write_policy == 'wt':
+                # No allocation: the store is done once it is sent
+                self.cur  = (i, req, None, req['data'])
+                self.wait = self.hit_latency
+            else:
+                way       = self.victim(set_id)
+                self.cur  = (i, req, (set_id, way, tag_val), None)
+                self.wait = self.hit_latency + self.miss_penalty
+
+        if self.wait == 0:
+            self.advance()
+
+    def advance(self):
+        # The latency of the current access is over: answer a hit, or send
+        # a miss to the lower level, behind the writeback of a dirty victim
+        i, req, miss, data = self.cur
+        if miss is None:
+            self.respond(i, req, data)
+            self.cur = None
+            return
+
+        set_id, way, tag_val = miss
+        if self.valid[set_id][way] and self.dirty[set_id][way]:
+            victim_addr = (self.tags[set_id][way] * self.n_sets + set_id) * self.line_sz
+            self.sendLower(1, victim_addr, bytes(self.data[set_id][way]), self.line_sz)
+            self.writebacks += 1
+            self.dirty[set_id][way] = False
+        aligned_addr = (req['addr'] // self.line_sz) * self.line_sz
+        self.sendLower(0, aligned_addr, [], self.line_sz)
+
+    def fill(self, resp_lower):
+        i, req, (set_id, way, tag_val), _ = self.cur
+
+        # Install block; memory already holds the data of a store miss,
+        # which dirties the line like a store hit. The line is read again:
+        # stores may have reached memory since the lower level read it
+        aligned_addr = (req['addr'] // self.line_sz) * self.line_sz
+        clean = bytearray(self.lower.read(aligned_addr, self.line_sz))
+        self.data[set_id][way][:] = clean
+        self.valid[set_id][way]   = True
+        self.dirty[set_id][way]   = req['op'] == 1
+        self.tags[set_id][way]    = tag_val
+        self.repl.insert(set_id, way)
+
+        off = req['addr'] % self.line_sz
+        self.respond(i, req, clean[off:off+req['size']])
+        self.cur = None
+
+    def tick(self):
+        self.queue_cycles += self.nports - self.req_buf.count(None)
+
+        if self.cur is not None:
+            if self.cur[2] is not None:
+                self.miss_cycles += 1
+            if self.wait > 0:
+                self.wait -= 1
+                if self.wait == 0:
+                    self.advance()
+
+        # Lower-level requests go out in order; writes only hold the
+        # port, the fill completes the miss
+        self.issueLower()
+        while self.lower_busy and self.MemHasResp(self.port_id):
+            resp_lower      = self.MemRecvResp(self.port_id)
+            self.lower_busy = False
+            if resp_lower['op'] == 0:
+                self.fill(resp_lower)
+            self.issueLower()
+
+        if self.cur is None:
+            self.arbitrate()
+
+    # Event-driven simulation: the latencies are pure countdowns; while
+    # a request to the lower level is outstanding, the lower level
+    # reports when it answers
+    def quietCycles(self):
+        if self.lower_q or any(r is not None for r in self.resp_buf):
+            return 0
+        if self.cur is None:
+            return 0 if self.req_buf.count(None) < self.nports else None
+        if self.wait > 0:
+            return self.wait - 1
+        return None
+
+    def skipCycles(self, n):
+        self.queue_cycles += n * (self.nports - self.req_buf.count(None))
+        if self.cur is not None:
+            if self.cur[2] is not None:
+                self.miss_cycles += n
+            self.wait = max(self.wait - n, 0)
+
+    # Checkpointing: everything but the connections
+    ckpt_skip = ('lower', 'MemCanReq', 'MemSendReq', 'MemHasResp', 'MemRecvResp')
+
+    def getState(self):
+        return {k: v for k, v in vars(self).items() if k not in self.ckpt_skip}
+
+    def setState(self, state):
+        vars(self).update(state)
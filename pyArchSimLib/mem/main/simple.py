@@ -5,10 +5,21 @@
 # Author\ Khalid Al-Hawaj
 # Date  \ 4 May 2025
 
+import mmap
+import os
+import zlib
 import random
 
 class SimpleMultiportedMemory():
-  def __init__(s, nports, delay = 0):
+  # Page initialization modes
+  #   zero    : all-zero pages
+  #   random  : random bytes (reproducible if a seed is given)
+  #   pattern : a repeating 0xdeadbeef pattern
+  init_modes = ('zero', 'random', 'pattern')
+
+  def __init__(s, nports, delay = 0, init = 'random', seed = None):
+    assert (init in s.init_modes)
+
     s.pmem = {}
     s.page_size = 1 << 12 #4kB
     s.nports = nports
@@ -18,39 +29,121 @@ class SimpleMultiportedMemory():
 
     s.delay    = [delay for _ in range(nports)]
 
+    # Page initialization
+    s.init     = init
+    s.rng      = random.Random(seed)
+    s.pattern  = bytes.fromhex('deadbeef') * (s.page_size // 4)
+
+  # Parses 'zero', 'pattern' or 'random[:SEED]' into (init, seed)
+  @classmethod
+  def parse_init(cls, spec):
+    init, _, seed = spec.partition(':')
+    if init not in cls.init_modes or (seed and init != 'random'):
+      raise ValueError('invalid memory initialization "{}"'.format(spec))
+    try:
+      return init, (int(seed, 0) if seed else None)
+    except ValueError:
+      raise ValueError('invalid memory initialization seed "{}"'.format(seed))
+
   def allocate_physical_page(s, page_addr):
     assert (page_addr not in s.pmem)
 
-    s.pmem[page_addr] = []
-    for i in range(s.page_size):
-      s.pmem[page_addr].append(random.randint(0, 256))
+    if   s.init == 'zero':
+      page = bytearray(s.page_size)
+    elif s.init == 'pattern':
+      page = bytearray(s.pattern)
+    else:
+      page = bytearray(s.rng.randbytes(s.page_size))
+
+    s.pmem[page_addr] = page
+    return page
+
+  def get_page(s, page_addr):
+    page = s.pmem.get(page_addr)
+    if page is None:
+      page = s.allocate_physical_page(page_addr)
+    return page
 
   def write(s, addr, data, size, mask=None):
-    # Check whether the page is allocated
-    page_addr = int(addr / s.page_size)
-    page_offset = addr % s.page_size
-    if page_addr not in s.pmem:
-      s.allocate_physical_page(page_addr)
+    # Split the access at page boundaries
+    done = 0
+    while done < size:
+      page_addr   = (addr + done) // s.page_size
+      page_offset = (addr + done) %  s.page_size
+      n           = min(size - done, s.page_size - page_offset)
+      page        = s.get_page(page_addr)
 
-    # Perform the write
-    for i in range(size):
-      if mask is None or mask[i] == True:
-        s.pmem[page_addr][page_offset + i] = data[i]
+      # Perform the write
+      if mask is None:
+        chunk = data[done:done + n]
+        try:
+          page[page_offset:page_offset + n] = chunk
+        except (ValueError, TypeError):
+          # Not a byte sequence; keep the low byte of every element
+          page[page_offset:page_offset + n] = bytes(b & 0xff for b in chunk)
+      else:
+        for i in range(n):
+          if mask[done + i] == True:
+            page[page_offset + i] = data[done + i] & 0xff
+
+      done += n
 
   def read(s, addr, size):
-    # Check whether the page is allocated
-    page_addr = int(addr / s.page_size)
-    page_offset = addr % s.page_size
-    if page_addr not in s.pmem:
-      s.allocate_physical_page(page_addr)
+    page_addr   = addr // s.page_size
+    page_offset = addr %  s.page_size
+
+    # Common case: the access stays within a page
+    if page_offset + size <= s.page_size:
+      data = s.get_page(page_addr)[page_offset:page_offset + size]
+      # Mapped pages (see load_file) return views; hand out a copy
+      return data if data.__class__ is bytearray else bytearray(data)
 
-    # Perform the read
-    data = [0 for _ in range(size)]
-    for i in range(size):
-      data[i] = s.pmem[page_addr][page_offset + i]
+    # Split the access at page boundaries
+    data = bytearray()
+    done = 0
+    while done < size:
+      page_addr   = (addr + done) // s.page_size
+      page_offset = (addr + done) %  s.page_size
+      n           = min(size - done, s.page_size - page_offset)
+      data       += s.get_page(page_addr)[page_offset:page_offset + n]
+      done       += n
 
     return data
 
+  # Bulk loading and dumping
+  #   A file loaded at a page-aligned address has its whole pages
+  #   mapped into memory instead of copied: the pages are views of a
+  #   private copy-on-write mapping of the file, so they are only read
+  #   from disk when touched and stores never reach the file. The rest
+  #   of the file is copied.
+  def load_file(s, addr, path):
+    with open(path, 'rb') as f:
+      size = os.fstat(f.fileno()).st_size
+
+      n_pages = size // s.page_size if addr % s.page_size == 0 else 0
+      if n_pages:
+        view = memoryview(mmap.mmap(f.fileno(), n_pages * s.page_size,
+                                    access=mmap.ACCESS_COPY))
+        for i in range(n_pages):
+          s.pmem[addr // s.page_size + i] = view[i * s.page_size:(i + 1) * s.page_size]
+
+      mapped = n_pages * s.page_size
+      if size > mapped:
+        f.seek(mapped)
+        s.write(addr + mapped, f.read(), size - mapped)
+
+    return size
+
+  def dump_file(s, addr, size, path):
+    with open(path, 'wb') as f:
+      done = 0
+      while done < size:
+        page_offset = (addr + done) % s.page_size
+        n           = min(size - done, s.page_size - page_offset)
+        page        = s.get_page((addr + done) // s.page_size)
+        f.write(page[page_offset:page_offset + n])
+        done       += n
+
   # Interface
   def canReq(s, i):
     return (s.req_buf[i] is None)
@@ -92,9 +185,11 @@ class SimpleMultiportedMemory():
         mask = s.req_buf[i]['req']['mask']
         tag  = s.req_buf[i]['req']['tag' ]
 
+        # The writes of caches (write-throughs and writebacks) only
+        # model traffic; their data reached memory functionally
         if   op == 0:
           data = s.read(addr, size)
-        elif op == 1:
+        elif op == 1 and not s.req_buf[i]['req'].get('timing_only'):
           s.write(addr, data, size, mask)
 
         resp = {}
@@ -118,5 +213,53 @@ class SimpleMultiportedMemory():
         if s.req_buf[i]['delay'] == 0:
           s.processRequest(i)
 
+  # Event-driven simulation: a request's delay is a pure countdown
+  # (the memory is ticked once per cycle, by the system); a request
+  # completes on the tick its delay reaches zero, and a response is
+  # collected by the next tick of its requester
+  def quietCycles(s):
+    quiet = None
+    for i in range(s.nports):
+      if s.resp_buf[i] is not None:
+        return 0
+      if s.req_buf[i] is not None:
+        n = s.req_buf[i]['delay'] - 1
+        if n <= 0:
+          return 0
+        if quiet is None or n < quiet:
+          quiet = n
+    return quiet
+
+  def skipCycles(s, n):
+    for i in range(s.nports):
+      if s.req_buf[i] is not None:
+        s.req_buf[i]['delay'] -= n
+
+  # Checkpointing: only allocated pages are saved, each compressed
+  def getState(s):
+    pages = {}
+    for page_addr, page in s.pmem.items():
+      pages[page_addr] = zlib.compress(page)
+
+    state = {}
+    state['pages'   ] = pages
+    state['req_buf' ] = s.req_buf
+    state['resp_buf'] = s.resp_buf
+    state['delay'   ] = s.delay
+    state['init'    ] = s.init
+    state['rng'     ] = s.rng.getstate()
+    return state
+
+  def setState(s, state):
+    s.pmem = {}
+    for page_addr, blob in state['pages'].items():
+      s.pmem[page_addr] = bytearray(zlib.decompress(blob))
+
+    s.req_buf  = state['req_buf' ]
+    s.resp_buf = state['resp_buf']
+    s.delay    = state['delay'   ]
+    s.init     = state['init'    ]
+    s.rng.setstate(state['rng'])
+
   def linetrace(s):
     return 'mem'
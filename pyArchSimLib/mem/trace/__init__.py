@@ -0,0 +1,25 @@
+# =============================================================================
+# File: __init__.py
+#
+# Description:
+#   Memory-trace subpackage initializer. Exposes the request recorder,
+#   the binary trace reader/writer, the trace-driven cache replay and
+#   single-pass LRU miss-ratio curves.
+# =============================================================================
+
+from .recorder       import TraceRecorder
+from .trace_file     import TraceWriter
+from .replay         import replay, parse_replay_cfg
+from .stack_distance import miss_ratio_curve
+
+from . import trace_file, stack_distance
+
+__all__ = [
+     'TraceRecorder',
+     'TraceWriter',
+     'replay',
+     'parse_replay_cfg',
+     'miss_ratio_curve',
+     'trace_file',
+     'stack_distance',
+]
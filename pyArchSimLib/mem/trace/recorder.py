@@ -0,0 +1,22 @@
+# recorder.py
+# --------------------------------------------------------------------
+# A pass-through wrapper that records every request a cache receives.
+#
+# The recorder sits between the core and a cache (or NoCache) and
+# forwards everything to it; only sendReq is intercepted. Attribute
+# reads (hits, misses, ...) go to the wrapped cache, so the recorder
+# can stand in for it anywhere.
+
+class TraceRecorder():
+  def __init__(s, cache, writer, port):
+    s.cache  = cache
+    s.writer = writer
+    s.port   = port
+
+  def sendReq(s, req):
+    s.writer.write(s.port, req['op'], req['size'], req['addr'])
+    return s.cache.sendReq(req)
+
+  # Everything else is the cache's
+  def __getattr__(s, name):
+    return getattr(s.cache, name)
@@ -0,0 +1,161 @@
+# replay.py
+# --------------------------------------------------------------------
+# Trace-driven cache replay.
+#
+# Hits and misses of the caches only depend on the order of the
+# requests they receive, so a recorded request stream can be run
+# through any cache configuration without simulating the pipeline.
+#
+#   - dm/sa (LRU, write-allocate) caches are replayed by tag-only
+#     models that reproduce DirectMappedCache/SetAssociativeCache
+#     exactly; with NumPy, direct-mapped caches are replayed without a
+#     Python loop.
+#   - Any other configuration is replayed through the cache model
+#     itself, with the miss penalty removed.
+#   - Prefetching cannot be replayed: what a prefetcher brings in, and
+#     whether it arrives in time, depends on the timing and on the PCs
+#     of the loads and stores, neither of which a trace records.
+#   - Neither can lockup-free caches (mshrs=N): which requests hit under
+#     a miss, or merge into it, depends on the timing.
+#
+#   The D-side stream only contains the committed loads and stores, in
+#   program order, so it is the same for every configuration. The
+#   I-side stream also contains wrong-path fetches, whose number
+#   depends on the timing the trace was recorded with, so I-side counts
+#   are only exact for that configuration.
+
+try:
+  import numpy as np
+except ImportError:
+  np = None
+
+from pyArchSimLib.mem.main   import SimpleMultiportedMemory
+from pyArchSimLib.mem.cache  import make_cache, parse_cache_cfg
+
+from .trace_file import addresses, requests
+
+# Options that do not change which requests hit
+timing_options = ('miss_penalty',)
+
+# Options that a trace does not hold enough to replay, by what they do
+untraceable_options = {
+  'prefetch'  : 'prefetching',
+  'pf_degree' : 'prefetching',
+  'pf_entries': 'prefetching',
+  'mshrs'     : 'a lockup-free cache',
+}
+
+#=========================================================================
+# Tag-only models
+#=========================================================================
+def replay_dm(addrs, size, line_size):
+  n_lines = size // line_size
+
+  if np is not None and isinstance(addrs, np.ndarray):
+    # A request hits iff the previous request to the same line index
+    # had the same tag: group requests by index (keeping their order)
+    # and compare neighbours.
+    lines = addrs // line_size
+    idx   = lines %  n_lines
+    tag   = lines // n_lines
+    order = np.argsort(idx, kind='stable')
+    idx   = idx[order]
+    tag   = tag[order]
+    hits  = int(np.count_nonzero((idx[1:] == idx[:-1]) & (tag[1:] == tag[:-1])))
+    return hits, len(addrs) - hits
+
+  tags = [None] * n_lines
+  hits = 0
+  for addr in addrs:
+    line = addr // line_size
+    idx  = line %  n_lines
+    tag  = line // n_lines
+    if tags[idx] == tag:
+      hits += 1
+    else:
+      tags[idx] = tag
+  return hits, len(addrs) - hits
+
+def replay_sa(addrs, size, ways, line_size):
+  n_sets = (size // line_size) // ways
+  if ways == 1:
+    return replay_dm(addrs, size, line_size)
+
+  # Per set, the resident tags from LRU to MRU. Invalid ways are
+  # filled in order before anything is evicted, exactly like the LRU
+  # list of SetAssociativeCache.
+  sets = [[] for _ in range(n_sets)]
+  hits = 0
+  for addr in addrs:
+    line = int(addr) // line_size
+    lru  = sets[line % n_sets]
+    tag  = line // n_sets
+    if tag in lru:
+      hits += 1
+      lru.remove(tag)
+    elif len(lru) == ways:
+      del lru[0]
+    lru.append(tag)
+  return hits, len(addrs) - hits
+
+#=========================================================================
+# Cache models
+#=========================================================================
+def replay_model(cfg, reqs, port):
+  mem   = SimpleMultiportedMemory(2, init='zero')
+  cache = make_cache(cfg, port, mem)
+  cache.setMemCanReq  (mem.canReq  )
+  cache.setMemSendReq (mem.sendReq )
+  cache.setMemHasResp (mem.hasResp )
+  cache.setMemRecvResp(mem.recvResp)
+  cache.miss_penalty = 0
+
+  for op, size, addr in reqs:
+    req = {}
+    req['op'  ] = op
+    req['addr'] = addr
+    req['data'] = bytes(size) if op == 1 else None
+    req['size'] = size
+    req['mask'] = None
+    req['tag' ] = None
+
+    while not cache.canReq():
+      cache.tick()
+    cache.sendReq(req)
+    while not cache.hasResp():
+      cache.tick()
+    cache.recvResp()
+
+  return cache.hits, cache.misses
+
+#=========================================================================
+# Replay
+#=========================================================================
+def parse_replay_cfg(cfg):
+  # parse_cache_cfg() for configurations a trace can be replayed on
+  kind, params, options = parse_cache_cfg(cfg)
+  for name in options:
+    if name in untraceable_options:
+      raise ValueError(f'cache config "{cfg}": {untraceable_options[name]} '
+                       'cannot be replayed from a trace')
+  return kind, params, options
+
+def replay(data, cfg, port):
+  # Returns the (hits, misses) of cache cfg for the requests recorded
+  # on port; a cache-less port has neither
+  kind, params, options = parse_replay_cfg(cfg)
+  if kind == 'none':
+    return 0, 0
+
+  # The tag-only models replace the LRU line
+  model_options = set(options) - set(timing_options)
+  if options.get('replacement') == 'lru':
+    model_options.discard('replacement')
+
+  if not model_options:
+    if kind == 'dm':
+      return replay_dm(addresses(data, port, np), **params)
+    if kind == 'sa':
+      return replay_sa(addresses(data, port), **params)
+
+  return replay_model(cfg, requests(data, port), port)
@@ -0,0 +1,129 @@
+# stack_distance.py
+# --------------------------------------------------------------------
+# Single-pass LRU miss-ratio curves (Mattson stack-distance analysis).
+#
+# LRU is a stack algorithm: a request hits in a set with W ways iff
+# fewer than W other lines of its set were referenced since its last
+# reference (its stack distance). One pass over a request stream per
+# set count therefore yields the hits of every associativity, and so
+# of every capacity, at once.
+#
+# Stack distances are counted with a Fenwick tree over time: the
+# latest reference of every line holds a 1, so the distance of a
+# request is the number of 1s after the previous reference to its
+# line, found in O(log n).
+
+class FenwickTree():
+  def __init__(s, n):
+    s.n    = n
+    s.tree = [0] * (n + 1)
+
+  def add(s, i, v):
+    i += 1
+    while i <= s.n:
+      s.tree[i] += v
+      i += i & -i
+
+  def prefix(s, i):
+    # Sum of positions [0, i)
+    total = 0
+    while i > 0:
+      total += s.tree[i]
+      i -= i & -i
+    return total
+
+def stack_distances(lines):
+  # Histogram of the stack distances of a stream of line addresses:
+  # hist[d] requests had distance d; first references are not counted
+  # (they miss at any size)
+  tree = FenwickTree(len(lines))
+  last = {}
+  hist = []
+  live = 0
+  for t, line in enumerate(lines):
+    p = last.get(line)
+    if p is not None:
+      d = live - tree.prefix(p + 1)
+      if d >= len(hist):
+        hist.extend([0] * (d + 1 - len(hist)))
+      hist[d] += 1
+      tree.add(p, -1)
+      live -= 1
+    tree.add(t, 1)
+    live += 1
+    last[line] = t
+  return hist
+
+def set_histogram(lines, n_sets, depth=None):
+  # Stack-distance histogram of a cache with n_sets sets (the sum of
+  # the histograms of every set's own stream). Only distances below
+  # depth are needed to tell the hits of up to depth ways; for shallow
+  # depths a bounded LRU stack per set is cheaper than the tree.
+  streams = {}
+  for line in lines:
+    streams.setdefault(line % n_sets, []).append(line)
+
+  if depth is not None and depth <= 64:
+    hist = [0] * depth
+    for stream in streams.values():
+      stack = [] # MRU first
+      for line in stream:
+        if line in stack:
+          d = stack.index(line)
+          hist[d] += 1
+          del stack[d]
+        elif len(stack) == depth:
+          stack.pop()
+        stack.insert(0, line)
+    return hist
+
+  hist = []
+  for stream in streams.values():
+    h = stack_distances(stream)
+    if len(h) > len(hist):
+      hist.extend([0] * (len(h) - len(hist)))
+    for d, n in enumerate(h):
+      hist[d] += n
+  return hist
+
+def miss_ratio_curve(addrs, line_size, max_size, ways=(1, 2, 4, 8, 'full')):
+  # Hits and misses of LRU caches with line_size lines, every
+  # power-of-two capacity up to max_size and each associativity in
+  # ways ('full' = fully associative), for one request stream.
+  # Returns rows of (size, ways, hits, misses), by size then ways.
+  lines = [int(addr) // line_size for addr in addrs]
+  total = len(lines)
+
+  points = []
+  size   = line_size
+  while size <= max_size:
+    n_lines = size // line_size
+    for w in sorted(set(n_lines if w == 'full' else w for w in ways)):
+      if w <= n_lines and n_lines % w == 0:
+        points.append((size, n_lines // w, w))
+    size *= 2
+
+  # One pass per set count, as deep as its largest associativity
+  depth = {}
+  for _, n_sets, w in points:
+    depth[n_sets] = max(depth.get(n_sets, 0), w)
+  hists = {n_sets: set_histogram(lines, n_sets, d) for n_sets, d in depth.items()}
+
+  rows = []
+  for size, n_sets, w in points:
+    h = sum(hists[n_sets][:w])
+    rows.append((size, w, h, total - h))
+  return rows
+
+def validate(rows, reqs, port, line_size):
+  # Cross-checks every point of a curve against a SetAssociativeCache
+  # run over the same requests; returns the mismatching points as
+  # (size, ways, curve hits, cache hits)
+  from .replay import replay_model
+
+  bad = []
+  for size, ways, h, _ in rows:
+    cache_h, _ = replay_model('sa:{}:{}:{}'.format(size, ways, line_size), reqs, port)
+    if cache_h != h:
+      bad.append((size, ways, h, cache_h))
+  return bad
@@ -0,0 +1,80 @@
+# trace_file.py
+# --------------------------------------------------------------------
+# Binary memory-request traces.
+#
+# A trace file is a header followed by fixed-size records:
+#
+#   header : MAGIC, version (u32), metadata length (u32), metadata
+#            (UTF-8 JSON, e.g., the program and cache configuration
+#            the trace was recorded with)
+#   record : port (u8), op (u8), size (u16), addr (u32), little-endian
+#
+# Records can be loaded as a NumPy structured array (dtype below) or
+# unpacked with the struct module when NumPy is not available.
+
+import json
+import struct
+
+MAGIC   = b'PASIMTRC'
+VERSION = 1
+
+record     = struct.Struct('<BBHI')
+dtype_spec = [('port', 'u1'), ('op', 'u1'), ('size', '<u2'), ('addr', '<u4')]
+
+class TraceWriter():
+  def __init__(s, path, meta=None, buf_records=1 << 16):
+    s.f     = open(path, 'wb')
+    s.buf   = bytearray()
+    s.limit = buf_records * record.size
+    s.count = 0
+
+    meta = json.dumps(meta or {}).encode()
+    s.f.write(MAGIC)
+    s.f.write(struct.pack('<II', VERSION, len(meta)))
+    s.f.write(meta)
+
+  def write(s, port, op, size, addr):
+    s.buf += record.pack(port, op, size, addr & 0xffffffff)
+    s.count += 1
+    if len(s.buf) >= s.limit:
+      s.flush()
+
+  def flush(s):
+    s.f.write(s.buf)
+    s.buf = bytearray()
+
+  def close(s):
+    if not s.f.closed:
+      s.flush()
+      s.f.close()
+
+def load(path):
+  # Returns (metadata, raw record bytes)
+  with open(path, 'rb') as f:
+    if f.read(len(MAGIC)) != MAGIC:
+      raise ValueError('{} is not a pyArchSim memory trace'.format(path))
+
+    version, meta_len = struct.unpack('<II', f.read(8))
+    if version != VERSION:
+      raise ValueError('{}: unsupported trace version {}'.format(path, version))
+
+    meta = json.loads(f.read(meta_len).decode())
+    data = f.read()
+
+  if len(data) % record.size:
+    raise ValueError('{}: truncated trace'.format(path))
+
+  return meta, data
+
+def addresses(data, port, np=None):
+  # The addresses requested on a port, in order: a NumPy array if np
+  # (the numpy module) is given, a list otherwise
+  if np is not None:
+    recs = np.frombuffer(data, dtype=np.dtype(dtype_spec))
+    return recs['addr'][recs['port'] == port].astype(np.int64)
+  return [addr for p, _, _, addr in record.iter_unpack(data) if p == port]
+
+def requests(data, port):
+  # (op, size, addr) of the requests on a port, in order
+  return [(op, size, addr) for p, op, size, addr in record.iter_unpack(data)
+          if p == port]
@@ -0,0 +1,31 @@
+# =============================================================================
+# File: __init__.py
+#
+# Description:
+#   Branch predictor subpackage initializer. Exposes the predictors,
+#   the control-flow kinds the core reports to them, and the
+#   make_bpred factory.
+# =============================================================================
+
+from .base       import BranchPredictor, NoPredictor, BTB, RAS
+from .base       import BR_NONE, BR_COND, BR_JUMP, BR_CALL, BR_RET
+from .static     import StaticPredictor
+from .btb_only   import BTBPredictor
+from .bimodal    import BimodalPredictor
+from .gshare     import GsharePredictor
+from .tournament import TournamentPredictor
+from .factory    import make_bpred, parse_bpred_cfg
+
+__all__ = [
+     'BranchPredictor',
+     'NoPredictor',
+     'BTB',
+     'RAS',
+     'StaticPredictor',
+     'BTBPredictor',
+     'BimodalPredictor',
+     'GsharePredictor',
+     'TournamentPredictor',
+     'make_bpred',
+     'parse_bpred_cfg',
+]
@@ -0,0 +1,158 @@
+# =============================================================================
+# File: base.py
+#
+# Description:
+#   Branch prediction framework. Fetch asks predict(pc) for the next PC
+#   of every instruction, before it is even decoded; the core reports
+#   every resolved control-flow instruction through update() (its
+#   train_bp hook): jumps and calls from decode, branches and register
+#   jumps from execute. Decode and execute squash the wrong path of a
+#   bad prediction.
+#
+#   Targets come from a branch target buffer (BTB), which also records
+#   the kind of instruction it saw at a PC; return addresses come from
+#   a return address stack (RAS). Subclasses only predict the direction
+#   of conditional branches (direction()/train()).
+#
+#   Updates happen when instructions resolve, on the correct path only,
+#   so no state ever has to be repaired after a squash. Global history
+#   is likewise that of resolved branches.
+# =============================================================================
+
+# Control-flow kinds (the br_type of train_bp)
+BR_NONE = 0 # Not control flow
+BR_COND = 1 # Conditional branch
+BR_JUMP = 2 # Unconditional jump (direct or through a register)
+BR_CALL = 3 # Jump and link
+BR_RET  = 4 # Jump through $ra
+
+class BTB():
+  # Direct-mapped, tagged with the whole PC; an entry is (kind, target)
+  def __init__(s, entries):
+    if entries <= 0 or entries & (entries - 1):
+      raise ValueError(f'BTB entries must be a power of two, got {entries}')
+    s.mask    = entries - 1
+    s.tags    = [None] * entries
+    s.entries = [None] * entries
+    s.hits    = 0
+    s.misses  = 0
+
+  def lookup(s, pc):
+    idx = (pc >> 2) & s.mask
+    if s.tags[idx] == pc:
+      s.hits += 1
+      return s.entries[idx]
+    s.misses += 1
+    return None
+
+  def insert(s, pc, kind, target):
+    idx = (pc >> 2) & s.mask
+    s.tags   [idx] = pc
+    s.entries[idx] = (kind, target)
+
+  def remove(s, pc):
+    idx = (pc >> 2) & s.mask
+    if s.tags[idx] == pc:
+      s.tags   [idx] = None
+      s.entries[idx] = None
+
+class RAS():
+  # Circular return address stack; overflowing overwrites the oldest
+  # entry, underflowing predicts nothing
+  def __init__(s, depth):
+    if depth <= 0:
+      raise ValueError(f'RAS depth must be positive, got {depth}')
+    s.stack = [None] * depth
+    s.top   = 0
+    s.count = 0
+
+  def push(s, addr):
+    s.top = (s.top + 1) % len(s.stack)
+    s.stack[s.top] = addr
+    s.count = min(s.count + 1, len(s.stack))
+
+  def peek(s):
+    return s.stack[s.top] if s.count else None
+
+  def pop(s):
+    if s.count:
+      s.top   = (s.top - 1) % len(s.stack)
+      s.count -= 1
+
+class BranchPredictor():
+  # Statistics: (resolved, predicted correctly) per control-flow kind
+  kinds = (('Cond. Branches', BR_COND), ('Jumps',   BR_JUMP),
+           ('Calls',          BR_CALL), ('Returns', BR_RET ))
+
+  def __init__(s, btb=512, ras=8):
+    # Components of another predictor have neither (btb=0, ras=0)
+    s.btb = BTB(btb) if btb else None
+    s.ras = RAS(ras) if ras else None
+
+    s.resolved = [0] * 5
+    s.correct  = [0] * 5
+
+  #----------------------------------------------------------------------
+  # Direction of a conditional branch (subclasses)
+  #----------------------------------------------------------------------
+  def direction(s, pc, target):
+    return False
+
+  def train(s, pc, taken):
+    pass
+
+  #----------------------------------------------------------------------
+  # Fetch: the predicted next PC
+  #----------------------------------------------------------------------
+  def predict(s, pc):
+    entry = s.btb.lookup(pc)
+    if entry is None:
+      return pc + 4
+
+    kind, target = entry
+    if kind == BR_COND:
+      return target if s.direction(pc, target) else pc + 4
+    if kind == BR_RET:
+      addr = s.ras.peek()
+      return addr if addr is not None else target
+    return target
+
+  #----------------------------------------------------------------------
+  # Resolution (train_bp)
+  #----------------------------------------------------------------------
+  def update(s, pc, npc, br_type, outcome, pred_npc):
+    s.resolved[br_type] += 1
+    if npc == pred_npc:
+      s.correct[br_type] += 1
+
+    if br_type == BR_COND:
+      s.train(pc, outcome)
+      if outcome:
+        s.btb.insert(pc, BR_COND, npc)
+    else:
+      if   br_type == BR_CALL: s.ras.push(pc + 4)
+      elif br_type == BR_RET : s.ras.pop()
+      s.btb.insert(pc, br_type, npc)
+
+  def mispredicts(s):
+    return sum(s.resolved) - sum(s.correct)
+
+  # Checkpointing
+  def getState(s):
+    return dict(vars(s))
+
+  def setState(s, state):
+    vars(s).update(state)
+
+class NoPredictor(BranchPredictor):
+  # Always PC + 4 (the pipeline without a predictor); nothing is kept
+  def __init__(s):
+    super().__init__(btb=0, ras=0)
+
+  def predict(s, pc):
+    return pc + 4
+
+  def update(s, pc, npc, br_type, outcome, pred_npc):
+    s.resolved[br_type] += 1
+    if npc == pred_npc:
+      s.correct[br_type] += 1
@@ -0,0 +1,32 @@
+# =============================================================================
+# File: bimodal.py
+#
+# Description:
+#   Bimodal predictor: a table of 2-bit saturating counters indexed by
+#   the branch PC (taken if the counter is 2 or 3).
+# =============================================================================
+
+from .base import BranchPredictor
+
+def check_entries(entries, what='entries'):
+  if entries <= 0 or entries & (entries - 1):
+    raise ValueError(f'{what} must be a power of two, got {entries}')
+  return entries
+
+class BimodalPredictor(BranchPredictor):
+  def __init__(s, entries, **kwargs):
+    super().__init__(**kwargs)
+    s.mask     = check_entries(entries) - 1
+    s.counters = bytearray([1] * entries) # Weakly not taken
+
+  def index(s, pc):
+    return (pc >> 2) & s.mask
+
+  def direction(s, pc, target):
+    return s.counters[s.index(pc)] >= 2
+
+  def train(s, pc, taken):
+    i = s.index(pc)
+    c = s.counters[i]
+    if   taken     and c < 3: s.counters[i] = c + 1
+    elif not taken and c > 0: s.counters[i] = c - 1
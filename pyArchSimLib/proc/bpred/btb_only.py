@@ -0,0 +1,19 @@
+# =============================================================================
+# File: btb_only.py
+#
+# Description:
+#   BTB-only prediction: a conditional branch is predicted taken if it
+#   is in the BTB, i.e., if it was taken the last time it ran. A branch
+#   that is not taken leaves the BTB.
+# =============================================================================
+
+from .base import BranchPredictor, BR_COND
+
+class BTBPredictor(BranchPredictor):
+  def direction(s, pc, target):
+    return True
+
+  def update(s, pc, npc, br_type, outcome, pred_npc):
+    super().update(pc, npc, br_type, outcome, pred_npc)
+    if br_type == BR_COND and not outcome:
+      s.btb.remove(pc)
@@ -0,0 +1,93 @@
+# =============================================================================
+# File: factory.py
+#
+# Description:
+#   Builds branch predictors from configuration strings:
+#
+#     none                              (always PC + 4, the default)
+#     static:nt|taken|btfn[:OPTION=VALUE...]
+#     btb[:OPTION=VALUE...]
+#     bimodal:ENTRIES[:OPTION=VALUE...]
+#     gshare:ENTRIES:HIST_BITS[:OPTION=VALUE...]
+#     tournament:ENTRIES:HIST_BITS[:OPTION=VALUE...]
+#
+#   Options (all but none):
+#     btb=N : BTB entries (default 512)
+#     ras=N : return address stack depth (default 8)
+# =============================================================================
+
+from .base       import NoPredictor
+from .static     import StaticPredictor
+from .btb_only   import BTBPredictor
+from .bimodal    import BimodalPredictor
+from .gshare     import GsharePredictor
+from .tournament import TournamentPredictor
+
+# Positional parameters of each predictor type: (name, value parser)
+bpred_types = {
+    'static':     (StaticPredictor,     (('policy', str),)),
+    'btb':        (BTBPredictor,        ()),
+    'bimodal':    (BimodalPredictor,    (('entries', int),)),
+    'gshare':     (GsharePredictor,     (('entries', int), ('hist_bits', int))),
+    'tournament': (TournamentPredictor, (('entries', int), ('hist_bits', int))),
+}
+
+# Options: name -> (constructor keyword, value parser)
+bpred_options = {
+    'btb': ('btb', int),
+    'ras': ('ras', int),
+}
+
+def parse_bpred_cfg(cfg):
+    # Returns (kind, positional parameters, keyword options); raises
+    # ValueError on malformed strings
+    fields = cfg.split(':')
+    kind   = fields[0]
+
+    if kind == 'none':
+        if len(fields) > 1:
+            raise ValueError(f'bpred config "{cfg}": "none" takes no parameters')
+        return kind, {}, {}
+
+    if kind not in bpred_types:
+        raise ValueError(f'bpred config "{cfg}": unknown predictor type "{kind}"')
+
+    _, names = bpred_types[kind]
+    params   = [f for f in fields[1:] if '=' not in f]
+    options  = [f for f in fields[1:] if '='     in f]
+
+    if len(params) != len(names) or fields[1:len(names) + 1] != params:
+        raise ValueError(f'bpred config "{cfg}": expected '
+                         + ':'.join([kind] + [n.upper() for n, _ in names])
+                         + '[:OPTION=VALUE...]')
+
+    try:
+        params = {n: parse(p) for (n, parse), p in zip(names, params)}
+    except ValueError:
+        raise ValueError(f'bpred config "{cfg}": parameters must be integers')
+
+    kwargs = {}
+    for opt in options:
+        key, _, val = opt.partition('=')
+        if key not in bpred_options:
+            raise ValueError(f'bpred config "{cfg}": unknown option "{key}"')
+        kw, parse = bpred_options[key]
+        try:
+            kwargs[kw] = parse(val)
+        except ValueError:
+            raise ValueError(f'bpred config "{cfg}": bad value for "{key}"')
+        if kwargs[kw] <= 0:
+            raise ValueError(f'bpred config "{cfg}": "{key}" must be positive')
+
+    return kind, params, kwargs
+
+def make_bpred(cfg):
+    kind, params, kwargs = parse_bpred_cfg(cfg)
+    if kind == 'none':
+        return NoPredictor()
+
+    cls, _ = bpred_types[kind]
+    try:
+        return cls(**params, **kwargs)
+    except ValueError as e:
+        raise ValueError(f'bpred config "{cfg}": {e}')
@@ -0,0 +1,24 @@
+# =============================================================================
+# File: gshare.py
+#
+# Description:
+#   Gshare predictor: 2-bit counters indexed by the branch PC XORed with
+#   the global history of the last HIST_BITS branch outcomes.
+# =============================================================================
+
+from .bimodal import BimodalPredictor
+
+class GsharePredictor(BimodalPredictor):
+  def __init__(s, entries, hist_bits, **kwargs):
+    super().__init__(entries, **kwargs)
+    if not 0 <= hist_bits <= 30:
+      raise ValueError(f'history bits must be 0 to 30, got {hist_bits}')
+    s.hist_mask = (1 << hist_bits) - 1
+    s.history   = 0
+
+  def index(s, pc):
+    return ((pc >> 2) ^ s.history) & s.mask
+
+  def train(s, pc, taken):
+    super().train(pc, taken)
+    s.history = ((s.history << 1) | (1 if taken else 0)) & s.hist_mask
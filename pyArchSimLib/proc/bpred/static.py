@@ -0,0 +1,28 @@
+# =============================================================================
+# File: static.py
+#
+# Description:
+#   Static direction predictors; targets still come from the BTB, so
+#   only branches taken before can be predicted taken:
+#
+#     nt    : never taken
+#     taken : always taken
+#     btfn  : backward branches taken, forward ones not (loops)
+# =============================================================================
+
+from .base import BranchPredictor
+
+class StaticPredictor(BranchPredictor):
+  policies = ('nt', 'taken', 'btfn')
+
+  def __init__(s, policy, **kwargs):
+    super().__init__(**kwargs)
+    if policy not in s.policies:
+      raise ValueError(f'unknown static policy "{policy}" '
+                       f'(one of {", ".join(s.policies)})')
+    s.policy = policy
+
+  def direction(s, pc, target):
+    if s.policy == 'btfn':
+      return target <= pc
+    return s.policy == 'taken'
@@ -0,0 +1,37 @@
+# =============================================================================
+# File: tournament.py
+#
+# Description:
+#   Tournament predictor: a bimodal and a gshare predictor of ENTRIES
+#   counters each, and a table of 2-bit chooser counters (indexed by the
+#   branch PC) that picks gshare when 2 or 3. The chooser moves toward
+#   the component that was right whenever the two disagree.
+# =============================================================================
+
+from .base    import BranchPredictor
+from .bimodal import BimodalPredictor, check_entries
+from .gshare  import GsharePredictor
+
+class TournamentPredictor(BranchPredictor):
+  def __init__(s, entries, hist_bits, **kwargs):
+    super().__init__(**kwargs)
+    s.local   = BimodalPredictor(entries, btb=0, ras=0)
+    s.shared  = GsharePredictor (entries, hist_bits, btb=0, ras=0)
+    s.mask    = check_entries(entries) - 1
+    s.chooser = bytearray([1] * entries) # Weakly bimodal
+
+  def direction(s, pc, target):
+    if s.chooser[(pc >> 2) & s.mask] >= 2:
+      return s.shared.direction(pc, target)
+    return s.local.direction(pc, target)
+
+  def train(s, pc, taken):
+    local  = s.local .direction(pc, None) == taken
+    shared = s.shared.direction(pc, None) == taken
+    if local != shared:
+      i = (pc >> 2) & s.mask
+      c = s.chooser[i]
+      if   shared and c < 3: s.chooser[i] = c + 1
+      elif local  and c > 0: s.chooser[i] = c - 1
+    s.local .train(pc, taken)
+    s.shared.train(pc, taken)
@@ -1 +1,2 @@
 from .five_stage_core import FiveStageInorderCore
+from .functional      import FunctionalCore
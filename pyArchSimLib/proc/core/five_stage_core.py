@@ -8,9 +8,150 @@
 import random
 
 from pyArchSimLib.arch.isa import mips32
+from pyArchSimLib.proc.bpred import NoPredictor, BR_NONE, BR_COND, BR_JUMP, BR_CALL, BR_RET
+
+#=====================================================================
+# Execution Semantics
+#   Per-mnemonic operation used by the execution handlers. ALU entries
+#   take (core, op1, op2), loads/stores give the access size, branches
+#   give the condition and 'l' jumps whether they link.
+#=====================================================================
+exec_ops = {}
+## ALU Reg-Reg
+exec_ops['add'    ] = lambda s, a, b: a + b
+exec_ops['addu'   ] = lambda s, a, b: a + b
+exec_ops['sub'    ] = lambda s, a, b: a - b
+exec_ops['subu'   ] = lambda s, a, b: a - b
+exec_ops['and'    ] = lambda s, a, b: a & b
+exec_ops['or'     ] = lambda s, a, b: a | b
+exec_ops['xor'    ] = lambda s, a, b: a ^ b
+exec_ops['nor'    ] = lambda s, a, b: ~(a | b)
+
+## Multiplication/Division
+exec_ops['mul'    ] = lambda s, a, b: s.signed(a) * s.signed(b)
+exec_ops['muh'    ] = lambda s, a, b: (s.signed(a) * s.signed(b)) >> 32
+exec_ops['mulu'   ] = lambda s, a, b: a * b
+exec_ops['muhu'   ] = lambda s, a, b: (a * b) >> 32
+exec_ops['div'    ] = lambda s, a, b: int(s.signed(a) / s.signed(b))
+exec_ops['mod'    ] = lambda s, a, b: int(s.signed(a) % s.signed(b))
+exec_ops['divu'   ] = lambda s, a, b: int(a / b)
+exec_ops['modu'   ] = lambda s, a, b: int(a % b)
+
+## ALU Reg-Imm
+exec_ops['addi'   ] = lambda s, a, i: a + s.sext(i)
+exec_ops['addiu'  ] = lambda s, a, i: a + s.sext(i)
+exec_ops['andi'   ] = lambda s, a, i: a & s.zext(i)
+exec_ops['ori'    ] = lambda s, a, i: a | s.zext(i)
+exec_ops['xori'   ] = lambda s, a, i: a ^ s.zext(i)
+exec_ops['lui'    ] = lambda s, a, i: s.zext(i) << 16
+
+## Shifts
+exec_ops['sll'    ] = lambda s, a, b: a << b
+exec_ops['srl'    ] = lambda s, a, b: a >> b
+exec_ops['sra'    ] = lambda s, a, b: s.signed(a) >> b
+exec_ops['sllv'   ] = lambda s, a, b: a << (b & 0x1f)
+exec_ops['srlv'   ] = lambda s, a, b: a >> (b & 0x1f)
+exec_ops['srav'   ] = lambda s, a, b: s.signed(a) >> (b & 0x1f)
+
+## Memory
+exec_ops['lb'     ] = 1
+exec_ops['lh'     ] = 2
+exec_ops['lw'     ] = 4
+exec_ops['lbu'    ] = 1
+exec_ops['lhu'    ] = 2
+exec_ops['sb'     ] = 1
+exec_ops['sh'     ] = 2
+exec_ops['sw'     ] = 4
+
+## Branches
+exec_ops['beq'    ] = lambda s, a, b: a == b
+exec_ops['bne'    ] = lambda s, a, b: a != b
+exec_ops['bltz'   ] = lambda s, a, b: s.signed(a) <  0
+exec_ops['bgez'   ] = lambda s, a, b: s.signed(a) >= 0
+exec_ops['blez'   ] = lambda s, a, b: s.signed(a) <= 0
+exec_ops['bgtz'   ] = lambda s, a, b: s.signed(a) >  0
+
+## Jumps
+exec_ops['j'      ] = False
+exec_ops['jal'    ] = True
+exec_ops['jr'     ] = None
+
+## Syscall
+exec_ops['syscall'] = None
+
+# Control-flow instructions: anything else continues at PC + 4
+ctrl_insts = frozenset(('beq', 'bne', 'bltz', 'bgez', 'blez', 'bgtz', 'j', 'jal', 'jr'))
+
+#=====================================================================
+# Linetrace Events
+#   Every cycle, each stage returns the DynamicInst it processed or,
+#   if it did not process one, one of these codes. They are only
+#   turned into text when a linetrace is requested.
+#=====================================================================
+LT_IDLE      = 0 # Nothing to do
+LT_BUSY      = 1 # Next stage is stalling
+LT_S_IMEM    = 2 # I-memory cannot take a request
+LT_S_MEM     = 3 # Waiting for I-memory (D) or D-memory cannot take a request (X)
+LT_S_DMEM    = 4 # Waiting for D-memory response
+LT_S_RAW     = 5 # Data hazard
+LT_S_SYSCALL = 6 # Syscall waiting for older instructions
+LT_S_BLOCKED = 7 # Decoding blocked behind a syscall
+
+lt_events = ('', 'S <<<', 'S_imem', 'S mem', 'S dmem', 'S raw', 'S |>>', 'S >>|')
+
+#=====================================================================
+# CPI Stack
+#   Every cycle is charged to one cause when writeback sees it: a
+#   completed instruction is a base cycle, a squashed one a squash
+#   cycle. Otherwise writeback sees a bubble, which was tagged with its
+#   cause by the stage that could not fill its pipeline register (and
+#   passed on by the idle stages below it).
+#=====================================================================
+CPI_BASE     = 0 # An instruction completed
+CPI_RAW      = 1 # Data hazard on a non-load
+CPI_LOAD_USE = 2 # Data hazard on a load
+CPI_ICACHE   = 3 # Waiting for the I-cache/memory
+CPI_DCACHE   = 4 # Waiting for the D-cache/memory
+CPI_SQUASH   = 5 # Wrong-path instruction (branch/jump squash)
+CPI_SYSCALL  = 6 # Pipeline drain for a syscall
+
+cpi_causes = ('base', 'raw', 'load_use', 'icache', 'dcache', 'squash', 'syscall')
+
+#=====================================================================
+# Dynamic Instruction
+#   One record per fetched instruction; it travels down the pipeline
+#   registers (f2d, d2x, x2m, m2w) and is filled in by the stages.
+#=====================================================================
+class DynamicInst():
+  __slots__ = ('inst', 'mnemonic', 'squashed',
+               'rs', 'rs_data', 'rt', 'rt_data', 'rd', 'shamt',
+               'imm16', 'imm26', 'isMem', 'pc', 'npc',
+               'dep_R', 'dep_W', 'wb_data', 'wb_en', 'ea', 'ea_size')
+
+  def __init__(s, pc, npc):
+    s.inst     = 0
+    s.mnemonic = 'undef'
+    s.squashed = False
+    s.rs       = 0
+    s.rs_data  = 0xdeadbeef
+    s.rt       = 0
+    s.rt_data  = 0xdeadcafe
+    s.rd       = 0
+    s.shamt    = 0
+    s.imm16    = 0
+    s.imm26    = 0
+    s.isMem    = False
+    s.pc       = pc
+    s.npc      = npc
+    s.dep_R    = ()
+    s.dep_W    = ()
+    s.wb_data  = None
+    s.wb_en    = False
+    s.ea       = None
+    s.ea_size  = 0
 
 class FiveStageInorderCore():
-  def __init__(s, entry_point = 0x0400_0000):
+  def __init__(s, entry_point = 0x0400_0000, bpred = None):
     # Cycle Count
     s.cycle_count = 0
 
@@ -24,6 +165,12 @@ class FiveStageInorderCore():
     s.squash    = False
     s.squash_pc = 0x00000000
 
+    # Branch predictor (fetch predicts PC + 4 without one) and the
+    # squashes of mispredictions found in decode and in execute
+    s.bp          = bpred if bpred else NoPredictor()
+    s.redirects_D = 0
+    s.redirects_X = 0
+
     # Pipeline Registers
     s.f2d = None
     s.d2x = None
@@ -53,6 +200,35 @@ class FiveStageInorderCore():
     # Forwarding Network
     s.forwarding_network = {}
 
+    # Decode and execution tables, generated from the ISA description
+    s.decoder   = s.arch['decoder']
+    s.mem_insts = set(m for m, inst_def in s.arch['insts'].items()
+                        if 'm' in inst_def['syntax'].split(','))
+    s.buildExecTable()
+
+    # Decoded-instruction cache
+    #   Maps a PC to the decoded form of the word last seen at that PC.
+    #   An entry is only used if the raw word still matches, so the
+    #   cache is effectively keyed by (PC, raw word).
+    s.decoded        = {}
+    s.decoded_hits   = 0
+    s.decoded_misses = 0
+
+    # The instruction in decode and its decoded form, so that an
+    # instruction stalled in decode is only looked up (and counted) once
+    s.dec_D          = (None, None)
+
+    # CPI stack (see CPI_*): cycles per cause, overall and in the ROI
+    s.cpi_stack     = [0] * len(cpi_causes)
+    s.cpi_stack_roi = [0] * len(cpi_causes)
+
+    # The cause of the bubble in each pipeline register, if it holds
+    # one. The pipeline starts out waiting for its first instruction.
+    s.bub_f2d = CPI_ICACHE
+    s.bub_d2x = CPI_ICACHE
+    s.bub_x2m = CPI_ICACHE
+    s.bub_m2w = CPI_ICACHE
+
     # Memory calls
     s.MemReadFunct  = None
     s.MemWriteFunct = None
@@ -76,6 +252,12 @@ class FiveStageInorderCore():
     s.roi       = False
     s.inst_c    = False
 
+    # Linetrace events of the last cycle (see stageTraces)
+    s.lt_events = (LT_IDLE,) * 5
+
+    # Whether the last tick changed any pipeline state (see quietCycles)
+    s.progress  = True
+
   def getExitStatus(s):
     return s.exit, s.exit_code
 
@@ -117,22 +299,19 @@ class FiveStageInorderCore():
     s.squash    = True
     s.squash_pc = npc
 
-  def train_bp(s, pc, npc, br_type, outcome):
-    pass
+  def train_bp(s, pc, npc, br_type, outcome, pred_npc):
+    s.bp.update(pc, npc, br_type, outcome, pred_npc)
 
   # Stages are implemented as functions
   #=====================================================================
   # Fetch Stage
   #=====================================================================
   def f(s):
-    lt_buf = ''
-
     if s.f2d is None:
       # We are not stalling
       if s.iMemCanReq():
         # Next PC
-        ppc = s.pc
-        npc = s.pc + 4
+        npc = s.bp.predict(s.pc)
 
         # Memory request
         req = {}
@@ -142,162 +321,145 @@ class FiveStageInorderCore():
         req['size'] = 4
         req['mask'] = None
         req['tag' ] = s.epoch
+        req['pc'  ] = s.pc
 
         s.iMemSendReq(req)
 
         # Pipeline register
-        s.f2d = {}
-        s.f2d['pc'      ] = s.pc
-        s.f2d['npc'     ] = npc
+        dinst = s.f2d = s.makeDinst(s.pc, npc)
 
         # Advance PC
         s.pc = npc
 
-        # Print the PC
-        ppc_str = '{:#010x}'.format(ppc)
-
+        # Fetched down the wrong path (decode squashes it by its epoch)
         if s.squash:
-          ppc_str = '-'
+          dinst.squashed = True
 
-        lt_buf = '{: <10}'.format(ppc_str)
+        return dinst
       else:
-        lt_buf = '{: <10}'.format('S_imem')
+        s.bub_f2d = CPI_ICACHE
+        return LT_S_IMEM
     else:
-      lt_buf = '{: <10}'.format('S <<<')
-
-    return lt_buf
+      return LT_BUSY
 
   #=====================================================================
   # Decode Stage
   #=====================================================================
   ### Aux methods and functions
-  def makeDinst(s):
-    dinst = {}
-    dinst['inst'    ] = 0
-    dinst['mnemonic'] = 'undef'
-    dinst['squashed'] = False
-    dinst['rs'      ] = 0
-    dinst['rs_data' ] = 0xdeadbeef
-    dinst['rt'      ] = 0
-    dinst['rt_data' ] = 0xdeadcafe
-    dinst['rd'      ] = 0
-    dinst['imm16'   ] = 0
-    dinst['imm26'   ] = 0
-    dinst['isMem'   ] = False
-    dinst['pc'      ] = 0
-    dinst['npc'     ] = 0
-    dinst['dep'     ] = {}
-    dinst['dep'     ]['R'] = []
-    dinst['dep'     ]['W'] = []
-    dinst['wb_data' ] = None
-    dinst['wb_en'   ] = False
-
-    return dinst
+  def makeDinst(s, pc, npc):
+    return DynamicInst(pc, npc)
 
   def squashDinst(s, dinst):
-    dinst['mnemonic'] = '-'
-    dinst['squashed'] = True
-    dinst['rs'      ] = 0
-    dinst['rs_data' ] = 0xdeadbeef
-    dinst['rt'      ] = 0
-    dinst['rs_data' ] = 0xdeadcafe
-    dinst['rd'      ] = 0
-    dinst['imm16'   ] = 0
-    dinst['imm26'   ] = 0
-    dinst['isMem'   ] = False
-    dinst['dep'     ] = {}
-    dinst['dep'     ]['R'] = []
-    dinst['dep'     ]['W'] = []
-    dinst['wb_data' ] = None
-    dinst['wb_en'   ] = False
+    # Squashed instructions keep their fields; they are simply ignored
+    # by every stage (and never had their dependencies filled in).
+    dinst.squashed = True
 
     return dinst
 
   def decodeDinst(s, inst):
-    mnemonic = 'undef'
-    isMem    = False
+    # Walk the decode tree generated from the ISA description; the
+    # cost is the same for every instruction.
+    node = s.decoder
+    while node.__class__ is tuple:
+      shift, mask, children = node
+      node = children.get((inst >> shift) & mask, 'undef')
+    mnemonic = node
+
+    # Memory
+    isMem = mnemonic in s.mem_insts
+
+    # Done
+    return mnemonic, isMem
 
-    # Fields
-    opcode = (inst >> 26) & 0x0000003f
+  def decodeInst(s, pc, inst):
+    # Hit in the decoded-instruction cache?
+    entry = s.decoded.get(pc)
+    if entry is not None and entry[0] == inst:
+      s.decoded_hits += 1
+      return entry
+
+    s.decoded_misses += 1
+
+    #### Extract fields
     rs     = (inst >> 21) & 0x0000001f
     rt     = (inst >> 16) & 0x0000001f
-    cond   = (inst >> 16) & 0x0000001f
     rd     = (inst >> 11) & 0x0000001f
     shamt  = (inst >>  6) & 0x0000001f
-    funct  = (inst >>  0) & 0x0000003f
     imm16  = (inst >>  0) & 0x0000ffff
     imm26  = (inst >>  0) & 0x03ffffff
 
-    if opcode == 0x0:
-      if   funct == 0x00: mnemonic = 'sll'
-      elif funct == 0x02: mnemonic = 'srl'
-      elif funct == 0x03: mnemonic = 'sra'
-      elif funct == 0x04: mnemonic = 'sllv'
-      elif funct == 0x06: mnemonic = 'srlv'
-      elif funct == 0x07: mnemonic = 'srav'
-      elif funct == 0x08: mnemonic = 'jr'
-      elif funct == 0x0c: mnemonic = 'syscall'
-      elif funct == 0x18:
-        if   shamt == 0x02: mnemonic = 'mul'
-        elif shamt == 0x03: mnemonic = 'muh'
-      elif funct == 0x19:
-        if   shamt == 0x02: mnemonic = 'mulu'
-        elif shamt == 0x03: mnemonic = 'muhu'
-      elif funct == 0x1a:
-        if   shamt == 0x02: mnemonic = 'div'
-        elif shamt == 0x03: mnemonic = 'mod'
-      elif funct == 0x1b:
-        if   shamt == 0x02: mnemonic = 'divu'
-        elif shamt == 0x03: mnemonic = 'modu'
-      elif funct == 0x20: mnemonic = 'add'
-      elif funct == 0x21: mnemonic = 'addu'
-      elif funct == 0x22: mnemonic = 'sub'
-      elif funct == 0x23: mnemonic = 'subu'
-      elif funct == 0x24: mnemonic = 'and'
-      elif funct == 0x25: mnemonic = 'or'
-      elif funct == 0x26: mnemonic = 'xor'
-      elif funct == 0x27: mnemonic = 'nor'
-    elif opcode == 0x01:
-      if   cond == 0x00: mnemonic = 'bltz'
-      elif cond == 0x01: mnemonic = 'bgez'
-    elif opcode == 0x02: mnemonic = 'j'
-    elif opcode == 0x03: mnemonic = 'jal'
-    elif opcode == 0x04: mnemonic = 'beq'
-    elif opcode == 0x05: mnemonic = 'bne'
-    elif opcode == 0x06: mnemonic = 'blez'
-    elif opcode == 0x07: mnemonic = 'bgtz'
-    elif opcode == 0x08: mnemonic = 'addi'
-    elif opcode == 0x09: mnemonic = 'addiu'
-    elif opcode == 0x0c: mnemonic = 'andi'
-    elif opcode == 0x0d: mnemonic = 'ori'
-    elif opcode == 0x0e: mnemonic = 'xori'
-    elif opcode == 0x0f: mnemonic = 'lui'
-    elif opcode == 0x20: mnemonic = 'lb'
-    elif opcode == 0x21: mnemonic = 'lh'
-    elif opcode == 0x23: mnemonic = 'lw'
-    elif opcode == 0x24: mnemonic = 'lbu'
-    elif opcode == 0x25: mnemonic = 'lhu'
-    elif opcode == 0x28: mnemonic = 'sb'
-    elif opcode == 0x29: mnemonic = 'sh'
-    elif opcode == 0x2b: mnemonic = 'sw'
-
-    # Memory
-    if   mnemonic == 'lb' : isMem = True
-    elif mnemonic == 'lbu': isMem = True
-    elif mnemonic == 'lh' : isMem = True
-    elif mnemonic == 'lhu': isMem = True
-    elif mnemonic == 'lw' : isMem = True
-    elif mnemonic == 'sb' : isMem = True
-    elif mnemonic == 'sh' : isMem = True
-    elif mnemonic == 'sw' : isMem = True
-
-    # Done
-    return mnemonic, isMem
+    mnemonic, isMem = s.decodeDinst(inst)
+
+    validInst = mnemonic in s.arch['insts']
+
+    # Register read, perhaps?
+    reads_rs = False
+    reads_rt = False
+    write_rd = False
+    write_rt = False
+
+    # Destination of 'd' (jal implicitly links into $ra)
+    dst = rd
+
+    if validInst:
+      # Get dependencies
+      inst_def    = s.arch['insts'][mnemonic]
+      inst_syntax = inst_def['syntax']
+
+      # hawajkm: we need to think about implicit operands.
+      if mnemonic == 'jal':
+        write_rd = True
+        dst      = 31
+
+      operands    = inst_syntax.split(',')
+
+      for op in operands:
+        if   op == 'd' and rd != 0: write_rd = True
+        elif op == 'T' and rt != 0: write_rt = True
+        elif op == 's'            : reads_rs = True
+        elif op == 't'            : reads_rt = True
+        elif op == 'm'            : reads_rs = True
+
+    dep_W = []
+    dep_R = []
+    if write_rd: dep_W.append(dst)
+    if write_rt: dep_W.append(rt)
+    if reads_rs: dep_R.append(rs)
+    if reads_rt: dep_R.append(rt)
+
+    # Entries are shared by every dynamic instance of the instruction,
+    # hence the tuples.
+    entry = (inst, mnemonic, isMem, validInst,
+             rs, rt, rd, shamt, imm16, imm26,
+             reads_rs, reads_rt, tuple(dep_R), tuple(dep_W))
+
+    s.decoded[pc] = entry
+
+    return entry
+
+  def loadUse(s, dinst):
+    # Whether a data hazard is on a load's result: the closest older
+    # writer of a register the instruction waits for is a load
+    xInst = s.forwarding_network['X']
+    mInst = s.forwarding_network['M']
+    for reg in dinst.dep_R:
+      if s.ready_list[reg] == 0:
+        continue
+      if   xInst is not None and reg in xInst.dep_W: producer = xInst
+      elif mInst is not None and reg in mInst.dep_W: producer = mInst
+      else: continue
+      if producer.isMem:
+        return True
+    return False
+
+  def invalidateDecoded(s, addr, size):
+    # A store into the text section must not leave stale entries behind
+    if s.decoded:
+      for pc in range(addr & ~0x3, addr + size, 4):
+        s.decoded.pop(pc, None)
 
   ### Decode stage itself
   def d(s):
-    lt_buf = ''
-
     if s.f2d is not None and s.d2x is None:
       if (s.iMemHasResp() or (s.inst_D is not None)) and not s.block_D:
         # Fill the buffer if it is empty
@@ -312,92 +474,51 @@ class FiveStageInorderCore():
         mask  = resp['mask']
         epoch = resp['tag' ]
 
-        pc    = s.f2d['pc' ]
-        npc   = s.f2d['npc']
+        dinst = s.f2d
+        pc    = dinst.pc
+        npc   = dinst.npc
 
         # We squash if the instruction is from an older epoch
         squashed = (epoch < s.epoch) or s.squash
 
         assert (addr == pc)
 
-        inst = 0
-        for i in range(4):
-          inst = inst | (data[i] << (i * 8))
-
-        # Decode the instruction
-        #### Extract fields
-        opcode = (inst >> 26) & 0x0000003f
-        rs     = (inst >> 21) & 0x0000001f
-        rt     = (inst >> 16) & 0x0000001f
-        cond   = (inst >> 16) & 0x0000001f
-        rd     = (inst >> 11) & 0x0000001f
-        shamt  = (inst >>  6) & 0x0000001f
-        funct  = (inst >>  0) & 0x0000003f
-        imm16  = (inst >>  0) & 0x0000ffff
-        imm26  = (inst >>  0) & 0x03ffffff
-
-        dinst = s.makeDinst()
-
-        dinst['inst' ] = inst
-        dinst['rs'   ] = rs
-        dinst['rt'   ] = rt
-        dinst['rd'   ] = rd
-        dinst['shamt'] = shamt
-        dinst['imm16'] = imm16
-        dinst['imm26'] = imm26
-        dinst['pc'   ] = pc
-        dinst['npc'  ] = npc
-
-        # Decode
-        mnemonic, isMem = s.decodeDinst(inst)
+        inst = int.from_bytes(data[:4], 'little')
+
+        # Decode the instruction (through the decoded-instruction cache)
+        if s.dec_D[0] is not dinst:
+          s.dec_D = (dinst, s.decodeInst(pc, inst))
+
+        (_, mnemonic, isMem, validInst,
+         rs, rt, rd, shamt, imm16, imm26,
+         reads_rs, reads_rt, dep_R, dep_W) = s.dec_D[1]
+
+        dinst.inst     = inst
+        dinst.rs       = rs
+        dinst.rt       = rt
+        dinst.rd       = rd
+        dinst.shamt    = shamt
+        dinst.imm16    = imm16
+        dinst.imm26    = imm26
 
         # Set the instruction
-        dinst['mnemonic'] = mnemonic
-        dinst['isMem'   ] = isMem
+        dinst.mnemonic = mnemonic
+        dinst.isMem    = isMem
 
         if squashed:
           s.squashDinst(dinst)
 
-        if squashed:
           # Done!!
           s.inst_D = None
 
           s.d2x    = dinst
           s.f2d    = None
 
-          lt_buf = '{: <8}'.format(dinst['mnemonic'])
+          return dinst
         else:
-          validInst = dinst['mnemonic'] in s.arch['insts']
-
-          # Register read, perhaps?
-          reads_rs = False
-          reads_rt = False
-          write_rd = False
-          write_rt = False
-
-          if validInst:
-            # Get dependencies
-            inst_def    = s.arch['insts'][dinst['mnemonic']]
-            inst_syntax = inst_def['syntax']
-
-            # hawajkm: we need to think about implicit operands.
-            if mnemonic == 'jal':
-              write_rd = True
-              rd       = 31 
-
-            operands    = inst_syntax.split(',')
-
-            for op in operands:
-              if   op == 'd' and rd != 0: write_rd = True
-              elif op == 'T' and rt != 0: write_rt = True
-              elif op == 's'            : reads_rs = True
-              elif op == 't'            : reads_rt = True
-              elif op == 'm'            : reads_rs = True
-
-            if write_rd: dinst['dep']['W'].append(rd)
-            if write_rt: dinst['dep']['W'].append(rt)
-            if reads_rs: dinst['dep']['R'].append(rs)
-            if reads_rt: dinst['dep']['R'].append(rt)
+          # Dependencies were precomputed when the instruction was decoded
+          dinst.dep_R = dep_R
+          dinst.dep_W = dep_W
 
           # Data hazards
           xInst = s.forwarding_network['X']
@@ -408,23 +529,23 @@ class FiveStageInorderCore():
           rt_src = -1
           if reads_rs and s.ready_list[rs] != 0:
             # Check if we can forward data!
-            if   (xInst is not None) and (rs in xInst['dep']['W']):
+            if   (xInst is not None) and (rs in xInst.dep_W):
               rs_src = -1
-            elif (mInst is not None) and (rs in mInst['dep']['W']):
-              if not mInst['isMem']:
+            elif (mInst is not None) and (rs in mInst.dep_W):
+              if not mInst.isMem:
                 rs_src = 1
-            elif (wInst is not None) and (rs in wInst['dep']['W']):
+            elif (wInst is not None) and (rs in wInst.dep_W):
               rs_src = 2
           else:
             rs_src = 0
           if reads_rt and s.ready_list[rt] != 0:
             # Check if we can forward data!
-            if   (xInst is not None) and (rt in xInst['dep']['W']):
+            if   (xInst is not None) and (rt in xInst.dep_W):
               rt_src = -1
-            elif (mInst is not None) and (rt in mInst['dep']['W']):
-              if not mInst['isMem']:
+            elif (mInst is not None) and (rt in mInst.dep_W):
+              if not mInst.isMem:
                 rt_src = 1
-            elif (wInst is not None) and rt in wInst['dep']['W']:
+            elif (wInst is not None) and rt in wInst.dep_W:
               rt_src = 2
           else:
             rt_src = 0
@@ -442,50 +563,55 @@ class FiveStageInorderCore():
 
           # Perform reads
           if   stall_Syscall:
-            lt_buf = '{: <8}'.format('S |>>')
+            s.bub_d2x = CPI_SYSCALL
+            return LT_S_SYSCALL
           elif not stall_D:
             if reads_rs:
-              if   rs_src == 0: dinst['rs_data'] = s.rf[rs]
-              elif rs_src == 1: dinst['rs_data'] = mInst['wb_data']
-              elif rs_src == 2: dinst['rs_data'] = wInst['wb_data']
+              if   rs_src == 0: dinst.rs_data = s.rf[rs]
+              elif rs_src == 1: dinst.rs_data = mInst.wb_data
+              elif rs_src == 2: dinst.rs_data = wInst.wb_data
             if reads_rt:
-              if   rt_src == 0: dinst['rt_data'] = s.rf[rt]
-              elif rt_src == 1: dinst['rt_data'] = mInst['wb_data']
-              elif rt_src == 2: dinst['rt_data'] = wInst['wb_data']
+              if   rt_src == 0: dinst.rt_data = s.rf[rt]
+              elif rt_src == 1: dinst.rt_data = mInst.wb_data
+              elif rt_src == 2: dinst.rt_data = wInst.wb_data
 
             # Update the ready list
-            if write_rd: s.ready_list[rd] += 1
-            if write_rt: s.ready_list[rt] += 1
+            for reg in dep_W: s.ready_list[reg] += 1
 
-            # PC
+            # PC (as predicted by fetch)
             pred_npc = npc
 
             # Branch
-            outcome = 0 # Not taken
-            br_type = 0 # Not control-flow
+            outcome = 1       # Taken
+            br_type = BR_NONE # Not control-flow
 
             # Jumps
-            if   dinst['mnemonic'] == 'j'  :
+            if   dinst.mnemonic == 'j'  :
               high_bits = pc & 0xf0000000
               npc = high_bits | (imm26 << 2)
-              br_type = 2
-              outcome = 1
-            elif dinst['mnemonic'] == 'jal':
+              br_type = BR_JUMP
+            elif dinst.mnemonic == 'jal':
               high_bits = pc & 0xf0000000
               npc = high_bits | (imm26 << 2)
-              br_type = 2
-              outcome = 1
+              br_type = BR_CALL
+
+            # Anything but control flow falls through (fetch may have
+            # predicted otherwise from a stale BTB entry)
+            elif npc != pc + 4 and mnemonic not in ctrl_insts:
+              npc = pc + 4
 
             # Block decoding once a syscall is encountered
             if mnemonic == 'syscall': s.block_D = True
 
             # Training BP
-            if br_type != 0:
-              s.train_bp(pc, npc, br_type, outcome)
+            if br_type != BR_NONE:
+              s.train_bp(pc, npc, br_type, outcome, pred_npc)
 
             # Initiate squash
             if pred_npc != npc:
               s.init_squash(npc)
+              s.redirects_D += 1
+              dinst.npc = npc
 
             # Done!!
             s.inst_D = None
@@ -493,21 +619,21 @@ class FiveStageInorderCore():
             s.d2x    = dinst
             s.f2d    = None
 
-            # linetracing
-            lt_buf = '{: <8}'.format(dinst['mnemonic'])
+            return dinst
           else:
-            lt_buf = '{: <8}'.format('S raw')
+            s.bub_d2x = CPI_LOAD_USE if s.loadUse(dinst) else CPI_RAW
+            return LT_S_RAW
       elif (s.iMemHasResp() or (s.inst_D is not None)) and s.block_D:
-        lt_buf = '{: <8}'.format('S >>|')
+        s.bub_d2x = CPI_SYSCALL
+        return LT_S_BLOCKED
       else:
-        lt_buf = '{: <8}'.format('S mem')
+        s.bub_d2x = CPI_SQUASH if s.f2d.squashed else CPI_ICACHE
+        return LT_S_MEM
     elif s.f2d is not None and s.d2x is not None:
-      lt_buf = '{: <8}'.format('S <<<')
+      return LT_BUSY
     else:
-      lt_buf = '{: <8}'.format(' ')
-
-    # Done
-    return lt_buf
+      s.bub_d2x = s.bub_f2d
+      return LT_IDLE
 
   #=====================================================================
   # Aux methods and functions
@@ -529,7 +655,7 @@ class FiveStageInorderCore():
   def zext(s, data):
     return data
 
-  def makeMemReadReq(s, addr, size):
+  def makeMemReadReq(s, addr, size, pc):
     mem_req = {}
 
     mem_req['op'  ] = 0
@@ -538,26 +664,145 @@ class FiveStageInorderCore():
     mem_req['size'] = size
     mem_req['mask'] = None
     mem_req['tag' ] = None
+    mem_req['pc'  ] = pc
 
     return mem_req
 
-  def makeMemWriteReq(s, addr, data, size):
+  def makeMemWriteReq(s, addr, data, size, pc):
     mem_req = {}
 
-    byte_array = []
-    for i in range(size):
-      byte_array.append(data & 0xff)
-      data = data >> 8
-
     mem_req['op'  ] = 1
-    mem_req['data'] = byte_array
+    mem_req['data'] = (data & ((1 << (8 * size)) - 1)).to_bytes(size, 'little')
     mem_req['addr'] = addr
     mem_req['size'] = size
     mem_req['mask'] = None
     mem_req['tag' ] = None
+    mem_req['pc'  ] = pc
 
     return mem_req
 
+  #=====================================================================
+  # Execution Handlers
+  #   One handler per execution family; the family of an instruction is
+  #   picked from its operand syntax (see buildExecTable). Handlers
+  #   fill in wb_data/wb_en and return the actual npc.
+  #=====================================================================
+  def buildExecTable(s):
+    families = {}
+    families['d,s,t'] = s.execAluRR     # ALU Reg-Reg, MUL/DIV/MOD
+    families['d,s,S'] = s.execAluRS     # Shifts by shamt
+    families['T,s,i'] = s.execAluRI     # ALU Reg-Imm
+    families['T,i'  ] = s.execAluRI     # lui
+    families['T,m'  ] = s.execLoad
+    families['t,m'  ] = s.execStore
+    families['s,t,p'] = s.execBranch
+    families['s,p'  ] = s.execBranch
+    families['l'    ] = s.execJump
+    families['s'    ] = s.execJumpReg
+    families[''     ] = s.execSyscall
+
+    s.exec_tbl = {}
+    for mnemonic, inst_def in s.arch['insts'].items():
+      if mnemonic in exec_ops:
+        s.exec_tbl[mnemonic] = (families[inst_def['syntax']], exec_ops[mnemonic])
+
+    s.exec_undef = (s.execUndef, None)
+
+  #================#
+  #      ALUs      #
+  #================#
+  def execAluRR(s, dinst, op):
+    dinst.wb_data = op(s, dinst.rs_data, dinst.rt_data) & 0xffffffff
+    dinst.wb_en   = True
+    return dinst.npc
+
+  def execAluRS(s, dinst, op):
+    dinst.wb_data = op(s, dinst.rs_data, dinst.shamt) & 0xffffffff
+    dinst.wb_en   = True
+    return dinst.npc
+
+  def execAluRI(s, dinst, op):
+    dinst.wb_data = op(s, dinst.rs_data, dinst.imm16) & 0xffffffff
+    dinst.wb_en   = True
+    return dinst.npc
+
+  #================#
+  #     Memory     #
+  #================#
+  def execLoad(s, dinst, size):
+    ea = dinst.rs_data + s.signed(s.sext(dinst.imm16))
+
+    mem_req = s.makeMemReadReq(ea, size, dinst.pc)
+    s.dMemSendReq(mem_req)
+
+    dinst.ea      = ea
+    dinst.ea_size = size
+    dinst.wb_data = None
+    dinst.wb_en   = True
+    return dinst.npc
+
+  def execStore(s, dinst, size):
+    ea = dinst.rs_data + s.signed(s.sext(dinst.imm16))
+
+    mem_req = s.makeMemWriteReq(ea, dinst.rt_data, size, dinst.pc)
+    s.dMemSendReq(mem_req)
+    s.invalidateDecoded(ea, size)
+
+    dinst.ea      = ea
+    dinst.ea_size = size
+    dinst.wb_data = None
+    dinst.wb_en   = False
+    return dinst.npc
+
+  #================#
+  #  Control Flow  #
+  #================#
+  def execBranch(s, dinst, cond):
+    pc  = dinst.pc
+    npc = pc + 4
+    tpc = pc + 4 + (s.signed(s.sext(dinst.imm16, 16)) << 2)
+
+    bcond = cond(s, dinst.rs_data, dinst.rt_data)
+    if bcond: npc = tpc
+
+    s.train_bp(pc, npc, BR_COND, 1 if bcond else 0, dinst.npc)
+    return npc
+
+  def execJump(s, dinst, link):
+    # Jumps are resolved in decode; only the link is left
+    if link:
+      dinst.wb_data = dinst.pc + 4
+      dinst.wb_en   = True
+    return dinst.npc
+
+  def execJumpReg(s, dinst, op):
+    npc = dinst.rs_data
+    s.train_bp(dinst.pc, npc, BR_RET if dinst.rs == 31 else BR_JUMP, 1, dinst.npc)
+    return npc
+
+  #================#
+  #    Syscall     #
+  #================#
+  def execSyscall(s, dinst, op):
+    # hawajkm: due to its execution nature, syscall causes a
+    #          pipeline drain; thus, we don't have to worry about
+    #          any dependencies and we can just read the current
+    #          execution context as-is.
+    s.execute_sc(s.rf[2])
+    return dinst.npc
+
+  #================#
+  #   Undefined    #
+  #================#
+  def execUndef(s, dinst, op):
+    print('')
+    print('  Error! Encountered an undefined instruction')
+    print('    - inst: {:#010x}'.format(dinst.inst))
+    print('    - pc  : {:#010x}'.format(dinst.pc))
+    print('')
+    print('')
+    exit(-127)
+
   #=====================================================================
   # Execute Stage
   #=====================================================================
@@ -565,418 +810,44 @@ class FiveStageInorderCore():
     if   s.d2x is not None and s.x2m is     None:
       dinst = s.d2x
 
-      if dinst['squashed']:
+      if dinst.squashed:
         # Go forward
         s.x2m = dinst
         s.d2x = None
 
-        return '{: <8}'.format('-')
+        return dinst
 
       # Check memory if needed
       #                    memory stall condition
       #                             |
       #        /--------------------|--------------------\
       #        vvvvvvvvvvvvvvvvvvvvvvvvvvvvvvvvvvvvvvvvvvv
-      elif not (dinst['isMem'] and not s.dMemCanReq()):
-        # Read everything
-        inst     = dinst['inst'    ]
-        mnemonic = dinst['mnemonic']
-        squashed = dinst['squashed']
-        rs       = dinst['rs'      ]
-        rs_data  = dinst['rs_data' ]
-        rt       = dinst['rt'      ]
-        rt_data  = dinst['rt_data' ]
-        rd       = dinst['rd'      ]
-        shamt    = dinst['shamt'   ]
-        wb_data  = dinst['wb_data' ]
-        wb_en    = dinst['wb_en'   ]
-        imm16    = dinst['imm16'   ]
-        imm26    = dinst['imm26'   ]
-        isMem    = dinst['isMem'   ]
-        pc       = dinst['pc'      ]
-        pred_npc = dinst['npc'     ]
-        dep      = dinst['dep'     ]
-
-        # The actual npc is initialized as the predicted one
-        npc = pred_npc
-
-        # Branch
-        outcome = 0 # Not taken
-        br_type = 0 # Not control-flow
-
-        #================#
-        #      ALUs      #
-        #================#
-        if   mnemonic == 'add'  :
-          op1 = rs_data
-          op2 = rt_data
-          opD = op1 + op2
-          wb_data = (opD) & 0xffffffff
-          wb_en = True
-        elif mnemonic == 'addu' :
-          op1 = rs_data
-          op2 = rt_data
-          opD = op1 + op2
-          wb_data = (opD) & 0xffffffff
-          wb_en = True
-        elif mnemonic == 'sub'  :
-          op1 = rs_data
-          op2 = rt_data
-          opD = op1 - op2
-          wb_data = (opD) & 0xffffffff
-          wb_en = True
-        elif mnemonic == 'subu' :
-          op1 = rs_data
-          op2 = rt_data
-          opD = op1 - op2
-          wb_data = (opD) & 0xffffffff
-          wb_en = True
-        elif mnemonic == 'and'  :
-          op1 = rs_data
-          op2 = rt_data
-          opD = op1 & op2
-          wb_data = (opD) & 0xffffffff
-          wb_en = True
-        elif mnemonic == 'or'   :
-          op1 = rs_data
-          op2 = rt_data
-          opD = op1 | op2
-          wb_data = (opD) & 0xffffffff
-          wb_en = True
-        elif mnemonic == 'xor'  :
-          op1 = rs_data
-          op2 = rt_data
-          opD = op1 ^ op2
-          wb_data = (opD) & 0xffffffff
-          wb_en = True
-        elif mnemonic == 'nor'  :
-          op1 = rs_data
-          op2 = rt_data
-          opD = ~(op1 | op2)
-          wb_data = (opD) & 0xffffffff
-          wb_en = True
-
-        elif mnemonic == 'addi' :
-          op1 = rs_data
-          op2 = s.sext(imm16)
-          opD = op1 + op2
-          wb_data = (opD) & 0xffffffff
-          wb_en = True
-        elif mnemonic == 'addiu':
-          op1 = rs_data
-          op2 = s.sext(imm16)
-          opD = op1 + op2
-          wb_data = (opD) & 0xffffffff
-          wb_en = True
-        elif mnemonic == 'andi' :
-          op1 = rs_data
-          op2 = s.zext(imm16)
-          opD = op1 & op2
-          wb_data = (opD) & 0xffffffff
-          wb_en = True
-        elif mnemonic == 'ori'  :
-          op1 = rs_data
-          op2 = s.zext(imm16)
-          opD = op1 | op2
-          wb_data = (opD) & 0xffffffff
-          wb_en = True
-        elif mnemonic == 'xori' :
-          op1 = rs_data
-          op2 = s.zext(imm16)
-          opD = op1 ^ op2
-          wb_data = (opD) & 0xffffffff
-          wb_en = True
-        elif mnemonic == 'lui' :
-          op1 = s.zext(imm16)
-          opD = op1 << 16
-          wb_data = (opD) & 0xffffffff
-          wb_en = True
-
-        elif mnemonic == 'sll'  :
-          op1 = rs_data
-          op2 = shamt
-          opD = op1 << op2
-          wb_data = (opD) & 0xffffffff
-          wb_en = True
-        elif mnemonic == 'srl'  :
-          op1 = rs_data
-          op2 = shamt
-          opD = op1 >> op2
-          wb_data = (opD) & 0xffffffff
-          wb_en = True
-        elif mnemonic == 'sra'  : pass
-        elif mnemonic == 'sllv' :
-          op1 = rs_data
-          op2 = rt_data
-          opD = op1 << op2
-          wb_data = (opD) & 0xffffffff
-          wb_en = True
-        elif mnemonic == 'srlv' :
-          op1 = rs_data
-          op2 = rt_data
-          opD = op1 >> op2
-          wb_data = (opD) & 0xffffffff
-          wb_en = True
-        elif mnemonic == 'srav' : pass
-
-        #================#
-        #  MUL/DIV/MOD   #
-        #================#
-        elif mnemonic == 'mul'  :
-          op1 = s.signed(rs_data)
-          op2 = s.signed(rt_data)
-          opD = op1 * op2
-          wb_data = (opD) & 0xffffffff
-          wb_en = True
-        elif mnemonic == 'muh'  :
-          op1 = s.signed(rs_data)
-          op2 = s.signed(rt_data)
-          opD = (op1 * op2) / (2 ** 32)
-          wb_data = (opD) & 0xffffffff
-          wb_en = True
-        elif mnemonic == 'mulu' :
-          op1 = rs_data
-          op2 = rt_data
-          opD = op1 * op2
-          wb_data = (opD) & 0xffffffff
-          wb_en = True
-        elif mnemonic == 'muhu' :
-          op1 = rs_data
-          op2 = rt_data
-          opD = (op1 * op2) / (2 ** 32)
-          wb_data = (opD) & 0xffffffff
-          wb_en = True
-
-        elif mnemonic == 'div'  :
-          op1 = s.signed(rs_data)
-          op2 = s.signed(rt_data)
-          opD = int(op1 / op2)
-          wb_data = (opD) & 0xffffffff
-          wb_en = True
-        elif mnemonic == 'mod'  :
-          op1 = s.signed(rs_data)
-          op2 = s.signed(rt_data)
-          opD = int(op1 % op2)
-          wb_data = (opD) & 0xffffffff
-          wb_en = True
-        elif mnemonic == 'divu' :
-          op1 = rs_data
-          op2 = rt_data
-          opD = int(op1 / op2)
-          wb_data = (opD) & 0xffffffff
-          wb_en = True
-        elif mnemonic == 'modu' :
-          op1 = rs_data
-          op2 = rt_data
-          opD = int(op1 % op2)
-          wb_data = (opD) & 0xffffffff
-          wb_en = True
-
-        #================#
-        #     Memory     #
-        #================#
-        elif mnemonic == 'lb'   :
-          op1 = rs_data
-          op2 = s.signed(s.sext(imm16))
-          ea  = op1 + op2
-
-          mem_req = s.makeMemReadReq(ea, 1)
-          s.dMemSendReq(mem_req)
-
-          wb_data = None
-          wb_en = True
-        elif mnemonic == 'lh'   :
-          op1 = rs_data
-          op2 = s.signed(s.sext(imm16))
-          ea  = op1 + op2
-
-          mem_req = s.makeMemReadReq(ea, 2)
-          s.dMemSendReq(mem_req)
-
-          wb_data = None
-          wb_en = True
-        elif mnemonic == 'lw'   :
-          op1 = rs_data
-          op2 = s.signed(s.sext(imm16))
-          ea  = op1 + op2
-
-          mem_req = s.makeMemReadReq(ea, 4)
-          s.dMemSendReq(mem_req)
-
-          wb_data = None
-          wb_en = True
-        elif mnemonic == 'lbu'  :
-          op1 = rs_data
-          op2 = s.signed(s.sext(imm16))
-          ea  = op1 + op2
-
-          mem_req = s.makeMemReadReq(ea, 1)
-          s.dMemSendReq(mem_req)
-
-          wb_data = None
-          wb_en = True
-        elif mnemonic == 'lhu'  :
-          op1 = rs_data
-          op2 = s.signed(s.sext(imm16))
-          ea  = op1 + op2
-
-          mem_req = s.makeMemReadReq(ea, 2)
-          s.dMemSendReq(mem_req)
-
-          wb_data = None
-          wb_en = True
-        elif mnemonic == 'sb'   :
-          op1 = rs_data
-          op2 = s.signed(s.sext(imm16))
-          ea  = op1 + op2
-          data = rt_data
-
-          mem_req = s.makeMemWriteReq(ea, data, 1)
-          s.dMemSendReq(mem_req)
-
-          wb_data = None
-          wb_en = False
-        elif mnemonic == 'sh'   :
-          op1 = rs_data
-          op2 = s.signed(s.sext(imm16))
-          ea  = op1 + op2
-          data = rt_data
-
-          mem_req = s.makeMemWriteReq(ea, data, 2)
-          s.dMemSendReq(mem_req)
-
-          wb_data = None
-          wb_en = False
-        elif mnemonic == 'sw'   :
-          op1 = rs_data
-          op2 = s.signed(s.sext(imm16))
-          ea  = op1 + op2
-          data = rt_data
-
-          mem_req = s.makeMemWriteReq(ea, data, 4)
-          s.dMemSendReq(mem_req)
-
-          wb_data = None
-          wb_en = False
-
-        #================#
-        #  Control Flow  #
-        #================#
-        elif mnemonic == 'beq'  :
-          op1 = rs_data
-          op2 = rt_data
-          tpc = pc + 4 + (s.signed(s.sext(imm16, 16)) << 2)
-          bcond = op1 == op2
-          br_type = 1
-          outcome = 1 if bcond else 0
-          if bcond: npc = tpc
-        elif mnemonic == 'bne'  :
-          op1 = rs_data
-          op2 = rt_data
-          tpc = pc + 4 + (s.signed(s.sext(imm16, 16)) << 2)
-          bcond = op1 != op2
-          br_type = 1
-          outcome = 1 if bcond else 0
-          if bcond: npc = tpc
-        elif mnemonic == 'bltz' :
-          op1 = rs_data
-          op2 = rt_data
-          tpc = pc + 4 + (s.signed(s.sext(imm16, 16)) << 2)
-          bcond = s.signed(op1) < 0
-          br_type = 1
-          outcome = 1 if bcond else 0
-          if bcond: npc = tpc
-        elif mnemonic == 'bgez' :
-          op1 = rs_data
-          op2 = rt_data
-          tpc = pc + 4 + (s.signed(s.sext(imm16, 16)) << 2)
-          bcond = s.signed(op1) >= 0
-          br_type = 1
-          outcome = 1 if bcond else 0
-          if bcond: npc = tpc
-        elif mnemonic == 'blez' :
-          op1 = rs_data
-          op2 = rt_data
-          tpc = pc + 4 + (s.signed(s.sext(imm16, 16)) << 2)
-          bcond = s.signed(op1) <= 0
-          br_type = 1
-          outcome = 1 if bcond else 0
-          if bcond: npc = tpc
-        elif mnemonic == 'bgtz' :
-          op1 = rs_data
-          op2 = rt_data
-          tpc = pc + 4 + (s.signed(s.sext(imm16, 16)) << 2)
-          bcond = s.signed(op1) > 0
-          br_type = 1
-          outcome = 1 if bcond else 0
-          if bcond: npc = tpc
-
-        elif mnemonic == 'j'    : pass  # Nothing to do
-        elif mnemonic == 'jal'  :
-          wb_data = pc + 4
-          wb_en = True
-        elif mnemonic == 'jr'   :
-          op1 = rs_data
-          npc = op1
-          br_type = 2
-          outcome = 1
-
-        #================#
-        #    Syscall     #
-        #================#
-        elif mnemonic == 'syscall':
-          # hawajkm: due to its execution nature, syscall causes a
-          #          pipeline drain; thus, we don't have to worry about
-          #          any dependencies and we can just read the current
-          #          execution context as-is.
-
-          # Get all arguments
-          #arg0 = s.rf[4]
-          #arg1 = s.rf[5]
-          #arg2 = s.rf[6]
-          #arg3 = s.rf[7]
-
-          sc_code = s.rf[2]
-
-          #v0 = s.execute_sc(sc_code, arg0, arg1, arg2, arg3)
-          s.execute_sc(sc_code)
-
-        #================#
-        #   Undefined    #
-        #================#
-        elif mnemonic == 'undef':
-          print('')
-          print('  Error! Encountered an undefined instruction')
-          print('    - inst: {:#010x}'.format(dinst['inst']))
-          print('    - pc  : {:#010x}'.format(dinst['pc'  ]))
-          print('')
-          print('')
-          exit(-127)
-
-        # Train BP
-        if br_type != 0:
-          s.train_bp(pc, npc, br_type, outcome)
+      elif not (dinst.isMem and not s.dMemCanReq()):
+        # Dispatch on the mnemonic
+        handler, op = s.exec_tbl.get(dinst.mnemonic, s.exec_undef)
+
+        # Handlers return the actual npc
+        npc = handler(dinst, op)
 
         # Initiate a squash if actual npc is different
         # from predicted npc
-        if pred_npc != npc:
+        if dinst.npc != npc:
           s.init_squash(npc)
-
-        # Modify the dinst
-        dinst['wb_data'] = wb_data
-        dinst['wb_en'  ] = wb_en
+          s.redirects_X += 1
 
         # Go forward
         s.x2m = dinst
         s.d2x = None
 
-        return '{: <8}'.format(dinst['mnemonic'])
+        return dinst
       else:
-        return '{: <8}'.format('S mem')
+        s.bub_x2m = CPI_DCACHE
+        return LT_S_MEM
     elif s.d2x is not None and s.x2m is not None:
-      return '{: <8}'.format('S <<<')
+      return LT_BUSY
     else:
-      return '{: <8}'.format(' ')
+      s.bub_x2m = s.bub_d2x
+      return LT_IDLE
 
   #=====================================================================
   # Memory Stage
@@ -985,73 +856,77 @@ class FiveStageInorderCore():
     if   s.x2m is not None and s.m2w is     None:
       dinst = s.x2m
 
-      if dinst['squashed']:
+      if dinst.squashed:
         # Go forward
         s.m2w = dinst
         s.x2m = None
 
-        return '{: <8}'.format('-')
+        return dinst
 
       # Check memory if needed
       #               memory resp stall condition
       #                            |
       #         /------------------|-----------------\
       #         vvvvvvvvvvvvvvvvvvvvvvvvvvvvvvvvvvvvvv
-      elif not (dinst['isMem'] and not s.dMemHasResp()):
+      elif not (dinst.isMem and not s.dMemHasResp()):
         # Can process the instructions
         # If we have a memory instruction, we process the memory packet
-        if dinst['isMem']:
+        if dinst.isMem:
           mem_resp = s.dMemRecvResp()
-          if dinst['wb_en']:
-            data = 0
-            for i in range(mem_resp['size']):
-              data = data | (mem_resp['data'][i] << (8 * i))
+          if dinst.wb_en:
+            data = int.from_bytes(mem_resp['data'][:mem_resp['size']], 'little')
             # Extend?
-            if   dinst['mnemonic'] == 'lb': data = s.sext(data,  8)
-            elif dinst['mnemonic'] == 'lh': data = s.sext(data, 16)
-            dinst['wb_data'] = data
+            if   dinst.mnemonic == 'lb': data = s.sext(data,  8)
+            elif dinst.mnemonic == 'lh': data = s.sext(data, 16)
+            dinst.wb_data = data
 
         # Go forward
         s.m2w = dinst
         s.x2m = None
 
-        return '{: <8}'.format(dinst['mnemonic'])
+        return dinst
       else:
-        return '{: <8}'.format('S dmem')
+        s.bub_m2w = CPI_DCACHE
+        return LT_S_DMEM
     elif s.x2m is not None and s.m2w is not None:
-      return '{: <8}'.format('S <<<')
+      return LT_BUSY
     else:
-      return '{: <8}'.format(' ')
+      s.bub_m2w = s.bub_x2m
+      return LT_IDLE
 
   #=====================================================================
   # Writeback Stage
   #=====================================================================
   def w(s):
-    lt_buf = ''
-
     if s.m2w is not None:
       dinst = s.m2w
 
-      if dinst['squashed']:
-        lt_buf = '-'
-      else:
-        if dinst['mnemonic'] == 'syscall': s.block_D_s = False
-        if dinst['wb_en']:
+      if not dinst.squashed:
+        if dinst.mnemonic == 'syscall': s.block_D_s = False
+        if dinst.wb_en:
           # Perform writeback
-          for reg_idx in dinst['dep']['W']:
-            s.rf_s[reg_idx] = dinst['wb_data']
-            s.ready_list_s[reg_idx] = s.ready_list[reg_idx] - 1
-        # Linetracing
-        lt_buf = dinst['mnemonic']
+          for reg_idx in dinst.dep_W:
+            s.rf_s[reg_idx] = dinst.wb_data
+            s.ready_list_s[reg_idx] = -1
 
         # We completed an instruction
         s.inst_c = True
 
+        cause = CPI_BASE
+      else:
+        cause = CPI_SQUASH
+
       # Keep ticking...
       s.m2w = None
+    else:
+      dinst = LT_IDLE
+      cause = s.bub_m2w
 
-    # Linetracing
-    return '{: <8}'.format(lt_buf)
+    s.cpi_stack[cause] += 1
+    if s.roi:
+      s.cpi_stack_roi[cause] += 1
+
+    return dinst
 
   #=====================================================================
   # Syscall Emulation
@@ -1099,6 +974,9 @@ class FiveStageInorderCore():
     # Reset
     s.inst_c = False
 
+    # Pipeline state before ticking (to detect stalled cycles)
+    before = (s.f2d, s.d2x, s.x2m, s.m2w, s.inst_D, s.pc, s.epoch)
+
     # Eliminate unintentional forwarding from W to D
     # hawajkm: we use shadowed copies
     for i in range(len(s.ready_list_s)):
@@ -1116,17 +994,18 @@ class FiveStageInorderCore():
     s.forwarding_network['W'] = s.m2w
 
     # Tick backwords
-    lt_array = []
-    lt_array.insert(0, s.w())
-    lt_array.insert(0, s.m())
-    lt_array.insert(0, s.x())
-    lt_array.insert(0, s.d())
-    lt_array.insert(0, s.f())
+    ev_W = s.w()
+    ev_M = s.m()
+    ev_X = s.x()
+    ev_D = s.d()
+    ev_F = s.f()
 
     # Eliminate unintentional forwarding from W to D
+    # (applied as a change: decode may have issued another writer of
+    # the same register this cycle)
     for i in range(len(s.ready_list_s)):
       if s.ready_list_s[i] is not None:
-        s.ready_list[i] = s.ready_list_s[i]
+        s.ready_list[i] += s.ready_list_s[i]
     for i in range(len(s.rf_s)):
       if s.rf_s[i] is not None:
         s.rf[i] = s.rf_s[i]
@@ -1139,11 +1018,81 @@ class FiveStageInorderCore():
       s.pc     = s.squash_pc
       s.squash = False
 
-    # Linetrace
-    s.lt_buf = ''
-    for i, lt in enumerate(lt_array):
-      if i != 0: s.lt_buf += " | "
-      s.lt_buf += lt
+    # No stage moved an instruction, fetched or consumed a response
+    s.progress = before != (s.f2d, s.d2x, s.x2m, s.m2w, s.inst_D, s.pc, s.epoch)
+
+    # Linetrace events (formatted on demand)
+    s.lt_events = (ev_F, ev_D, ev_X, ev_M, ev_W)
+
+  #=====================================================================
+  # Event-driven simulation
+  #=====================================================================
+  # A tick that changed no pipeline state would repeat itself exactly
+  # for as long as the memory interface keeps answering the same way,
+  # so the core has no events of its own until something below it
+  # changes (None). Otherwise it must be ticked next cycle (0).
+  def quietCycles(s):
+    return 0 if s.progress else None
+
+  def skipCycles(s, n):
+    # The skipped cycles repeat the last one, in which no instruction
+    # moved: writeback charged the bubble in m2w, stalled stages tagged
+    # their register with the same cause again and idle ones passed the
+    # bubble above them on. Once every register has been passed on,
+    # the same bubble is charged every cycle.
+    _, ev_D, ev_X, ev_M, _ = s.lt_events
+    for i in range(n):
+      if i == 4:
+        s.cpi_stack[s.bub_m2w] += n - i
+        if s.roi:
+          s.cpi_stack_roi[s.bub_m2w] += n - i
+        break
+
+      s.cpi_stack[s.bub_m2w] += 1
+      if s.roi:
+        s.cpi_stack_roi[s.bub_m2w] += 1
+
+      if ev_M == LT_IDLE: s.bub_m2w = s.bub_x2m
+      if ev_X == LT_IDLE: s.bub_x2m = s.bub_d2x
+      if ev_D == LT_IDLE: s.bub_d2x = s.bub_f2d
+
+  #=====================================================================
+  # Linetracing
+  #=====================================================================
+  # Text of each stage for the last cycle: the PC (fetch) or mnemonic
+  # of the instruction it processed, '-' if it was squashed, or what
+  # the stage was waiting for
+  def stageTraces(s):
+    traces = []
+    for i, ev in enumerate(s.lt_events):
+      if   ev.__class__ is int: traces.append(lt_events[ev])
+      elif ev.squashed:         traces.append('-')
+      elif i == 0:              traces.append('{:#010x}'.format(ev.pc))
+      else:                     traces.append(ev.mnemonic)
+    return traces
 
   def linetrace(s):
-    return s.lt_buf
+    f, d, x, m, w = s.stageTraces()
+    return '{: <10} | {: <8} | {: <8} | {: <8} | {: <8}'.format(f, d, x, m, w)
+
+  #=====================================================================
+  # Checkpointing
+  #=====================================================================
+  # Derived from the ISA or wired up by the system; never checkpointed
+  ckpt_skip = ('arch', 'decoder', 'mem_insts', 'exec_tbl', 'exec_undef', 'bp',
+               'MemReadFunct', 'MemWriteFunct',
+               'iMemCanReq', 'iMemSendReq', 'iMemHasResp', 'iMemRecvResp',
+               'dMemCanReq', 'dMemSendReq', 'dMemHasResp', 'dMemRecvResp')
+
+  def getState(s):
+    # Architectural and pipeline state (in-flight instructions, buffers,
+    # scoreboard, flags, decoded-instruction cache) and the predictor's
+    state = {k: v for k, v in vars(s).items() if k not in s.ckpt_skip}
+    state['bp'] = s.bp.getState()
+    return state
+
+  def setState(s, state, bpred=True):
+    # The predictor is only restored if it is the same kind
+    vars(s).update({k: v for k, v in state.items() if k != 'bp'})
+    if bpred and 'bp' in state:
+      s.bp.setState(state['bp'])
@@ -0,0 +1,174 @@
+# functional.py
+# --------------------------------------------------------------------
+# Functional MIPS32 interpreter used to fast-forward a core.
+#
+# The interpreter works directly on the architectural state of a
+# FiveStageInorderCore (its rf, pc and memory functions), so detailed
+# simulation can pick up right where it stops. Every PC is translated
+# once into a small closure that executes the instruction and returns
+# the next PC.
+
+from pyArchSimLib.proc.core.five_stage_core import exec_ops, DynamicInst
+
+class FunctionalCore():
+  def __init__(s, core):
+    s.core = core
+
+    # Translated instructions: pc -> step function
+    s.steps = {}
+
+    # Statistics
+    s.num_insts = 0
+
+  def isDrained(s):
+    core = s.core
+    return (core.f2d is None and core.d2x is None and
+            core.x2m is None and core.m2w is None and core.inst_D is None)
+
+  #=====================================================================
+  # Translation
+  #=====================================================================
+  def invalidate(s, addr, size):
+    for pc in range(addr & ~0x3, addr + size, 4):
+      s.steps.pop(pc, None)
+    s.core.invalidateDecoded(addr, size)
+
+  def translate(s, pc):
+    core = s.core
+    rf   = core.rf
+    M    = 0xffffffff
+
+    inst = int.from_bytes(core.MemReadFunct(pc, 4), 'little')
+
+    (_, mnemonic, isMem, validInst,
+     rs, rt, rd, shamt, imm16, imm26,
+     reads_rs, reads_rt, dep_R, dep_W) = core.decodeInst(pc, inst)
+
+    npc = pc + 4
+    dst = dep_W[0] if dep_W else 0
+
+    if mnemonic not in core.exec_tbl:
+      dinst = DynamicInst(pc, npc)
+      dinst.inst = inst
+      def step():
+        core.execUndef(dinst, None)
+      return step
+
+    syntax = core.arch['insts'][mnemonic]['syntax']
+    op     = exec_ops[mnemonic]
+
+    #================#
+    #      ALUs      #
+    #================#
+    if   syntax == 'd,s,t':
+      if dst == 0:
+        def step(): return npc
+      else:
+        def step():
+          rf[dst] = op(core, rf[rs], rf[rt]) & M
+          return npc
+    elif syntax == 'd,s,S':
+      if dst == 0:
+        def step(): return npc
+      else:
+        def step():
+          rf[dst] = op(core, rf[rs], shamt) & M
+          return npc
+    elif syntax in ('T,s,i', 'T,i'):
+      if dst == 0:
+        def step(): return npc
+      else:
+        def step():
+          rf[dst] = op(core, rf[rs], imm16) & M
+          return npc
+
+    #================#
+    #     Memory     #
+    #================#
+    elif syntax == 'T,m':
+      read = core.MemReadFunct
+      off  = core.signed(core.sext(imm16))
+      size = op
+      ext  = 8 * size if mnemonic in ('lb', 'lh') else 0
+      def step():
+        val = int.from_bytes(read(rf[rs] + off, size), 'little')
+        if ext: val = core.sext(val, ext)
+        if dst: rf[dst] = val
+        return npc
+    elif syntax == 't,m':
+      write = core.MemWriteFunct
+      off   = core.signed(core.sext(imm16))
+      size  = op
+      mask  = (1 << (8 * size)) - 1
+      def step():
+        ea   = rf[rs] + off
+        write(ea, (rf[rt] & mask).to_bytes(size, 'little'), size)
+        s.invalidate(ea, size)
+        return npc
+
+    #================#
+    #  Control Flow  #
+    #================#
+    elif syntax in ('s,t,p', 's,p'):
+      tpc = pc + 4 + (core.signed(core.sext(imm16, 16)) << 2)
+      def step():
+        return tpc if op(core, rf[rs], rf[rt]) else npc
+    elif syntax == 'l':
+      tpc = (pc & 0xf0000000) | (imm26 << 2)
+      if op:
+        def step():
+          rf[31] = npc
+          return tpc
+      else:
+        def step(): return tpc
+    elif syntax == 's':
+      def step(): return rf[rs]
+
+    #================#
+    #    Syscall     #
+    #================#
+    else:
+      # Handled by the run loop, see below
+      step = None
+
+    return step
+
+  #=====================================================================
+  # Run
+  #=====================================================================
+  def run(s, max_insts=None, until_roi=False):
+    # Runs until max_insts instructions have executed, the program exits
+    # or, with until_roi, right before the syscall that opens the ROI.
+    # Returns the number of instructions executed.
+    assert s.isDrained(), 'Fast-forwarding requires a drained pipeline'
+
+    core  = s.core
+    rf    = core.rf
+    steps = s.steps
+
+    pc    = core.pc
+    n     = 0
+    limit = float('inf') if max_insts is None else max_insts
+
+    while n < limit and not core.exit:
+      if pc in steps:
+        step = steps[pc]
+      else:
+        step = steps[pc] = s.translate(pc)
+
+      if step is None:
+        # Syscall: stop right before the ROI marker so detailed timing
+        # starts with it
+        if until_roi and rf[2] == 88 and not core.roi:
+          break
+        core.execute_sc(rf[2])
+        pc = pc + 4
+      else:
+        pc = step()
+
+      n += 1
+
+    core.pc = pc
+    s.num_insts += n
+
+    return n
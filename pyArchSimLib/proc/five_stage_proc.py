@@ -12,13 +12,16 @@
 
 import random
 
-from pyArchSimLib.proc.core import FiveStageInorderCore
+from pyArchSimLib.proc.core import FiveStageInorderCore, FunctionalCore
 from pyArchSimLib.mem.cache import NoCache
 
 class FiveStageInorderProcessor():
-    def __init__(self, icache=None, dcache=None):
-        # Core pipeline slice
-        self.core = FiveStageInorderCore()
+    def __init__(self, icache=None, dcache=None, bpred=None):
+        # Core pipeline slice (with the branch predictor, if any)
+        self.core = FiveStageInorderCore(bpred=bpred)
+
+        # Functional model sharing the core's state (for fast-forwarding)
+        self.functional = FunctionalCore(self.core)
 
         # Caches (injected or default to no-cache)
         self.icache = icache if icache else NoCache(0)
@@ -81,12 +84,52 @@ class FiveStageInorderProcessor():
     def getExitStatus(self):
         return self.core.getExitStatus()
 
+    # Execute instructions functionally (no timing, caches untouched)
+    # until the ROI begins or max_insts have run; the pipeline must be
+    # drained, and detailed simulation resumes from the resulting state.
+    def fastForward(self, max_insts=None, until_roi=False):
+        return self.functional.run(max_insts, until_roi)
+
     # Advance one cycle: first core, then both caches
     def tick(self):
         self.core.tick()
         self.icache.tick()
         self.dcache.tick()
 
+    # Event-driven simulation: cycles until the earliest component has
+    # something to do (None if none of them has events of its own)
+    def quietCycles(self):
+        quiet = None
+        for part in (self.core, self.icache, self.dcache):
+            n = part.quietCycles()
+            if n == 0:
+                return 0
+            if n is not None and (quiet is None or n < quiet):
+                quiet = n
+        return quiet
+
+    # Advance n cycles in which nothing but countdowns happen
+    def skipCycles(self, n):
+        self.core.skipCycles(n)
+        self.icache.skipCycles(n)
+        self.dcache.skipCycles(n)
+
+    # Checkpointing: core and caches (memory is saved by the system)
+    def getState(self):
+        state = {}
+        state['core'  ] = self.core.getState()
+        state['icache'] = self.icache.getState()
+        state['dcache'] = self.dcache.getState()
+        state['ff_insts'] = self.functional.num_insts
+        return state
+
+    def setState(self, state, caches=True, bpred=True):
+        self.core.setState(state['core'], bpred)
+        if caches:
+            self.icache.setState(state['icache'])
+            self.dcache.setState(state['dcache'])
+        self.functional.num_insts = state['ff_insts']
+
     # Produce a combined trace: core trace plus cache hit/miss markers
     def linetrace(self):
         core_lt   = self.core.linetrace()
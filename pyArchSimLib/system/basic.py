@@ -56,6 +56,15 @@ class BasicSystem():
     s.proc.tick()
     s.mem .tick()
 
+  # Event-driven simulation
+  def quietCycles(s):
+    quiet = [n for n in (s.proc.quietCycles(), s.mem.quietCycles()) if n is not None]
+    return min(quiet) if quiet else None
+
+  def skipCycles(s, n):
+    s.proc.skipCycles(n)
+    s.mem .skipCycles(n)
+
   # Linetracing
   def linetrace(s):
     if s.doLinetrace:
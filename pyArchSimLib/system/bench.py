@@ -0,0 +1,96 @@
+# bench.py
+# --------------------------------------------------------------------
+#   Simulator throughput benchmarks.
+#
+#   The kernels in benchmarks/ are listed in a manifest (JSON) with the
+#   exit code every one of them must end with (a checksum of its
+#   results) and the cache configuration to run them under:
+#
+#     {"icache": CFG, "dcache": CFG, "max_num_cycles": N,
+#      "benchmarks": [{"name": ..., "file": ..., "checksum": ...}, ...]}
+#
+#   It may also name an "l2", an "l3" and a "bpred" configuration.
+#
+#   run() simulates one kernel like pasim-sweep does and adds the host
+#   time it took; compare() checks a set of results against a stored
+#   baseline of the same configuration.
+
+import contextlib
+import json
+import os
+import platform
+import time
+
+from pyArchSimLib.arch.isa  import mips32
+from pyArchSimLib.arch      import program_cache
+from pyArchSimLib.system    import sweep
+
+def load_manifest(path):
+  with open(path) as f:
+    manifest = json.load(f)
+  base_dir = os.path.dirname(os.path.abspath(path))
+  for bench in manifest['benchmarks']:
+    bench['path'] = os.path.join(base_dir, bench['file'])
+  return manifest
+
+def run(bench, icache, dcache, max_num_cycles, event_driven=False, repeat=1,
+        l2=None, l3=None, bpred='none'):
+  # Statistics of one kernel (a result-table row of pasim-sweep) plus
+  # the checksum verdict and the host time of the fastest of repeat
+  # runs; assembling is not timed
+  elf, _ = program_cache.assemble(mips32, bench['path'])
+
+  best = None
+  for _ in range(repeat):
+    # Keep the kernel's own output out of the report
+    with open(os.devnull, 'w') as null, contextlib.redirect_stdout(null):
+      start = time.perf_counter()
+      row   = sweep.simulate(elf, icache, dcache, max_num_cycles,
+                             event_driven=event_driven, l2=l2, l3=l3, bpred=bpred)
+      secs  = time.perf_counter() - start
+    best = secs if best is None else min(best, secs)
+
+  row['name'          ] = bench['name']
+  row['checksum_ok'   ] = row['finished'] and row['exit_code'] == bench['checksum']
+  row['host_secs'     ] = best
+  row['cycles_per_sec'] = row['cycles'] / best if best else 0.0
+  row['insts_per_sec' ] = row['insts' ] / best if best else 0.0
+  return row
+
+def config(icache, dcache, event_driven, l2=None, l3=None, bpred='none'):
+  # Levels and predictors that are not used are left out, so that the
+  # configuration of a baseline without them stays the same
+  cfg = {'icache': icache, 'dcache': dcache, 'event_driven': event_driven}
+  if l2:              cfg['l2'   ] = l2
+  if l3:              cfg['l3'   ] = l3
+  if bpred != 'none': cfg['bpred'] = bpred
+  return cfg
+
+def make_baseline(rows, cfg):
+  baseline = {}
+  baseline['config'    ] = cfg
+  baseline['host'      ] = '{} {} on {}'.format(platform.python_implementation(),
+                                                platform.python_version(),
+                                                platform.machine())
+  baseline['benchmarks'] = {
+    row['name']: {k: row[k] for k in ('cycles', 'insts', 'cycles_per_sec', 'insts_per_sec')}
+    for row in rows
+  }
+  return baseline
+
+def compare(row, baseline, tolerance):
+  # (speedup over the baseline or None, list of problems) of one result;
+  # a kernel that got more than tolerance slower, or whose simulated
+  # cycles or instructions changed, is a problem
+  base = baseline['benchmarks'].get(row['name'])
+  if base is None:
+    return None, []
+
+  problems = []
+  speedup  = row['cycles_per_sec'] / base['cycles_per_sec'] if base['cycles_per_sec'] else None
+  if speedup is not None and speedup < 1 - tolerance:
+    problems.append('{:.0%} slower than the baseline'.format(1 - speedup))
+  for key in ('cycles', 'insts'):
+    if row[key] != base[key]:
+      problems.append('{} changed from {} to {}'.format(key, base[key], row[key]))
+  return speedup, problems
@@ -0,0 +1,34 @@
+# checkpoint.py
+# --------------------------------------------------------------------
+#   Full-system checkpoints.
+#
+#   A checkpoint is a dictionary of component states (as returned by
+#   their getState() methods) written as a single pickle, so objects
+#   shared between components (e.g., in-flight instructions referenced
+#   by both a pipeline register and the forwarding network) are
+#   restored as shared objects. Memory pages are compressed by the
+#   memory itself.
+
+import pickle
+import struct
+
+MAGIC   = b'PASIMCKP'
+VERSION = 2
+
+def save(path, state):
+  with open(path, 'wb') as f:
+    f.write(MAGIC)
+    f.write(struct.pack('<I', VERSION))
+    pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+def load(path):
+  with open(path, 'rb') as f:
+    magic = f.read(len(MAGIC))
+    if magic != MAGIC:
+      raise ValueError('{} is not a pyArchSim checkpoint'.format(path))
+
+    version, = struct.unpack('<I', f.read(4))
+    if version != VERSION:
+      raise ValueError('{}: unsupported checkpoint version {}'.format(path, version))
+
+    return pickle.load(f)
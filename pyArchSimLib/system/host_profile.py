@@ -0,0 +1,156 @@
+# host_profile.py
+# --------------------------------------------------------------------
+#   Host-side time profile of the simulator itself.
+#
+#   Where does the wall time of a run go: to the pipeline stages, the
+#   caches, the memory or the linetraces? instrument() replaces methods
+#   of a component *instance* (so the I- and D-cache are told apart) by
+#   wrappers that count calls and measure wall time, inclusive and
+#   exclusive of the instrumented calls they make. Every call is kept
+#   under its call path, e.g.
+#
+#     proc.tick;core.tick;core.x;dcache.sendReq
+#
+#   which report() folds by component and save_folded() writes as
+#   collapsed stacks (one 'path microseconds' line per path), the input
+#   format of flamegraph.pl, speedscope and inferno.
+#
+#   The time a wrapper itself takes outside of its measurement is
+#   calibrated once and taken out of the caller's exclusive time, so
+#   the times are close to those of an uninstrumented run; the run as
+#   a whole is about twice as slow.
+#
+#   Components only call each other through attributes looked up at
+#   call time or through hooks installed when the processor is built,
+#   so caches and memory have to be instrumented before the processor
+#   is connected to them.
+
+import time
+
+# Methods instrumented by pasim; the one-line port accessors (canReq,
+# hasResp, recvResp) run in less time than a measurement takes, so
+# they count toward their callers
+core_methods  = ('tick', 'f', 'd', 'x', 'm', 'w', 'quietCycles', 'skipCycles')
+proc_methods  = ('tick', 'quietCycles', 'skipCycles')
+cache_methods = ('tick', 'sendReq', 'quietCycles', 'skipCycles')
+mem_methods   = ('tick', 'sendReq', 'quietCycles', 'skipCycles')
+
+ROOT = 'pasim'
+
+class HostProfiler():
+  def __init__(s, clock=time.perf_counter, overhead=None):
+    s.clock = clock
+
+    # Frames of the calls in progress: [time of the callees, path]; the
+    # root frame collects the calls made directly by the driver
+    s.stack = [[0.0, ROOT]]
+
+    # Call path -> [calls, inclusive seconds, exclusive seconds]
+    s.stats = {}
+
+    s.start_time = None
+    s.wall       = 0.0
+
+    # Seconds per call a wrapper adds to its caller's time
+    s.overhead = calibrate(clock) if overhead is None else overhead
+
+  def start(s):
+    s.start_time = s.clock()
+
+  def stop(s):
+    if s.start_time is not None:
+      s.wall      += s.clock() - s.start_time
+      s.start_time = None
+
+  def wrap(s, fn, name):
+    stack    = s.stack
+    stats    = s.stats
+    clock    = s.clock
+    overhead = s.overhead
+    def timed(*args):
+      path  = stack[-1][1] + ';' + name
+      frame = [0.0, path]
+      stack.append(frame)
+      start = clock()
+      ret   = fn(*args)
+      t     = clock() - start
+      stack.pop()
+      stack[-1][0] += t + overhead
+      st = stats.get(path)
+      if st is None:
+        st = stats[path] = [0, 0.0, 0.0]
+      st[0] += 1
+      st[1] += t
+      st[2] += t - frame[0]
+      return ret
+    return timed
+
+  def instrument(s, obj, name, methods):
+    # Wrap obj's methods as 'name.method'; the wrappers are kept out of
+    # the component's checkpoints
+    for method in methods:
+      setattr(obj, method, s.wrap(getattr(obj, method), name + '.' + method))
+    skip = getattr(obj, 'ckpt_skip', None)
+    if skip is not None:
+      obj.ckpt_skip = tuple(skip) + tuple(methods) + ('ckpt_skip',)
+
+  def components(s):
+    # name -> [calls, inclusive seconds, exclusive seconds], over all
+    # the paths a component was called on
+    totals = {}
+    for path, (calls, incl, excl) in s.stats.items():
+      name = path.rpartition(';')[2]
+      t = totals.setdefault(name, [0, 0.0, 0.0])
+      t[0] += calls
+      t[1] += incl
+      t[2] += excl
+    return totals
+
+  def calls(s):
+    return sum(st[0] for st in s.stats.values())
+
+  def instrumentation(s):
+    # Wall time the wrappers took
+    return s.calls() * s.overhead
+
+  def unattributed(s):
+    # Wall time spent outside every instrumented call (the driver loop,
+    # statistics, uninstrumented code)
+    return max(s.wall - s.stack[0][0], 0.0)
+
+def calibrate(clock, n=20000):
+  # Time n calls of a wrapped no-op, less the time they measured
+  prof  = HostProfiler(clock, overhead=0.0)
+  timed = prof.wrap(lambda: None, 'calibrate')
+  start = clock()
+  for _ in range(n):
+    timed()
+  total = clock() - start
+  return max(total - prof.stats[ROOT + ';calibrate'][1], 0.0) / n
+
+def report(prof, cycles=None):
+  totals = sorted(prof.components().items(), key=lambda kv: -kv[1][2])
+  wall = prof.wall or 1e-12
+
+  title = f'Host Time Profile ({prof.wall:.3f} s'
+  if cycles:
+    title += f', {cycles / wall:.0f} simulated cycles/s'
+  title += ')'
+
+  lines = [title, '']
+  lines.append(f'{"component":22s} {"calls":>10s} {"incl s":>9s} {"self s":>9s} '
+               f'{"self %":>7s} {"us/call":>8s}')
+  for name, (calls, incl, excl) in totals:
+    lines.append(f'{name:22s} {calls:10d} {incl:9.3f} {excl:9.3f} '
+                 f'{100 * excl / wall:6.1f}% {1e6 * incl / calls:8.2f}')
+  for name, t in (('(driver loop, other)', prof.unattributed()),
+                  ('(instrumentation)',    prof.instrumentation())):
+    lines.append(f'{name:22s} {"":10s} {"":9s} {t:9.3f} {100 * t / wall:6.1f}%')
+  return '\n'.join(lines)
+
+def save_folded(path, prof):
+  # Collapsed stacks weighted by exclusive microseconds
+  with open(path, 'w') as f:
+    f.write(f'{ROOT} {round(1e6 * prof.unattributed())}\n')
+    for stack, (calls, incl, excl) in sorted(prof.stats.items()):
+      f.write(f'{stack} {round(1e6 * excl)}\n')
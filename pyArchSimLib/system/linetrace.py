@@ -0,0 +1,277 @@
+# linetrace.py
+# --------------------------------------------------------------------
+#   Pipeline linetraces.
+#
+#   The ASCII table pasim prints is built from the stages' linetrace
+#   events (see five_stage_core.py) and the caches' trace codes. The
+#   same information can instead be written as fixed-size binary
+#   records, one per cycle, and rendered later by pasim-trace:
+#
+#     header : MAGIC, version (u32), metadata length (u32), metadata
+#              (UTF-8 JSON: mnemonic table, cache trace strings, ...)
+#     record : cycle (u32), per-stage event (5 x u8), I-cache and
+#              D-cache trace codes (2 x u8), flags (u8), per-stage PC
+#              (5 x u32); little-endian, 32 bytes
+#
+#   A stage event is a core linetrace event code (LT_*), EV_SQUASHED
+#   for a squashed instruction, or EV_INST + the index of the
+#   instruction's mnemonic in the mnemonic table. The PC is 0 if the
+#   stage did not process an instruction.
+#
+#   Either output can be limited to windows of interest (see
+#   TraceWindow): a cycle range, the ROI, or the cycles in which a PC or
+#   data address is touched, with cycles of context around them.
+
+import collections
+import json
+import struct
+
+from pyArchSimLib.proc.core.five_stage_core import lt_events
+
+MAGIC   = b'PASIMLTR'
+VERSION = 1
+
+record = struct.Struct('<I5B3B5I')
+
+EV_SQUASHED = 8
+EV_INST     = 16
+
+# Flags
+FLAG_ROI    = 1 # The cycle was in the ROI
+FLAG_INST_C = 2 # An instruction completed
+
+stages = ('f', 'd', 'x', 'm', 'w')
+
+#--------------------
+# ASCII table
+#--------------------
+header = (
+  "+----------+------------+----------+----------+----------+----------+---------+---------+-----+\n"
+  "|   Cycle  |    Fetch   |  Decode  | Execute  |  Memory  | Complete | I_Cache | D_Cache | Mem |\n"
+  "+----------+------------+----------+----------+----------+----------+---------+---------+-----+"
+)
+
+row_fmt = (
+  "| {cycle:8d} "
+  "| {fetch:10s} "
+  "| {decode:8s} "
+  "| {execute:8s} "
+  "| {memory:8s} "
+  "| {complete:8s} "
+  "| {i_tr:6s} "
+  "| {d_tr:6s} "
+  "| {m_tr:3s} |"
+)
+
+def fields(core, icache, dcache, mem):
+  # Row fields (all but the cycle) of the last cycle
+  fetch, decode, execute, memory, complete = core.stageTraces()
+  return dict(
+    fetch=fetch, decode=decode,
+    execute=execute, memory=memory, complete=complete,
+    i_tr=icache.linetrace(), d_tr=dcache.linetrace(), m_tr=mem.linetrace()
+  )
+
+#--------------------
+# Binary traces
+#--------------------
+def mnemonic_ids(meta):
+  return {mn: EV_INST + i for i, mn in enumerate(meta['mnemonics'])}
+
+def snapshot(mn_ids, core, icache, dcache, flags):
+  # The record (all but the cycle) of the last cycle
+  codes = []
+  pcs   = []
+  for ev in core.lt_events:
+    if ev.__class__ is int:
+      codes.append(ev)
+      pcs.append(0)
+    else:
+      codes.append(EV_SQUASHED if ev.squashed else mn_ids[ev.mnemonic])
+      pcs.append(ev.pc & 0xffffffff)
+
+  return (*codes, icache.traceCode(), dcache.traceCode(), flags, *pcs)
+
+def make_meta(core, ic, dc, mem, **extra):
+  meta = {}
+  meta['mnemonics'  ] = sorted(core.arch['insts']) + ['undef']
+  meta['icache_strs'] = list(ic.trace_strs)
+  meta['dcache_strs'] = list(dc.trace_strs)
+  meta['mem_str'    ] = mem.linetrace()
+  meta.update(extra)
+  return meta
+
+class LinetraceWriter():
+  def __init__(s, path, meta, buf_records=1 << 15):
+    s.f     = open(path, 'wb')
+    s.buf   = bytearray()
+    s.limit = buf_records * record.size
+    s.count = 0
+    s.last  = None
+
+    s.mn_ids = mnemonic_ids(meta)
+
+    meta = json.dumps(meta).encode()
+    s.f.write(MAGIC)
+    s.f.write(struct.pack('<II', VERSION, len(meta)))
+    s.f.write(meta)
+
+  def write(s, cycle, core, icache, dcache, flags):
+    s.last = snapshot(s.mn_ids, core, icache, dcache, flags)
+    s.append(cycle)
+
+  def record(s, cycle, rec):
+    # A record taken earlier with snapshot()
+    s.last = rec
+    s.append(cycle)
+
+  def repeat(s, cycle):
+    # The same record as the last one, for another cycle
+    s.append(cycle)
+
+  def append(s, cycle):
+    s.buf += record.pack(cycle, *s.last)
+    s.count += 1
+    if len(s.buf) >= s.limit:
+      s.flush()
+
+  def flush(s):
+    s.f.write(s.buf)
+    s.buf = bytearray()
+
+  def close(s):
+    if not s.f.closed:
+      s.flush()
+      s.f.close()
+
+def load(path):
+  # Returns (metadata, raw record bytes)
+  with open(path, 'rb') as f:
+    if f.read(len(MAGIC)) != MAGIC:
+      raise ValueError('{} is not a pyArchSim linetrace'.format(path))
+
+    version, meta_len = struct.unpack('<II', f.read(8))
+    if version != VERSION:
+      raise ValueError('{}: unsupported linetrace version {}'.format(path, version))
+
+    meta = json.loads(f.read(meta_len).decode())
+    data = f.read()
+
+  if len(data) % record.size:
+    raise ValueError('{}: truncated linetrace'.format(path))
+
+  return meta, data
+
+def records(data):
+  # (cycle, codes, i_code, d_code, flags, pcs) per record
+  for rec in record.iter_unpack(data):
+    yield rec[0], rec[1:6], rec[6], rec[7], rec[8], rec[9:14]
+
+def stage_text(meta, stage, code, pc):
+  if code <  EV_SQUASHED: return lt_events[code]
+  if code == EV_SQUASHED: return '-'
+  if stage == 0:          return '{:#010x}'.format(pc)
+  return meta['mnemonics'][code - EV_INST]
+
+def render(meta, cycle, codes, i_code, d_code, pcs):
+  # The ASCII row pasim prints for a record
+  fetch, decode, execute, memory, complete = (
+    stage_text(meta, i, code, pc) for i, (code, pc) in enumerate(zip(codes, pcs)))
+  return row_fmt.format(
+    cycle=cycle, fetch=fetch, decode=decode,
+    execute=execute, memory=memory, complete=complete,
+    i_tr=meta['icache_strs'][i_code], d_tr=meta['dcache_strs'][d_code],
+    m_tr=meta['mem_str']
+  )
+
+def render_record(meta, cycle, rec):
+  return render(meta, cycle, rec[0:5], rec[5], rec[6], rec[8:13])
+
+#--------------------
+# Trace windows
+#--------------------
+class TraceWindow():
+  # Selects the cycles to trace. A cycle is hot if it is within
+  # [first, last], in the ROI (if roi), and, if there are triggers, a
+  # stage processed an instruction at one of pcs or the execute stage
+  # accessed memory overlapping one of addrs ((lo, hi) ranges). The
+  # pre cycles before and the post cycles after a hot cycle are traced
+  # as well.
+  def __init__(s, first=0, last=None, roi=False, pcs=(), addrs=(), pre=0, post=0):
+    s.first = first
+    s.last  = last
+    s.roi   = roi
+    s.pcs   = set(pcs)
+    s.addrs = list(addrs)
+    s.pre   = pre
+    s.post  = post
+
+    s.pre_buf  = collections.deque(maxlen=pre)
+    s.post_rem = 0
+
+  @classmethod
+  def parse_range(cls, spec):
+    # 'FIRST:LAST' (either may be omitted) -> (first, last)
+    first, sep, last = spec.partition(':')
+    if not sep:
+      raise ValueError('expected FIRST:LAST, got "{}"'.format(spec))
+    return int(first, 0) if first else 0, int(last, 0) if last else None
+
+  @classmethod
+  def parse_context(cls, spec):
+    # 'N' or 'PRE:POST' -> (pre, post)
+    pre, sep, post = spec.partition(':')
+    pre  = int(pre)
+    post = int(post) if sep else pre
+    if pre < 0 or post < 0:
+      raise ValueError('context must not be negative')
+    return pre, post
+
+  def needed(s, cycle):
+    # Whether a cycle may be traced at all; records of the others need
+    # not be taken
+    if cycle < s.first - s.pre:
+      return False
+    return s.last is None or cycle <= s.last or s.post_rem > 0
+
+  def hot(s, cycle, flags, core):
+    if cycle < s.first or (s.last is not None and cycle > s.last):
+      return False
+    if s.roi and not flags & FLAG_ROI:
+      return False
+    if not s.pcs and not s.addrs:
+      return True
+
+    if s.pcs:
+      for ev in core.lt_events:
+        if ev.__class__ is not int and ev.pc in s.pcs:
+          return True
+
+    ev = core.lt_events[2]
+    if s.addrs and ev.__class__ is not int and ev.isMem and not ev.squashed:
+      for lo, hi in s.addrs:
+        if ev.ea < hi and ev.ea + ev.ea_size > lo:
+          return True
+
+    return False
+
+  def keeps(s):
+    # Whether the record of a cycle that is not hot is still needed (as
+    # context)
+    return s.pre > 0 or s.post_rem > 0
+
+  def push(s, cycle, rec, hot):
+    # Returns the (cycle, record) pairs to trace now
+    if hot:
+      out = list(s.pre_buf)
+      out.append((cycle, rec))
+      s.pre_buf.clear()
+      s.post_rem = s.post
+      return out
+
+    if s.post_rem > 0:
+      s.post_rem -= 1
+      return ((cycle, rec),)
+
+    s.pre_buf.append((cycle, rec))
+    return ()
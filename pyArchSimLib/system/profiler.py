@@ -0,0 +1,226 @@
+# profiler.py
+# --------------------------------------------------------------------
+#   Per-PC cycle profiler.
+#
+#   Every cycle is charged to one instruction, at the head of the
+#   pipeline (writeback): a cycle in which an instruction completes is
+#   a 'base' cycle of that instruction; any other cycle had a bubble
+#   (or a squashed instruction) in writeback, and is charged to the
+#   instruction that created it, for the reason it was created. The
+#   reasons are the stall states the stages report (see the LT_* codes
+#   of five_stage_core.py):
+#
+#     raw     : decode held the instruction back on a data hazard ('S raw')
+#     imem    : fetch could not send a request ('S_imem') or decode
+#               waited for the instruction ('S mem' in decode)
+#     mem     : the D-cache could not take the request ('S mem' in execute)
+#     dmem    : the load/store waited for its data ('S dmem')
+#     squash  : a wrong-path instruction, charged to the branch or jump
+#               that squashed it
+#     syscall : decode drained the pipeline for a syscall ('S |>>', 'S >>|')
+#     idle    : the pipeline was still empty
+#
+#   Bubbles are tracked as they move down the pipeline registers, so a
+#   stall is charged once, when its bubble reaches writeback, and the
+#   charges of a run add up to its cycles.
+
+import bisect
+import json
+import linecache
+
+from pyArchSimLib.proc.core.five_stage_core import (
+  LT_IDLE, LT_S_IMEM, LT_S_MEM, LT_S_DMEM, LT_S_RAW, LT_S_SYSCALL, LT_S_BLOCKED
+)
+
+# Causes
+BASE    = 0
+RAW     = 1
+IMEM    = 2
+MEM     = 3
+DMEM    = 4
+SQUASH  = 5
+SYSCALL = 6
+IDLE    = 7
+
+causes = ('base', 'raw', 'imem', 'mem', 'dmem', 'squash', 'syscall', 'idle')
+
+# Cause of a bubble created by decode, by its event
+d_causes = {LT_S_RAW: RAW, LT_S_MEM: IMEM, LT_S_SYSCALL: SYSCALL, LT_S_BLOCKED: SYSCALL}
+
+# Cycles after which a stalled pipeline charges the same bubble every
+# cycle (one per pipeline register)
+depth = 4
+
+class Profiler():
+  def __init__(s, core):
+    s.core   = core
+    s.epoch  = core.epoch
+    s.branch = None
+
+    # Per PC: cycles by cause
+    s.counts = {}
+    s.cycles = 0
+
+    # The bubble (cause, PC) in each pipeline register, if it has one
+    s.f2d = s.d2x = s.x2m = s.m2w = (IDLE, None)
+
+    # Last charge
+    s.last = None
+
+  def charge(s, cause, pc, n):
+    c = s.counts.get(pc)
+    if c is None:
+      c = s.counts[pc] = [0] * len(causes)
+    c[cause]  += n
+    s.cycles  += n
+    s.last     = (cause, pc)
+
+  def sample(s, count=True):
+    # Account for the last cycle; charges nothing unless count (the
+    # bubbles still move)
+    core = s.core
+    ev_F, ev_D, ev_X, ev_M, ev_W = core.lt_events
+
+    # A squash this cycle: by decode (a jump) unless execute (a branch)
+    # came first, which squashes whatever decode had
+    if core.epoch != s.epoch:
+      s.epoch  = core.epoch
+      s.branch = ev_D.pc if ev_D.__class__ is not int and not ev_D.squashed else ev_X.pc
+
+    # Writeback
+    if ev_W.__class__ is not int and not ev_W.squashed:
+      if count: s.charge(BASE, ev_W.pc, 1)
+    elif count:
+      s.charge(*s.m2w, 1)
+
+    # Memory
+    if ev_M.__class__ is int:
+      if   ev_M == LT_S_DMEM: s.m2w = (DMEM, core.x2m.pc)
+      elif ev_M == LT_IDLE:   s.m2w = s.x2m
+    elif ev_M.squashed:
+      s.m2w = s.x2m
+
+    # Execute
+    if ev_X.__class__ is int:
+      if   ev_X == LT_S_MEM: s.x2m = (MEM, core.d2x.pc)
+      elif ev_X == LT_IDLE:  s.x2m = s.d2x
+    elif ev_X.squashed:
+      s.x2m = s.d2x
+
+    # Decode
+    if ev_D.__class__ is int:
+      cause = d_causes.get(ev_D)
+      if   cause is not None: s.d2x = (cause, core.f2d.pc)
+      elif ev_D == LT_IDLE:   s.d2x = s.f2d
+    elif ev_D.squashed:
+      s.d2x = (SQUASH, s.branch)
+
+    # Fetch
+    if ev_F.__class__ is int:
+      if ev_F == LT_S_IMEM: s.f2d = (IMEM, core.pc)
+    elif ev_F.squashed:
+      s.f2d = (SQUASH, s.branch)
+
+  def skip(s, n, count=True):
+    # Account for n cycles that repeated the last one. The bubbles reach
+    # a fixed point once they have moved through every register, after
+    # which the same bubble is charged every cycle.
+    for _ in range(min(n, depth)):
+      s.sample(count)
+    if n > depth and count:
+      s.charge(*s.last, n - depth)
+
+#--------------------
+# Reports
+#--------------------
+class Symbols():
+  # Maps PCs to labels and source lines of an assembled program
+  def __init__(s, elf, asm_file):
+    text = elf['sections']['text']
+    s.base     = text['base_addr']
+    s.end      = text['base_addr'] + len(text['bytes'])
+    s.lines    = elf.get('lines', ())
+    s.asm_file = asm_file
+
+    labels = sorted((addr, name) for name, addr in elf['symbols'].items()
+                    if s.base <= addr < s.end)
+    s.addrs  = [addr for addr, _ in labels]
+    s.labels = [name for _, name in labels]
+
+  def label(s, pc):
+    # The closest label at or before pc, as 'label' or 'label+OFFSET'
+    i = bisect.bisect_right(s.addrs, pc) - 1 if pc is not None else -1
+    if i < 0 or pc >= s.end:
+      return None
+    off = pc - s.addrs[i]
+    return s.labels[i] if off == 0 else '{}+{:#x}'.format(s.labels[i], off)
+
+  def function(s, pc):
+    # The closest label at or before pc
+    i = bisect.bisect_right(s.addrs, pc) - 1 if pc is not None else -1
+    return s.labels[i] if i >= 0 and pc < s.end else None
+
+  def line(s, pc):
+    i = (pc - s.base) >> 2 if pc is not None else -1
+    return s.lines[i] if 0 <= i < len(s.lines) else None
+
+  def source(s, pc):
+    lineno = s.line(pc)
+    return linecache.getline(s.asm_file, lineno).strip() if lineno else ''
+
+def rows(prof, syms):
+  # One row per PC, hottest first
+  out = []
+  for pc, c in prof.counts.items():
+    row = {'pc': pc, 'label': syms.label(pc), 'line': syms.line(pc),
+           'cycles': sum(c)}
+    row.update(zip(causes, c))
+    out.append(row)
+  out.sort(key=lambda r: (-r['cycles'], r['pc'] if r['pc'] is not None else -1))
+  return out
+
+def functions(prof, syms):
+  # Cycles by cause per label (e.g., per loop or function), hottest first
+  totals = {}
+  for pc, c in prof.counts.items():
+    t = totals.setdefault(syms.function(pc), [0] * len(causes))
+    for i, n in enumerate(c):
+      t[i] += n
+  return sorted(totals.items(), key=lambda kv: -sum(kv[1]))
+
+def report(prof, syms, top=10):
+  # Text report of the hottest labels and instructions
+  total = prof.cycles or 1
+  cols  = ''.join('{:>9s}'.format(c) for c in causes)
+  lines = []
+
+  lines.append(' + Profile by Label:')
+  lines.append('     {:>10s} {:>6s}{}  label'.format('cycles', '%', cols))
+  for name, c in functions(prof, syms)[:top]:
+    lines.append('     {:10d} {:6.2f}{}  {}'.format(
+      sum(c), 100 * sum(c) / total, ''.join('{:9d}'.format(n) for n in c),
+      name or '?'))
+
+  lines.append('')
+  lines.append(' + Profile by Instruction:')
+  lines.append('     {:>10s} {:>6s}{}  {:10s} {:20s} line'.format(
+    'cycles', '%', cols, 'pc', 'label'))
+  for row in rows(prof, syms)[:top]:
+    pc = '{:#010x}'.format(row['pc']) if row['pc'] is not None else '-'
+    lines.append('     {:10d} {:6.2f}{}  {:10s} {:20s} {:>5s}  {}'.format(
+      row['cycles'], 100 * row['cycles'] / total,
+      ''.join('{:9d}'.format(row[c]) for c in causes), pc, row['label'] or '?',
+      str(row['line'] or ''), syms.source(row['pc'])))
+
+  return '\n'.join(lines)
+
+def save(path, prof, syms, **meta):
+  # Machine-readable profile (JSON): every PC with its label, source
+  # line and cycles by cause
+  profile = {}
+  profile['cycles'] = prof.cycles
+  profile['causes'] = list(causes)
+  profile.update(meta)
+  profile['pcs'   ] = rows(prof, syms)
+  with open(path, 'w') as f:
+    json.dump(profile, f, indent=1)
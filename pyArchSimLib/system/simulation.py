@@ -0,0 +1,84 @@
+# simulation.py
+# --------------------------------------------------------------------
+#   The simulation loop of pasim, pasim-sweep and pasim-bench.
+#
+#   A Simulation clocks a processor, the shared cache levels below its
+#   L1s and the memory once per cycle and counts the cycles and the
+#   completed instructions, overall and in the ROI. In event-driven
+#   mode it skips the cycles in which every component is provably
+#   idle; the results are the same. Front ends hook into every ticked
+#   cycle (on_tick) and every skipped stretch (on_skip), e.g., for
+#   linetracing and profiling.
+
+class Simulation():
+  def __init__(s, proc, mem, levels=()):
+    s.proc   = proc
+    s.mem    = mem
+    s.levels = list(levels)
+
+    # Statistics
+    s.cycles         = 0
+    s.insts          = 0
+    s.roi_cycles     = 0
+    s.roi_insts      = 0
+    s.skipped_cycles = 0
+
+  def quietCycles(s):
+    # Cycles until the earliest component has something to do (0 if one
+    # has something to do now, None if none has anything left to do)
+    n = s.proc.quietCycles()
+    for c in s.levels + [s.mem]:
+      if n == 0:
+        return 0
+      m = c.quietCycles()
+      if n is None or (m is not None and m < n):
+        n = m
+    return n
+
+  def run(s, until, event_driven=False, can_skip=None, on_tick=None, on_skip=None):
+    # Simulates until cycle until or the end of the program, whichever
+    # comes first; returns whether the program ended. Cycles are only
+    # skipped while can_skip() (if given) agrees.
+    proc   = s.proc
+    levels = s.levels
+    mem    = s.mem
+
+    while s.cycles < until:
+      if event_driven and (can_skip is None or can_skip()):
+        n = s.quietCycles()
+        if n:
+          n = min(n, until - s.cycles)
+          proc.skipCycles(n)
+          for c in levels:
+            c.skipCycles(n)
+          mem .skipCycles(n)
+
+          in_roi = proc.roiFlag()
+          if in_roi: s.roi_cycles += n
+          s.skipped_cycles += n
+
+          if on_skip:
+            on_skip(s.cycles, n, in_roi)
+          s.cycles += n
+          continue
+
+      in_roi = proc.roiFlag()
+      proc.tick()
+      for c in levels:
+        c.tick()
+      mem .tick()
+
+      done = proc.instCompletionFlag()
+      if in_roi:
+        s.roi_cycles += 1
+        if done: s.roi_insts += 1
+      if done: s.insts += 1
+
+      if on_tick:
+        on_tick(s.cycles, in_roi)
+      s.cycles += 1
+
+      if proc.getExitStatus()[0]:
+        return True
+
+    return False
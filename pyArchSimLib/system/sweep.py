@@ -0,0 +1,105 @@
+# sweep.py
+# --------------------------------------------------------------------
+#   Design-space sweeps over cache and branch predictor configurations.
+#
+#   A program is assembled once and every configuration is simulated
+#   on its own memory, caches and processor. simulate() returns the
+#   statistics of one run as a flat dictionary, i.e., one row of the
+#   result table.
+
+import itertools
+import re
+
+from pyArchSimLib.mem.main   import SimpleMultiportedMemory
+from pyArchSimLib.mem.cache  import make_cache, make_shared_cache, connect
+from pyArchSimLib.proc       import FiveStageInorderProcessor
+from pyArchSimLib.proc.bpred import make_bpred
+from pyArchSimLib.proc.core.five_stage_core import cpi_causes
+
+from .simulation import Simulation
+
+# Columns of the result table
+columns = (
+  'icache', 'dcache', 'l2', 'l3', 'bpred', 'finished', 'exit_code',
+  'cycles', 'insts', 'ipc', 'cpi',
+  'roi_cycles', 'roi_insts', 'roi_ipc', 'roi_cpi',
+  'icache_hits', 'icache_misses', 'dcache_hits', 'dcache_misses',
+  'dcache_writebacks', 'dcache_read_bytes', 'dcache_write_bytes',
+  'dcache_pf_issued', 'dcache_pf_useful', 'dcache_pf_late',
+  'dcache_pf_polluting',
+  'l2_hits', 'l2_misses', 'l3_hits', 'l3_misses', 'bpred_mpki',
+) + tuple('cpi_' + cause for cause in cpi_causes) # CPI stack
+
+def expand(pattern):
+  # Brace expansion of a configuration string, e.g.,
+  #   'sa:{1024,2048}:{2,4}:32' -> four configurations
+  parts   = re.split(r'\{([^{}]*)\}', pattern)
+  choices = [p.split(',') if i % 2 else [p] for i, p in enumerate(parts)]
+  return [''.join(c) for c in itertools.product(*choices)]
+
+def simulate(elf, icache, dcache, max_num_cycles=1_000_000,
+             mem_init='random', event_driven=True, l2=None, l3=None,
+             bpred='none'):
+  # Memory with the program loaded
+  init, seed = SimpleMultiportedMemory.parse_init(mem_init)
+  mem = SimpleMultiportedMemory(2, init=init, seed=seed)
+  for sec in elf['sections'].values():
+    mem.write(sec['base_addr'], sec['bytes'], len(sec['bytes']))
+
+  # Cache hierarchy (as pasim's)
+  l3c    = make_shared_cache(l3, 1, mem)       if l3 else None
+  l2c    = make_shared_cache(l2, 2, l3c or mem) if l2 else None
+  levels = [c for c in (l2c, l3c) if c]
+  if l3c: connect(l3c, mem)
+  if l2c: connect(l2c, l3c or mem)
+
+  # Processor
+  ic   = make_cache(icache, 0, l2c or mem)
+  dc   = make_cache(dcache, 1, l2c or mem)
+  bp   = make_bpred(bpred)
+  proc = FiveStageInorderProcessor(icache=ic, dcache=dc, bpred=bp)
+  connect(proc, l2c or mem)
+  proc.setMemReadFunc (mem.read)
+  proc.setMemWriteFunc(mem.write)
+
+  # Simulation (pasim's loop, without linetracing)
+  sim = Simulation(proc, mem, levels)
+  sim.run(max_num_cycles, event_driven)
+
+  finished, exit_code = proc.getExitStatus()
+
+  row = {}
+  row['icache'             ] = icache
+  row['dcache'             ] = dcache
+  row['l2'                 ] = l2
+  row['l3'                 ] = l3
+  row['bpred'              ] = bpred
+  row['finished'           ] = finished
+  row['exit_code'          ] = exit_code
+  row['cycles'             ] = sim.cycles
+  row['insts'              ] = sim.insts
+  row['ipc'                ] = sim.insts / sim.cycles if sim.cycles else 0.0
+  row['cpi'                ] = sim.cycles / sim.insts if sim.insts else 0.0
+  row['roi_cycles'         ] = sim.roi_cycles
+  row['roi_insts'          ] = sim.roi_insts
+  row['roi_ipc'            ] = sim.roi_insts / sim.roi_cycles if sim.roi_cycles else 0.0
+  row['roi_cpi'            ] = sim.roi_cycles / sim.roi_insts if sim.roi_insts else 0.0
+  row['icache_hits'        ] = getattr(ic, 'hits',   0)
+  row['icache_misses'      ] = getattr(ic, 'misses', 0)
+  row['dcache_hits'        ] = getattr(dc, 'hits',   0)
+  row['dcache_misses'      ] = getattr(dc, 'misses', 0)
+  row['dcache_writebacks'  ] = getattr(dc, 'writebacks',  0)
+  row['dcache_read_bytes'  ] = getattr(dc, 'read_bytes',  0)
+  row['dcache_write_bytes' ] = getattr(dc, 'write_bytes', 0)
+  row['dcache_pf_issued'   ] = getattr(dc, 'pf_issued',    0)
+  row['dcache_pf_useful'   ] = getattr(dc, 'pf_useful',    0)
+  row['dcache_pf_late'     ] = getattr(dc, 'pf_late',      0)
+  row['dcache_pf_polluting'] = getattr(dc, 'pf_polluting', 0)
+  row['l2_hits'            ] = l2c.hits   if l2c else 0
+  row['l2_misses'          ] = l2c.misses if l2c else 0
+  row['l3_hits'            ] = l3c.hits   if l3c else 0
+  row['l3_misses'          ] = l3c.misses if l3c else 0
+  row['bpred_mpki'         ] = 1000 * bp.mispredicts() / sim.insts if sim.insts else 0.0
+  for cause, n in zip(cpi_causes, proc.core.cpi_stack):
+    row['cpi_' + cause] = n / sim.insts if sim.insts else 0.0
+  return row
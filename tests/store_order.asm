@@ -0,0 +1,60 @@
+# store_order.asm
+# --------------------------------------------------------------------
+#   Regression program for the order of stores under a shared cache.
+#   A word is cleared and then overwritten byte by byte, and printed
+#   with syscall 4, which reads memory directly. The padding shifts the
+#   blocks across I-cache lines, so I-side misses hold the L2 while the
+#   D-cache's write-throughs of older data to the same bytes wait for
+#   it. A stale write that reaches memory after a newer store drops or
+#   cuts short a "Hi".
+#
+#   Output: "Hi" 16 times
+
+.data
+  msg:  .word  0x41414141, 0
+
+.text
+  la    $s0, msg
+  addiu $t7, $0, 72        # 'H'
+  addiu $t8, $0, 105       # 'i'
+  addiu $s2, $0, 4
+loop:
+  sw    $0, 0($s0)
+  sb    $t7, 0($s0)
+  sb    $t8, 1($s0)
+  addu  $a0, $s0, $0
+  addiu $v0, $0, 4
+  syscall
+
+  sll   $0, $0, 0
+  sw    $0, 0($s0)
+  sb    $t7, 0($s0)
+  sb    $t8, 1($s0)
+  addu  $a0, $s0, $0
+  addiu $v0, $0, 4
+  syscall
+
+  sll   $0, $0, 0
+  sll   $0, $0, 0
+  sw    $0, 0($s0)
+  sb    $t7, 0($s0)
+  sb    $t8, 1($s0)
+  addu  $a0, $s0, $0
+  addiu $v0, $0, 4
+  syscall
+
+  sll   $0, $0, 0
+  sll   $0, $0, 0
+  sll   $0, $0, 0
+  sw    $0, 0($s0)
+  sb    $t7, 0($s0)
+  sb    $t8, 1($s0)
+  addu  $a0, $s0, $0
+  addiu $v0, $0, 4
+  syscall
+
+  addiu $s2, $s2, -1
+  bne   $s2, $0, loop
+
+  addiu $v0, $0, 10
+  syscall
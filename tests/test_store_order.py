@@ -0,0 +1,85 @@
+# test_store_order.py
+# --------------------------------------------------------------------
+#   Stores take effect in memory when the core makes them; the writes
+#   the caches send down later (write-throughs and writebacks) only
+#   model timing and traffic, and must never bring back older data.
+
+import contextlib
+import io
+import os
+
+import pytest
+
+from pyArchSimLib.arch.isa    import mips32
+from pyArchSimLib.arch        import program_cache
+from pyArchSimLib.mem.main    import SimpleMultiportedMemory
+from pyArchSimLib.mem.cache   import SetAssociativeCache, SharedCache, connect
+from pyArchSimLib.system      import sweep
+
+test_dir = os.path.dirname(os.path.abspath(__file__))
+
+def run(asm_file, icache, dcache, l2=None, l3=None, event_driven=True):
+  # The program's output and its row of results
+  elf, _ = program_cache.assemble(mips32, os.path.join(test_dir, asm_file),
+                                  use_cache=False)
+  out = io.StringIO()
+  with contextlib.redirect_stdout(out):
+    row = sweep.simulate(elf, icache, dcache, event_driven=event_driven,
+                         l2=l2, l3=l3)
+  return out.getvalue(), row
+
+@pytest.mark.parametrize('icache, dcache, l2, l3', [
+  ('none',         'none',                 None, None),
+  ('none',         'sa:256:2:16:write=wt', None, None),
+  ('sa:1024:2:64', 'sa:256:2:16:write=wt', 'sa:4096:4:64:latency=20', None),
+  ('sa:128:2:32',  'sa:256:2:16:write=wt', 'sa:256:1:64:latency=20',  None),
+  ('sa:128:2:32',  'sa:256:2:16',          'sa:256:1:64:latency=20',  None),
+  ('sa:128:2:32',  'sa:256:2:16:mshrs=4',  'sa:256:1:64:latency=20:write=wt',
+                                           'sa:1024:2:64'),
+])
+@pytest.mark.parametrize('event_driven', [False, True])
+def test_store_order_under_l2(icache, dcache, l2, l3, event_driven):
+  out, row = run('store_order.asm', icache, dcache, l2, l3, event_driven)
+  assert row['finished']
+  assert out == 'Hi' * 16
+
+def test_store_under_queued_writeback():
+  # A lockup-free L1 keeps serving while the dirty writeback of an
+  # evicted line waits to be sent; a newer store to the line must
+  # survive that writeback reaching the L2
+  mem = SimpleMultiportedMemory(1, init='zero')
+  l2  = SharedCache(2, 4096, 4, 16, mem, hit_latency=3)
+  l1  = SetAssociativeCache(1, 64, 1, 16, l2, miss_penalty=2, mshrs=4)
+  connect(l2, mem)
+  connect(l1, l2)
+
+  def req(op, addr, val=0):
+    return {'op': op, 'addr': addr, 'data': bytes([val]) if op else [],
+            'size': 1, 'mask': None, 'tag': None}
+
+  def tick(n):
+    for _ in range(n):
+      l1.tick()
+      l2.tick()
+      mem.tick()
+      while l1.hasResp():
+        l1.recvResp()
+
+  A = 0x1000
+  l1.sendReq(req(1, A, 0x11))
+  tick(40)
+
+  # A miss to the set of A evicts it; a second miss keeps the port busy
+  l1.sendReq(req(0, A + 64))
+  l1.sendReq(req(0, A + 16))
+  for _ in range(100):
+    tick(1)
+    if any(r['op'] == 1 for r in l1.lower_q):
+      break
+  else:
+    pytest.fail('the writeback of A was never queued')
+  l1.sendReq(req(1, A, 0x33))
+  tick(200)
+
+  assert mem.read(A, 1)[0] == 0x33
+  assert l2.read(A, 1)[0]  == 0x33